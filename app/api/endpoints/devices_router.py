@@ -1,18 +1,43 @@
-from fastapi import Depends, HTTPException,  APIRouter, Query
+from typing import List, Optional
 
+from fastapi import Depends, HTTPException,  APIRouter, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.bulk import read_bulk_items
+from app.core.config import settings
+from app.core.etag import conditional_get, query_digest
+from app.core.query_tracker import query_budget
 from app.core.security import get_current_user
-from app.dependencies import get_device_service
+from app.core.serialization import json_response
+from app.db.counting import COUNT_STRATEGY_PATTERN
+from app.db.repositories.device_repository import DeviceRepository
+from app.database import get_read_sessionmaker
+from app.dependencies import get_device_service, get_device_read_service
 from app.models.models import User
 from app.schemas import device_schemas
 
-from app.schemas.device_schemas import ISGDevice, ISGDeviceCreate
+from app.schemas.device_schemas import (
+    BulkImportResult,
+    CommandRunRequest,
+    DiscoveryRequest,
+    DeviceStatusList,
+    ISGDevice,
+    ISGDeviceCreate,
+)
 from app.schemas.pagination_schemas import PaginatedResponse
 from app.services.device_services import DeviceService
+from app.services.export_services import EXPORT_FORMAT_PATTERN, export_response
+from app.services.reachability import reachability_prober
 
 router = APIRouter(tags=["devices"])
 
 
-@router.post("/devices/", response_model=device_schemas.ISGDevice)
+@router.post(
+    "/devices/",
+    response_model=device_schemas.ISGDevice,
+    dependencies=[Depends(query_budget(5))],
+)
 async def create_device(
     device: device_schemas.ISGDeviceCreate,
     device_service: DeviceService = Depends(get_device_service),
@@ -22,27 +47,175 @@ async def create_device(
         device_data=device.dict(),
         user_id=current_user.id
     )
-@router.get("/devices", response_model=PaginatedResponse[ISGDevice])
+
+@router.post(
+    "/bulk",
+    response_model=BulkImportResult,
+    dependencies=[Depends(query_budget(4))],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": ISGDeviceCreate.model_json_schema()}
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def bulk_create_devices(
+    request: Request,
+    device_service: DeviceService = Depends(get_device_service),
+    current_user: User = Depends(get_current_user),
+):
+    items = await read_bulk_items(request, settings.DEVICE_BULK_MAX_ITEMS)
+    return await device_service.bulk_create_devices(
+        items=items,
+        user_id=current_user.id
+    )
+
+@router.post("/commands")
+async def run_device_commands(
+    run: CommandRunRequest,
+    device_service: DeviceService = Depends(get_device_service),
+    current_user: User = Depends(get_current_user),
+):
+    command_run = await device_service.run_commands(
+        device_ids=run.device_ids,
+        commands=run.commands,
+        user_id=current_user.id,
+        stop_on_error=run.stop_on_error,
+        timeout=run.timeout
+    )
+    # The run carries on, and is logged, even if the client goes away.
+    return StreamingResponse(
+        command_run.stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Run-Id": command_run.id}
+    )
+
+@router.post("/discover")
+async def discover_devices(
+    discovery: DiscoveryRequest,
+    device_service: DeviceService = Depends(get_device_service),
+    current_user: User = Depends(get_current_user),
+):
+    # The scan stops when the client disconnects; batches registered
+    # until then stay.
+    return StreamingResponse(
+        await device_service.discover_devices(discovery, current_user.id),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/export")
+async def export_devices(
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(False),
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker),
+    current_user: User = Depends(get_current_user),
+):
+    return export_response(
+        lambda db: DeviceRepository(db).stream_devices(),
+        export_format=format,
+        columns=["id", *ISGDeviceCreate.model_fields],
+        filename="devices",
+        compress=compress,
+        session_factory=session_factory
+    )
+
+@router.get(
+    "/devices",
+    response_model=PaginatedResponse[ISGDevice],
+    dependencies=[Depends(query_budget(4))],
+)
 async def list_devices(
+    request: Request,
+    response: Response,
     page_number: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    device_service: DeviceService = Depends(get_device_service),
+    cursor: str = Query(None),
+    count: str = Query(None, pattern=COUNT_STRATEGY_PATTERN),
+    device_service: DeviceService = Depends(get_device_read_service),
     current_user: User = Depends(get_current_user),
 ):
-    return await device_service.list_devices(
+    not_modified = await conditional_get(
+        request,
+        response,
+        device_service.get_version,
+        settings.CACHE_CONTROL_DEVICE_LIST,
+        "devices",
+        query_digest(request),
+        reachability_prober.state_tag()
+    )
+    if not_modified:
+        return not_modified
+
+    page = await device_service.list_devices(
         page_number=page_number,
-        page_size=page_size
+        page_size=page_size,
+        cursor=cursor,
+        count_strategy=count
     )
+    return json_response(page, response)
 
-@router.get("/devices/{device_id}", response_model=ISGDevice)
+@router.get(
+    "/devices/status",
+    response_model=DeviceStatusList,
+    dependencies=[Depends(query_budget(1))],
+)
+async def get_device_statuses(
+    request: Request,
+    response: Response,
+    ids: Optional[List[int]] = Query(None),
+    reachable: Optional[bool] = Query(None),
+    device_service: DeviceService = Depends(get_device_read_service),
+    current_user: User = Depends(get_current_user),
+):
+    not_modified = await conditional_get(
+        request,
+        response,
+        reachability_prober.get_version,
+        settings.CACHE_CONTROL_DEVICE_LIST,
+        "device-status",
+        query_digest(request)
+    )
+    if not_modified:
+        return not_modified
+
+    return json_response(device_service.get_statuses(ids, reachable), response)
+
+@router.get(
+    "/devices/{device_id}",
+    response_model=ISGDevice,
+    dependencies=[Depends(query_budget(3))],
+)
 async def get_device(
     device_id: int,
-    device_service: DeviceService = Depends(get_device_service),
+    request: Request,
+    response: Response,
+    device_service: DeviceService = Depends(get_device_read_service),
     current_user: User = Depends(get_current_user),
 ):
+    not_modified = await conditional_get(
+        request,
+        response,
+        device_service.get_version,
+        settings.CACHE_CONTROL_DEVICE,
+        "device",
+        device_id,
+        reachability_prober.state_tag(device_id)
+    )
+    if not_modified:
+        return not_modified
+
     return await device_service.get_device(device_id)
 
-@router.put("/devices/{device_id}", response_model=ISGDevice)
+@router.put(
+    "/devices/{device_id}",
+    response_model=ISGDevice,
+    dependencies=[Depends(query_budget(5))],
+)
 async def update_device(
     device_id: int,
     device: ISGDeviceCreate,
@@ -58,7 +231,7 @@ async def update_device(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.delete("/devices/{device_id}")
+@router.delete("/devices/{device_id}", dependencies=[Depends(query_budget(4))])
 async def delete_device(
     device_id: int,
     device_service: DeviceService = Depends(get_device_service),
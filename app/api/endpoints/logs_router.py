@@ -1,32 +1,92 @@
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import Depends, APIRouter, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, APIRouter, Query, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from app.core.query_tracker import query_budget
 from app.core.security import get_current_user
-from app.db.repositories import log_repository
-from app.database import get_db
-from app.dependencies import get_log_service
+from app.core.serialization import json_response
+from app.db.counting import COUNT_STRATEGY_PATTERN
+from app.db.repositories.log_repository import LogRepository
+from app.database import get_read_sessionmaker
+from app.dependencies import get_log_read_service
 from app.models.models import User
 from app.schemas.log_schema import LogWithUser
 from app.schemas.pagination_schemas import PaginatedResponse
+from app.services.export_services import EXPORT_FORMAT_PATTERN, export_response
 from app.services.logs_services import LogService
 
 router = APIRouter(tags=["logs"])
 
 
-@router.get("/audit-logs/", response_model=PaginatedResponse[LogWithUser])
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """devicelog.timestamp holds naive UTC; an aware query value (``...Z``
+    or with an offset) is converted rather than compared as is."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+AUDIT_LOG_EXPORT_COLUMNS = [
+    "id", "timestamp", "user_id", "username",
+    "action", "object_type", "object_id", "details",
+]
+
+
+@router.get(
+    "/audit-logs/",
+    response_model=PaginatedResponse[LogWithUser],
+    dependencies=[Depends(query_budget(3))],
+)
 async def get_audit_logs(
+    response: Response,
     page_number: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     object_type: str = Query(None),
     object_id: int = Query(None),
-    log_service: LogService = Depends(get_log_service),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    cursor: str = Query(None),
+    count: str = Query(None, pattern=COUNT_STRATEGY_PATTERN),
+    log_service: LogService = Depends(get_log_read_service),
     current_user: User = Depends(get_current_user),
 ):
-    return await log_service.get_audit_logs(
+    page = await log_service.get_audit_logs(
         page_number=page_number,
         page_size=page_size,
         object_type=object_type,
         object_id=object_id,
-        user_id=current_user.id  )
+        user_id=current_user.id,
+        since=naive_utc(since),
+        until=naive_utc(until),
+        cursor=cursor,
+        count_strategy=count
+    )
+    return json_response(page, response)
+
 
+@router.get("/export", dependencies=[Depends(query_budget(2))])
+async def export_audit_logs(
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN),
+    compress: bool = Query(False),
+    object_type: str = Query(None),
+    object_id: int = Query(None),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    session_factory: async_sessionmaker = Depends(get_read_sessionmaker),
+    current_user: User = Depends(get_current_user),
+):
+    return export_response(
+        lambda db: LogService(LogRepository(db)).stream_audit_logs(
+            object_type=object_type,
+            object_id=object_id,
+            user_id=current_user.id,
+            since=naive_utc(since),
+            until=naive_utc(until)
+        ),
+        export_format=format,
+        columns=AUDIT_LOG_EXPORT_COLUMNS,
+        filename="audit-logs",
+        compress=compress,
+        session_factory=session_factory
+    )
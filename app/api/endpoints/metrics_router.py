@@ -0,0 +1,49 @@
+from typing import Iterable
+
+from fastapi import APIRouter, Response
+
+from app.core.hashing import password_hasher
+from app.core.metrics import CONTENT_TYPE, Family, registry
+from app.database import engine, read_engine
+from app.db.pool import pool_stats
+from app.services.mail_dispatcher import mail_dispatcher
+
+router = APIRouter(tags=["system"])
+
+# (metric, pool_stats key, type, help)
+POOL_METRICS = (
+    ("db_pool_size", "size", "gauge", "Connections the pool keeps open."),
+    ("db_pool_checked_out", "checked_out", "gauge", "Connections in use."),
+    ("db_pool_checked_in", "checked_in", "gauge", "Idle connections in the pool."),
+    ("db_pool_overflow", "overflow", "gauge", "Connections open beyond the pool size."),
+    ("db_pool_checkouts_total", "checkouts", "counter", "Connections handed out."),
+    ("db_pool_timeouts_total", "timeouts", "counter", "Checkouts that timed out waiting."),
+    ("db_pool_wait_seconds_total", "wait_seconds_total", "counter", "Time spent waiting for a connection."),
+)
+
+
+def _runtime_metrics() -> Iterable[Family]:
+    pools = [("primary", pool_stats(engine.pool))]
+    if read_engine is not None:
+        pools.append(("replica", pool_stats(read_engine.pool)))
+    for name, key, kind, help in POOL_METRICS:
+        yield name, kind, help, [((engine_name,), stats.get(key)) for engine_name, stats in pools], ("engine",)
+
+    hasher = password_hasher.stats()
+    yield "password_hash_pending", "gauge", "bcrypt operations queued or running.", [((), hasher["pending"])], ()
+    yield "password_hash_rejected_total", "counter", "bcrypt operations turned away with 503.", [((), hasher["rejected"])], ()
+
+    mail = mail_dispatcher.stats()
+    yield "mail_queue_depth", "gauge", "Messages waiting to be sent.", [((), mail["queue_depth"])], ()
+    yield "mail_in_flight", "gauge", "Messages being sent.", [((), mail["in_flight"])], ()
+    yield "mail_sent_total", "counter", "Messages sent.", [((), mail["sent"])], ()
+    yield "mail_failed_total", "counter", "Messages given up on.", [((), mail["failed"])], ()
+    yield "mail_rejected_total", "counter", "Messages refused because the queue was full.", [((), mail["rejected"])], ()
+
+
+registry.register_collector(_runtime_metrics)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,48 @@
+import asyncio
+
+from fastapi import Depends, APIRouter
+
+from app.core.etag import version_cache
+from app.core.hashing import password_hasher
+from app.core.principal_cache import principal_cache
+from app.core.query_tracker import query_tracking
+from app.core.rate_limit import rate_limit_backend
+from app.core.security import get_current_user
+from app.database import engine, read_engine, replica_monitor
+from app.db.archive import audit_log_archiver
+from app.db.audit_sink import audit_log_sink
+from app.db.partitions import devicelog_partitions
+from app.db.pool import pool_stats
+from app.models.models import User
+from app.services.command_executor import command_executor
+from app.services.discovery import discovery_scanner
+from app.services.mail_dispatcher import mail_dispatcher
+from app.services.reachability import reachability_prober
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/stats")
+async def get_stats(
+    current_user: User = Depends(get_current_user),
+):
+    stats = {
+        "db_pool": pool_stats(engine.pool),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "rate_limit": rate_limit_backend.stats(),
+        "mail": mail_dispatcher.stats(),
+        "audit_log_sink": audit_log_sink.stats(),
+        "audit_log_partitions": devicelog_partitions.stats(),
+        # Reloads the archive manifest from disk.
+        "audit_log_archive": await asyncio.to_thread(audit_log_archiver.stats),
+        "etag_versions": version_cache.stats(),
+        "reachability": reachability_prober.stats(),
+        "commands": command_executor.stats(),
+        "discovery": discovery_scanner.stats(),
+        "queries": query_tracking.stats(),
+    }
+    if read_engine is not None:
+        stats["db_replica_pool"] = pool_stats(read_engine.pool)
+        stats["db_replica"] = replica_monitor.stats()
+    return stats
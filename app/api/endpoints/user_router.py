@@ -2,13 +2,15 @@ import datetime
 
 from random import randint
 
-from fastapi import Depends, HTTPException, Response, APIRouter, BackgroundTasks
+from fastapi import Depends, HTTPException, Response, APIRouter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.principal_cache import principal_cache
 from app.core.security import get_current_user, set_access_cookies
 from app.db.repositories.user_repository import UserRepository
 from app.dependencies import get_auth_service, get_user_service
-from app.services.auth import authenticate_user, pwd_context, security, send_email_with_code
+from app.core.hashing import password_hasher
+from app.services.auth import authenticate_user, security, send_email_with_code
 from app.models.models import User
 from app.database import get_db
 from sqlalchemy.future import select
@@ -63,7 +65,7 @@ async def change_password(
     )
 
 @router.post("/request-password-reset")
-async def request_password_reset(request: PasswordResetRequest, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+async def request_password_reset(request: PasswordResetRequest, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(User).filter(User.email == request.email))
     user = result.scalar_one_or_none()
     if user is None:
@@ -76,16 +78,21 @@ async def request_password_reset(request: PasswordResetRequest, background_tasks
         user.reset_code = reset_code
         user.reset_code_expiration = expiration
         db.add(user)
-        await db.commit()
 
-        background_tasks.add_task(
-            send_email_with_code,
+        # Queued before the commit: when the mail queue is full (503) the
+        # code is never stored, so no valid but unsent code is left behind.
+        send_email_with_code(
             recipient=user.email,
             code=reset_code
         )
+        await db.commit()
+        principal_cache.invalidate(user.id)
 
         return {"message": "Verification code sent to email"}
 
+    except HTTPException:
+        raise
+
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -107,11 +114,12 @@ async def set_new_password(request: SetNewPasswordRequest, db: AsyncSession = De
     if len(request.new_password) < 8:
         raise HTTPException(status_code=400, detail="Password too short")
 
-    user.hashed_password = pwd_context.hash(request.new_password)
+    user.hashed_password = await password_hasher.hash(request.new_password)
     user.reset_code = None
     user.reset_code_expiration = None
     db.add(user)
     await db.commit()
+    principal_cache.invalidate(user.id)
 
     return {"message": "Password updated successfully"}
 
@@ -0,0 +1,57 @@
+import json
+from typing import Any, List
+
+from fastapi import HTTPException, Request, status
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+def _too_many(max_items: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"At most {max_items} items per request"
+    )
+
+
+async def read_bulk_items(request: Request, max_items: int) -> List[Any]:
+    """Items of a bulk request sent either as a JSON array or as NDJSON."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type in NDJSON_MEDIA_TYPES:
+        items = []
+        buffer = b""
+        line_number = 0
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    items.append(_parse_line(line, line_number))
+                    if len(items) > max_items:
+                        raise _too_many(max_items)
+        if buffer.strip():
+            items.append(_parse_line(buffer, line_number + 1))
+        if len(items) > max_items:
+            raise _too_many(max_items)
+        return items
+
+    try:
+        items = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array")
+    if len(items) > max_items:
+        raise _too_many(max_items)
+    return items
+
+
+def _parse_line(line: bytes, line_number: int) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Line {line_number} is not valid JSON"
+        )
@@ -9,18 +9,124 @@ class Settings(BaseSettings):
     PG_DB: str
     DOCKER_PORT: int
 
+    DB_ECHO: bool = False
+    DB_APPLICATION_NAME: str = "isg-api"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_WARMUP: int = 2
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_PGBOUNCER: bool = False
+
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: int | None = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5
+    DB_REPLICA_CHECK_INTERVAL: float = 5
+    READ_YOUR_WRITES_SECONDS: float = 5
+
     SMTP_SERVER: str
     SMTP_PORT: int
     EMAIL_SENDER: str
     EMAIL_PASSWORD: str
+    SMTP_USE_TLS: bool = True
+    SMTP_POOL_SIZE: int = 2
+    SMTP_BATCH_SIZE: int = 20
+    SMTP_QUEUE_SIZE: int = 1000
+    SMTP_IDLE_TIMEOUT: float = 60
+    SMTP_MAX_ATTEMPTS: int = 5
+    SMTP_MAX_BACKOFF: float = 30
 
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
 
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60
+
+    PASSWORD_HASH_EXECUTOR: str = "auto"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SQLITE_PATH: str = "/tmp/api-rate-limit.sqlite3"
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    RATE_LIMIT_IP_PER_MINUTE: float = 30
+    RATE_LIMIT_IP_BURST: float = 10
+    RATE_LIMIT_USER_PER_MINUTE: float = 10
+    RATE_LIMIT_USER_BURST: float = 5
+
+    PAGINATION_COUNT_STRATEGY: str = "exact"
+
+    METRICS_ENABLED: bool = True
+    METRICS_SQL_TIMING: bool = True
+
+    QUERY_TRACKING: bool = False
+    QUERY_REPEAT_THRESHOLD: int = 3
+    QUERY_BUDGET_ENFORCE: bool = False
+
+    DEVICE_BULK_MAX_ITEMS: int = 10000
+
+    ETAG_VERSION_CACHE_SECONDS: float = 1
+    CACHE_CONTROL_DEVICE: str = "private, no-cache"
+    CACHE_CONTROL_DEVICE_LIST: str = "private, no-cache"
+
+    AUDIT_LOG_MODE: str = "sync"
+    AUDIT_LOG_QUEUE_SIZE: int = 10000
+    AUDIT_LOG_BATCH_SIZE: int = 500
+    AUDIT_LOG_FLUSH_INTERVAL_MS: float = 200
+
+    AUDIT_LOG_PARTITION_INTERVAL: str = "month"
+    AUDIT_LOG_PARTITIONS_AHEAD: int = 3
+    AUDIT_LOG_RETENTION_DAYS: int | None = None
+    AUDIT_LOG_EXPIRED_PARTITIONS: str = "detach"
+    AUDIT_LOG_PARTITION_CHECK_INTERVAL: float = 3600
+
+    AUDIT_LOG_ARCHIVE_DIR: str = "audit-archive"
+    AUDIT_LOG_ARCHIVE_AFTER_DAYS: int | None = None
+    AUDIT_LOG_ARCHIVE_CHUNK_ROWS: int = 5000
+    AUDIT_LOG_ARCHIVE_CHECK_INTERVAL: float = 3600
+
+    REACHABILITY_ENABLED: bool = False
+    REACHABILITY_CONCURRENCY: int = 100
+    REACHABILITY_TIMEOUT: float = 2
+    REACHABILITY_INTERVAL: float = 60
+    REACHABILITY_MAX_BACKOFF: float = 900
+    REACHABILITY_JITTER: float = 0.1
+    REACHABILITY_REFRESH_INTERVAL: float = 10
+
+    COMMAND_TRANSPORT: str = "tcp-line"
+    COMMAND_CONCURRENCY: int = 50
+    COMMAND_TIMEOUT: float = 30
+    COMMAND_RETRIES: int = 2
+    COMMAND_RETRY_BACKOFF: float = 0.5
+    COMMAND_CONNECTION_IDLE_SECONDS: float = 60
+    COMMAND_MAX_IDLE_CONNECTIONS: int = 1000
+    COMMAND_MAX_TARGETS: int = 10000
+
+    DISCOVERY_CONCURRENCY: int = 500
+    DISCOVERY_TIMEOUT: float = 1
+    DISCOVERY_RATE: float = 1000
+    DISCOVERY_BURST: float = 100
+    DISCOVERY_HOST_RATE: float = 10
+    DISCOVERY_HOST_BURST: float = 5
+    DISCOVERY_MAX_SCANS: int = 2
+    DISCOVERY_MAX_TARGETS: int = 1048576
+    DISCOVERY_PROGRESS_INTERVAL: float = 1
+    DISCOVERY_REGISTER_BATCH: int = 500
+
     @property
     def DATABASE_URL_asyncpg(self):
         return f"postgresql+asyncpg://{self.PG_USER}:{self.PG_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.PG_DB}"
 
+    @property
+    def DATABASE_URL_replica_asyncpg(self):
+        port = self.DB_REPLICA_PORT or self.DB_PORT
+        return f"postgresql+asyncpg://{self.PG_USER}:{self.PG_PASSWORD}@{self.DB_REPLICA_HOST}:{port}/{self.PG_DB}"
+
     @property
     def DATABASE_URL_psycopg(self):
         # DSN
@@ -0,0 +1,96 @@
+import hashlib
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.config import settings
+
+
+class VersionCache:
+    """Last seen value of each change counter, kept for a short while so that
+    ``If-None-Match`` can be answered without a database round trip.
+
+    The cache is per process. A worker that did not make a write keeps
+    serving its cached version, so for up to ``ttl_seconds`` after a write
+    elsewhere it can answer 304 for a body that has changed. Writes in the
+    same process update the cache at once. A TTL of 0 turns the cache off.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Optional[int]:
+        entry = self._versions.get(name)
+        if entry is None or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, name: str, version: int) -> None:
+        entry = self._versions.get(name)
+        if entry is not None and entry[1] > time.monotonic():
+            # A lagging replica must not roll a fresher value back.
+            version = max(version, entry[0])
+        self._versions[name] = (version, time.monotonic() + self.ttl_seconds)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "versions": {name: version for name, (version, _) in self._versions.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+version_cache = VersionCache(settings.ETAG_VERSION_CACHE_SECONDS)
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def query_digest(request: Request) -> str:
+    items = sorted(request.query_params.multi_items())
+    return hashlib.blake2b(repr(items).encode(), digest_size=8).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison.
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+async def conditional_get(
+        request: Request,
+        response: Response,
+        get_version: Callable[..., Awaitable[int]],
+        cache_control: str,
+        *parts
+) -> Optional[Response]:
+    """Returns a 304 response when the client's copy is still current,
+    otherwise sets ``ETag``/``Cache-Control`` on ``response`` and returns None.
+
+    The version is read before the resource itself, so the ETag sent with a
+    200 can only be older than the body, never newer. A 304 may rest on a
+    cached version; see ``VersionCache`` for how stale that can be.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etag = make_etag(*parts, await get_version(cached=True))
+        if etag_matches(if_none_match, etag):
+            return Response(
+                status_code=304,
+                headers={"ETag": etag, "Cache-Control": cache_control}
+            )
+
+    response.headers["ETag"] = make_etag(*parts, await get_version())
+    response.headers["Cache-Control"] = cache_control
+    return None
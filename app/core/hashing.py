@@ -0,0 +1,111 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.exc import MissingBackendError
+
+from app.core.config import settings
+from app.core.metrics import password_hash_seconds
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a worker pool so it never blocks the event loop.
+
+    At most ``max_pending`` operations may be queued or running at once;
+    anything beyond that is rejected with 503 instead of piling up.
+    """
+
+    def __init__(self, executor_kind: str, max_workers: int, max_pending: int):
+        if executor_kind not in ("auto", "thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    def _resolve_executor_kind(self) -> str:
+        # Resolved on first use, not at import, so the app still imports
+        # when no bcrypt backend is installed.
+        if self.executor_kind == "auto":
+            try:
+                backend = pwd_context.handler("bcrypt").get_backend()
+            except MissingBackendError as e:
+                raise RuntimeError(
+                    "No bcrypt backend is available; install the bcrypt package "
+                    "(see requirements.txt)"
+                ) from e
+            # The bcrypt package releases the GIL while hashing; passlib's
+            # fallback backends (os_crypt, builtin) hold it, so only other
+            # processes keep the event loop running alongside them.
+            self.executor_kind = "thread" if backend == "bcrypt" else "process"
+        return self.executor_kind
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._resolve_executor_kind() == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+            password_hash_seconds.observe(time.perf_counter() - started, (operation,))
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", _verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    executor_kind=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -0,0 +1,61 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+
+NEXT = "next"
+PREV = "prev"
+
+
+def encode_cursor(key: Sequence[Any], direction: str) -> str:
+    raw = json.dumps({"k": list(key), "d": direction}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[list, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key, direction = data["k"], data["d"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    if direction not in (NEXT, PREV) or not isinstance(key, list) or not key:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return key, direction
+
+
+def build_cursors(
+        rows: List[Any],
+        key_of: Callable[[Any], Sequence[Any]],
+        direction: Optional[str],
+        has_more: bool,
+        page_number: Optional[int] = None,
+        key: Optional[Sequence[Any]] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Cursors pointing either side of ``rows``.
+
+    ``direction`` is the one the page was fetched in (``None`` for page-number
+    mode) and ``has_more`` tells whether more rows exist in that direction.
+    """
+    if direction is None:
+        has_next, has_prev = has_more, (page_number or 1) > 1
+    elif direction == NEXT:
+        has_next, has_prev = has_more, True
+    else:
+        has_next, has_prev = True, has_more
+
+    if not rows:
+        # Stepped past the end: offer the way back from the cursor we came in on.
+        if key is None:
+            return None, None
+        return (
+            encode_cursor(key, NEXT) if direction == PREV else None,
+            encode_cursor(key, PREV) if direction == NEXT else None,
+        )
+
+    next_cursor = encode_cursor(key_of(rows[-1]), NEXT) if has_next else None
+    prev_cursor = encode_cursor(key_of(rows[0]), PREV) if has_prev else None
+    return next_cursor, prev_cursor
@@ -0,0 +1,115 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.models import User
+
+PrincipalKey = Tuple[int, int]
+
+
+class PrincipalCache:
+    """Bounded TTL cache of authenticated users keyed by (user id, token exp).
+
+    Only column values are stored; every hit builds a fresh detached ``User``
+    so no ORM instance is ever shared between sessions.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[PrincipalKey, Tuple[float, dict]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[PrincipalKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, user_id: int, exp: int) -> Optional[User]:
+        if not self.enabled:
+            return None
+
+        key = (user_id, exp)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, values = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, user: User, exp: int) -> None:
+        if not self.enabled:
+            return
+
+        # Never keep a principal around longer than the token it came from.
+        ttl = min(self.ttl_seconds, exp - time.time())
+        if ttl <= 0:
+            return
+
+        key = (user.id, exp)
+        values = {c.name: getattr(user, c.name) for c in User.__table__.columns}
+        self._entries[key] = (time.monotonic() + ttl, values)
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user.id, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            oldest, _ = self._entries.popitem(last=False)
+            self._forget_key(oldest)
+            self.evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        keys = self._keys_by_user.pop(user_id, set())
+        for key in keys:
+            self._entries.pop(key, None)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: PrincipalKey) -> None:
+        self._entries.pop(key, None)
+        self._forget_key(key)
+
+    def _forget_key(self, key: PrincipalKey) -> None:
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,219 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s")
+# Expanded IN lists and multi-row VALUES differ only in how many
+# parameters went into them.
+_IN_LIST = re.compile(r"\bIN \(\?[^()]*\)")
+_VALUES_ROWS = re.compile(r"\bVALUES (\([^()]*\))(?:, \([^()]*\))+")
+
+_current: ContextVar[Optional["QueryTracker"]] = ContextVar("query_tracker", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    shape = _PLACEHOLDER.sub("?", " ".join(statement.split()))
+    shape = _IN_LIST.sub("IN (?, ...)", shape)
+    return _VALUES_ROWS.sub(r"VALUES \1, ...", shape)
+
+
+class QueryTracker:
+    """Statements issued within one request (or one ``track_queries``
+    block). Trackers nest: a statement is recorded by the innermost one and
+    every tracker around it."""
+
+    def __init__(self, budget: Optional[int] = None, parent: Optional["QueryTracker"] = None):
+        self.budget = budget
+        self.parent = parent
+        self.route: Optional[str] = None
+        # (statement, duration in ms, executemany)
+        self.statements: List[Tuple[str, float, bool]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def duration_ms(self) -> float:
+        return sum(duration for _, duration, _ in self.statements)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.count > self.budget
+
+    def record(self, statement: str, duration_ms: float, executemany: bool) -> None:
+        tracker = self
+        while tracker is not None:
+            tracker.statements.append((statement, duration_ms, executemany))
+            tracker = tracker.parent
+
+    def repeated(self, threshold: int = 2) -> Dict[str, int]:
+        """Statement shapes issued at least ``threshold`` times, the usual
+        sign of a query run once per row of an earlier one."""
+        shapes = Counter(statement_shape(statement) for statement, _, _ in self.statements)
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+    def report(self, threshold: int = 2, max_length: int = 300) -> str:
+        lines = [f"{self.route or '<no route>'}: {self.count} statements in {self.duration_ms:.1f} ms"
+                 + (f", budget {self.budget}" if self.budget is not None else "")]
+        repeated = self.repeated(threshold)
+        if repeated:
+            lines.append("repeated:")
+            lines += [f"  {count}x {shape[:max_length]}" for shape, count in repeated.items()]
+        lines.append("statements:")
+        lines += [
+            f"  {i}. {duration:.2f} ms{' (executemany)' if many else ''} "
+            f"{' '.join(statement.split())[:max_length]}"
+            for i, (statement, duration, many) in enumerate(self.statements, 1)
+        ]
+        return "\n".join(lines)
+
+
+def current_tracker() -> Optional[QueryTracker]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries(budget: Optional[int] = None) -> Iterator[QueryTracker]:
+    """Records the statements issued inside the block, including those of
+    requests served in the same task (e.g. through httpx's ASGI transport),
+    and raises ``QueryBudgetExceeded`` on exit if there were more than
+    ``budget``."""
+    tracker = QueryTracker(budget, parent=_current.get())
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+    if tracker.over_budget:
+        raise QueryBudgetExceeded(tracker.report())
+
+
+def query_budget(max_statements: int):
+    """Route dependency declaring how many statements the route may issue."""
+    async def set_budget(request: Request) -> None:
+        tracker = _current.get()
+        if tracker is not None:
+            tracker.budget = max_statements
+            tracker.route = f"{request.method} {request.scope['route'].path}"
+    return set_budget
+
+
+class QueryTracking:
+    def __init__(self, enabled: bool = False, repeat_threshold: int = 3, enforce_budgets: bool = False):
+        self.enabled = enabled
+        self.repeat_threshold = repeat_threshold
+        self.enforce_budgets = enforce_budgets
+
+        self.requests = 0
+        self.statements = 0
+        self.repeated_requests = 0
+        self.over_budget_requests = 0
+        self.max_statements = 0
+        self.max_statements_route: Optional[str] = None
+
+    def install(self, engine: AsyncEngine) -> None:
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            tracker = _current.get()
+            if tracker is None:
+                return
+            if self.enforce_budgets and tracker.budget is not None and tracker.count >= tracker.budget:
+                tracker.record(statement, 0.0, executemany)
+                raise QueryBudgetExceeded(tracker.report(self.repeat_threshold))
+            context._query_tracker_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            tracker = _current.get()
+            started: Optional[float] = getattr(context, "_query_tracker_started", None)
+            if tracker is not None and started is not None:
+                tracker.record(statement, (time.perf_counter() - started) * 1000, executemany)
+
+    def finish(self, tracker: QueryTracker) -> None:
+        self.requests += 1
+        self.statements += tracker.count
+        if tracker.count > self.max_statements:
+            self.max_statements = tracker.count
+            self.max_statements_route = tracker.route
+
+        repeated = bool(tracker.repeated(self.repeat_threshold))
+        self.repeated_requests += repeated
+        self.over_budget_requests += tracker.over_budget
+        if repeated or tracker.over_budget:
+            logger.warning(
+                "%s:\n%s",
+                "Query budget exceeded" if tracker.over_budget else "Repeated statements",
+                tracker.report(self.repeat_threshold)
+            )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "statements": self.statements,
+            "repeated_requests": self.repeated_requests,
+            "over_budget_requests": self.over_budget_requests,
+            "max_statements": self.max_statements,
+            "max_statements_route": self.max_statements_route,
+            "repeat_threshold": self.repeat_threshold,
+            "enforce_budgets": self.enforce_budgets,
+        }
+
+
+class QueryTrackerMiddleware:
+    """Gives every HTTP request its own tracker, reports the statement
+    count in ``X-Query-Count`` and logs requests that repeated a statement
+    or went over their route's budget."""
+
+    def __init__(self, app: ASGIApp, tracking: "QueryTracking"):
+        self.app = app
+        self.tracking = tracking
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = QueryTracker(parent=_current.get())
+
+        async def send_with_count(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Query-Count", str(tracker.count))
+            await send(message)
+
+        token = _current.set(tracker)
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            tracker.route = f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+            self.tracking.finish(tracker)
+
+
+query_tracking = QueryTracking(
+    enabled=settings.QUERY_TRACKING,
+    repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+    enforce_budgets=settings.QUERY_BUDGET_ENFORCE,
+)
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from http.cookies import SimpleCookie
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+import jwt
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+AUTH_RATE_LIMITED_PATHS = {
+    "/api/v1/auth/login": "username",
+    "/api/v1/auth/register": "username",
+    "/api/v1/auth/change-password": "token",
+    "/api/v1/auth/request-password-reset": "email",
+}
+
+MAX_INSPECTED_BODY = 64 * 1024
+
+
+class RateLimitBackend(ABC):
+    """Storage for token buckets.
+
+    ``consume`` takes one token from the bucket ``key`` and returns how many
+    seconds the caller has to wait; ``0`` means the request is allowed.
+    """
+
+    rejected = 0
+
+    @abstractmethod
+    async def consume(self, key: str, rate: float, capacity: float) -> float:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+def _take_token(
+        state: Optional[Tuple[float, float]],
+        now: float,
+        rate: float,
+        capacity: float
+) -> Tuple[Tuple[float, float], float]:
+    if state is None:
+        tokens = capacity
+    else:
+        tokens, updated = state
+        tokens = min(capacity, tokens + (now - updated) * rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets in an LRU map; the least recently seen key is
+    evicted once ``max_keys`` is reached."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.evictions = 0
+
+    async def consume(self, key: str, rate: float, capacity: float) -> float:
+        state, retry_after = _take_token(
+            self._buckets.get(key), time.monotonic(), rate, capacity
+        )
+        self._buckets[key] = state
+        self._buckets.move_to_end(key)
+
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+        }
+
+
+class SqliteRateLimitBackend(RateLimitBackend):
+    """Buckets in a local SQLite file so every worker on the host shares the
+    same limits."""
+
+    def __init__(self, path: str, max_keys: int):
+        self.path = path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path,
+            timeout=5,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._calls = 0
+
+    def _consume(self, key: str, rate: float, capacity: float) -> float:
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                state, retry_after = _take_token(row, now, rate, capacity)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                    (key, state[0], state[1])
+                )
+
+                self._calls += 1
+                if self._calls % 1000 == 0:
+                    self._evict()
+
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return retry_after
+
+    def _evict(self) -> None:
+        self._conn.execute(
+            "DELETE FROM buckets WHERE key IN ("
+            "SELECT key FROM buckets ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,)
+        )
+
+    async def consume(self, key: str, rate: float, capacity: float) -> float:
+        return await asyncio.to_thread(self._consume, key, rate, capacity)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "max_keys": self.max_keys,
+            "rejected": self.rejected,
+        }
+
+
+def create_rate_limit_backend() -> RateLimitBackend:
+    if settings.RATE_LIMIT_BACKEND == "sqlite":
+        return SqliteRateLimitBackend(
+            settings.RATE_LIMIT_SQLITE_PATH,
+            settings.RATE_LIMIT_MAX_KEYS
+        )
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return InMemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+    raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+
+
+class RateLimitMiddleware:
+    """Per-IP and per-identity token buckets for the auth endpoints.
+
+    Runs before routing, so a rejected request never opens a DB session or
+    reaches bcrypt. The identity is read from the (small) request body or
+    from the access token and the body is then replayed to the app. A rate
+    of 0 per minute turns that limit off.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            backend: RateLimitBackend,
+            paths: Dict[str, str] = None,
+            ip_per_minute: float = None,
+            ip_burst: float = None,
+            user_per_minute: float = None,
+            user_burst: float = None,
+    ):
+        self.app = app
+        self.backend = backend
+        self.paths = AUTH_RATE_LIMITED_PATHS if paths is None else paths
+        if ip_per_minute is None:
+            ip_per_minute = settings.RATE_LIMIT_IP_PER_MINUTE
+        if ip_burst is None:
+            ip_burst = settings.RATE_LIMIT_IP_BURST
+        if user_per_minute is None:
+            user_per_minute = settings.RATE_LIMIT_USER_PER_MINUTE
+        if user_burst is None:
+            user_burst = settings.RATE_LIMIT_USER_BURST
+        self.ip_rate = ip_per_minute / 60
+        self.ip_burst = ip_burst
+        self.user_rate = user_per_minute / 60
+        self.user_burst = user_burst
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self.ip_rate and await self.backend.consume(
+            f"ip:{scope['path']}:{self._client_ip(scope)}",
+            self.ip_rate,
+            self.ip_burst
+        )
+        if retry_after:
+            await self._reject(scope, receive, send, retry_after)
+            return
+
+        identity_field = self.paths[scope["path"]]
+        if identity_field == "token":
+            body = None
+            identity = self._token_subject(scope)
+        else:
+            body, complete = await self._read_body(receive)
+            identity = self._body_field(scope, body, identity_field) if complete else None
+
+        if identity and self.user_rate:
+            retry_after = await self.backend.consume(
+                f"user:{scope['path']}:{identity}",
+                self.user_rate,
+                self.user_burst
+            )
+            if retry_after:
+                await self._reject(scope, receive, send, retry_after)
+                return
+
+        if body is not None:
+            receive = self._replay(body, complete, receive)
+        await self.app(scope, receive, send)
+
+    def _client_ip(self, scope: Scope) -> str:
+        if settings.RATE_LIMIT_TRUST_FORWARDED:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @staticmethod
+    def _header(scope: Scope, header: bytes) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == header:
+                return value.decode("latin-1")
+        return None
+
+    def _token_subject(self, scope: Scope) -> Optional[str]:
+        token = None
+        authorization = self._header(scope, b"authorization")
+        if authorization and authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+        else:
+            cookie_header = self._header(scope, b"cookie")
+            if cookie_header:
+                morsel = SimpleCookie(cookie_header).get("access_token")
+                token = morsel.value if morsel else None
+        if not token:
+            return None
+
+        try:
+            payload = jwt.decode(
+                token,
+                settings.JWT_SECRET_KEY,
+                algorithms=[settings.JWT_ALGORITHM]
+            )
+        except jwt.PyJWTError:
+            return None
+        return payload.get("sub")
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> Tuple[bytes, bool]:
+        """Reads the body until it ends or grows past MAX_INSPECTED_BODY;
+        the flag tells whether all of it was read."""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return b"".join(chunks), True
+            chunk = message.get("body", b"")
+            chunks.append(chunk)
+            size += len(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks), True
+            if size > MAX_INSPECTED_BODY:
+                return b"".join(chunks), False
+
+    def _body_field(self, scope: Scope, body: bytes, field: str) -> Optional[str]:
+        if not body or len(body) > MAX_INSPECTED_BODY:
+            return None
+
+        content_type = (self._header(scope, b"content-type") or "").lower()
+        try:
+            if content_type.startswith("application/json"):
+                data = json.loads(body)
+                value = data.get(field) if isinstance(data, dict) else None
+            elif content_type.startswith("application/x-www-form-urlencoded"):
+                value = parse_qs(body.decode("utf-8")).get(field, [None])[0]
+            else:
+                return None
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+        return str(value).strip().lower() if value else None
+
+    @staticmethod
+    def _replay(body: bytes, complete: bool, receive: Receive) -> Receive:
+        sent = False
+
+        async def replay() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": not complete}
+            return await receive()
+
+        return replay
+
+    async def _reject(
+            self,
+            scope: Scope,
+            receive: Receive,
+            send: Send,
+            retry_after: float
+    ) -> None:
+        self.backend.rejected += 1
+        response = JSONResponse(
+            {"detail": "Too many requests"},
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
+
+
+rate_limit_backend = create_rate_limit_backend()
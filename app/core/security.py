@@ -5,8 +5,8 @@ import jwt
 from fastapi import Depends, Cookie, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
-from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.principal_cache import principal_cache
 from app.services.auth import JWT_ALGORITHM, JWT_SECRET_KEY
 from app.db.repositories.user_repository import get_user_by_id
 from app.database import get_db
@@ -14,7 +14,6 @@ from app.database import get_db
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 async def get_current_user(
@@ -50,11 +49,26 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = await get_user_by_id(db, user_id)
-    if not user:
+    exp = payload.get("exp")
+    user = None
+    if str(user_id).isdigit() and exp is not None:
+        user = principal_cache.get(int(user_id), exp)
+
+    if user is None:
+        user = await get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
+            )
+        if exp is not None:
+            principal_cache.set(user, exp)
+
+    if user.is_active is False:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
         )
     return user
 
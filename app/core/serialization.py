@@ -0,0 +1,26 @@
+from typing import Any, Iterable, Optional
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+
+def dump_rows(adapter: TypeAdapter, rows: Iterable[Any]) -> list:
+    """Validates row mappings once against a precompiled adapter of TypedDict
+    rows; the result is already plain data ready for orjson."""
+    return adapter.validate_python(rows)
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> ORJSONResponse:
+    """Returns already-serialized data without FastAPI validating it again
+    against the route's response_model.
+
+    Headers set on the injected ``response`` (ETag, cookies, ...) are kept,
+    which FastAPI would otherwise drop for a returned Response.
+    """
+    fast_response = ORJSONResponse(content)
+    if response is not None:
+        fast_response.raw_headers.extend(
+            header for header in response.raw_headers if header[0] != b"content-length"
+        )
+    return fast_response
@@ -0,0 +1,491 @@
+import asyncio
+import gzip
+import logging
+import mmap
+import os
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import orjson
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.database import engine
+from app.db.repositories.log_repository import AUDIT_LOG_COLUMNS
+from app.models.models import DeviceLog, User
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+Key = Tuple[datetime, int]
+
+
+class ArchiveFilter(NamedTuple):
+    object_type: Optional[str] = None
+    object_id: Optional[int] = None
+    user_id: Optional[int] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    def matches(self, row: dict) -> bool:
+        return (
+            (not self.object_type or row["object_type"] == self.object_type)
+            and (not self.object_id or row["object_id"] == self.object_id)
+            and (not self.user_id or row["user_id"] == self.user_id)
+            and (not self.since or row["timestamp"] >= self.since)
+            and (not self.until or row["timestamp"] < self.until)
+        )
+
+
+def _key(value: list) -> Key:
+    return datetime.fromisoformat(value[0]), value[1]
+
+
+class Chunk:
+    """One independently gzipped run of JSONL rows inside a segment file,
+    described by its index entry."""
+
+    def __init__(self, entry: dict):
+        self.offset = entry["offset"]
+        self.length = entry["length"]
+        self.rows = entry["rows"]
+        self.min_key = _key(entry["min_key"])
+        self.max_key = _key(entry["max_key"])
+        self.users = {int(user_id): count for user_id, count in entry["users"].items()}
+        self.object_types = set(entry["object_types"])
+
+    def may_match(self, f: ArchiveFilter, lower: Optional[Key], upper: Optional[Key]) -> bool:
+        if f.user_id and f.user_id not in self.users:
+            return False
+        if f.object_type and f.object_type not in self.object_types:
+            return False
+        if f.since and self.max_key[0] < f.since:
+            return False
+        if f.until and self.min_key[0] >= f.until:
+            return False
+        if lower and self.max_key <= lower:
+            return False
+        if upper and self.min_key >= upper:
+            return False
+        return True
+
+    def count(self, f: ArchiveFilter, lower: Optional[Key], upper: Optional[Key]) -> Optional[int]:
+        """Matching rows, when the index alone can tell."""
+        if f.object_type or f.object_id:
+            return None
+        if (f.since and self.min_key[0] < f.since) or (f.until and self.max_key[0] >= f.until):
+            return None
+        if (lower and self.min_key <= lower) or (upper and self.max_key >= upper):
+            return None
+        return self.users.get(f.user_id, 0) if f.user_id else self.rows
+
+
+class Segment:
+    def __init__(self, directory: str, entry: dict):
+        self.path = os.path.join(directory, entry["file"])
+        self.lower = datetime.fromisoformat(entry["lower"])
+        self.upper = datetime.fromisoformat(entry["upper"])
+        self.rows = entry["rows"]
+        with open(os.path.join(directory, entry["index"]), "rb") as f:
+            self.chunks = [Chunk(chunk) for chunk in orjson.loads(f.read())]
+
+    def read_chunk(self, mapped: mmap.mmap, chunk: Chunk) -> List[dict]:
+        raw = zlib.decompress(mapped[chunk.offset:chunk.offset + chunk.length], wbits=31)
+        rows = [orjson.loads(line) for line in raw.splitlines()]
+        for row in rows:
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        return rows
+
+
+class SegmentWriter:
+    """Writes rows (ascending by timestamp, id) chunk by chunk into a new
+    segment; nothing is visible until ``close`` renames the files into place."""
+
+    def __init__(self, directory: str, lower: datetime, upper: datetime):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lower = lower
+        self.upper = upper
+        name = f"devicelog-{lower:%Y%m%dT%H%M%S}-{upper:%Y%m%dT%H%M%S}"
+        self.data_file, self.index_file = f"{name}.jsonl.gz", f"{name}.idx.json"
+        self._out = open(self._path(self.data_file) + ".tmp", "wb")
+        self._index = []
+        self._offset = 0
+        self.rows = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def write_chunk(self, rows: List[dict]) -> None:
+        if not rows:
+            return
+        payload = b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        compressed = gzip.compress(payload, compresslevel=6, mtime=0)
+        self._out.write(compressed)
+
+        users: Dict[str, int] = {}
+        for row in rows:
+            if row["user_id"] is not None:
+                users[str(row["user_id"])] = users.get(str(row["user_id"]), 0) + 1
+        self._index.append({
+            "offset": self._offset,
+            "length": len(compressed),
+            "rows": len(rows),
+            "min_key": [rows[0]["timestamp"].isoformat(), rows[0]["id"]],
+            "max_key": [rows[-1]["timestamp"].isoformat(), rows[-1]["id"]],
+            "users": users,
+            "object_types": sorted({row["object_type"] for row in rows}),
+        })
+        self._offset += len(compressed)
+        self.rows += len(rows)
+
+    def close(self) -> Optional[dict]:
+        """Returns the manifest entry, or None when no rows were written."""
+        self._out.flush()
+        os.fsync(self._out.fileno())
+        self._out.close()
+        if not self.rows:
+            os.remove(self._path(self.data_file) + ".tmp")
+            return None
+
+        with open(self._path(self.index_file) + ".tmp", "wb") as out:
+            out.write(orjson.dumps(self._index))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(self._path(self.data_file) + ".tmp", self._path(self.data_file))
+        os.replace(self._path(self.index_file) + ".tmp", self._path(self.index_file))
+        return {
+            "file": self.data_file,
+            "index": self.index_file,
+            "lower": self.lower.isoformat(),
+            "upper": self.upper.isoformat(),
+            "rows": self.rows,
+        }
+
+    def abort(self) -> None:
+        self._out.close()
+        os.remove(self._path(self.data_file) + ".tmp")
+
+
+class AuditLogArchive:
+    """Audit logs moved out of Postgres into gzip-compressed JSONL segments.
+
+    Each segment covers a time range and consists of independently gzipped
+    chunks, so a query decompresses only the chunks its index entries
+    (time/key range, users, object types) say can match. Segments are read
+    through mmap. ``archived_until`` is the boundary: everything older lives
+    here, everything newer in the database.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._manifest_mtime: Optional[tuple] = None
+        self._segments: List[Segment] = []
+        self.archived_until: Optional[datetime] = None
+        self.chunks_read = 0
+        self.chunks_skipped = 0
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path(), "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return {"archived_until": None, "segments": []}
+
+    def refresh(self) -> None:
+        # Another worker may have archived in the meantime.
+        try:
+            stat = os.stat(self._manifest_path())
+            mtime = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            manifest = self._load_manifest()
+            self._segments = sorted(
+                (Segment(self.directory, entry) for entry in manifest["segments"]),
+                key=lambda segment: segment.lower
+            )
+            until = manifest["archived_until"]
+            self.archived_until = datetime.fromisoformat(until) if until else None
+            self._manifest_mtime = mtime
+
+    def covers(self, since: Optional[datetime]) -> bool:
+        """Whether a query starting at ``since`` reaches into the archive."""
+        self.refresh()
+        return self.archived_until is not None and (since is None or since < self.archived_until)
+
+    def _iter_rows(
+            self,
+            f: ArchiveFilter,
+            descending: bool,
+            lower: Optional[Key] = None,
+            upper: Optional[Key] = None,
+            skip: int = 0
+    ) -> Iterator[dict]:
+        segments = reversed(self._segments) if descending else self._segments
+        for segment in segments:
+            if (f.since and segment.upper <= f.since) or (f.until and segment.lower >= f.until):
+                continue
+            with open(segment.path, "rb") as file, \
+                    mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                chunks = reversed(segment.chunks) if descending else segment.chunks
+                for chunk in chunks:
+                    if not chunk.may_match(f, lower, upper):
+                        self.chunks_skipped += 1
+                        continue
+                    known = chunk.count(f, lower, upper) if skip else None
+                    if known is not None and known <= skip:
+                        skip -= known
+                        self.chunks_skipped += 1
+                        continue
+
+                    self.chunks_read += 1
+                    rows = segment.read_chunk(mapped, chunk)
+                    if descending:
+                        rows.reverse()
+                    for row in rows:
+                        key = (row["timestamp"], row["id"])
+                        if (lower and key <= lower) or (upper and key >= upper):
+                            continue
+                        if not f.matches(row):
+                            continue
+                        if skip:
+                            skip -= 1
+                            continue
+                        yield row
+
+    def read(
+            self,
+            f: ArchiveFilter,
+            limit: int,
+            offset: int = 0,
+            after: Optional[Key] = None,
+            before: Optional[Key] = None
+    ) -> List[dict]:
+        """Newest-first rows older than ``after``, or, with ``before``, the
+        rows just newer than it in ascending order."""
+        self.refresh()
+        if before is not None:
+            rows = self._iter_rows(f, descending=False, lower=before)
+        else:
+            rows = self._iter_rows(f, descending=True, upper=after, skip=offset)
+        result = []
+        for row in rows:
+            result.append(row)
+            if len(result) >= limit:
+                break
+        return result
+
+    def count(self, f: ArchiveFilter) -> int:
+        self.refresh()
+        total = 0
+        for segment in self._segments:
+            if (f.since and segment.upper <= f.since) or (f.until and segment.lower >= f.until):
+                continue
+            pending = []
+            for chunk in segment.chunks:
+                if not chunk.may_match(f, None, None):
+                    continue
+                known = chunk.count(f, None, None)
+                if known is None:
+                    pending.append(chunk)
+                else:
+                    total += known
+            if pending:
+                with open(segment.path, "rb") as file, \
+                        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for chunk in pending:
+                        self.chunks_read += 1
+                        total += sum(1 for row in segment.read_chunk(mapped, chunk) if f.matches(row))
+        return total
+
+    def open_segment(self, lower: datetime, upper: datetime) -> "SegmentWriter":
+        return SegmentWriter(self.directory, lower, upper)
+
+    def commit(self, archived_until: datetime, segment: Optional[dict]) -> None:
+        """Atomically records a new segment and moves the hot/cold boundary."""
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self._load_manifest()
+        if segment is not None:
+            manifest["segments"].append(segment)
+        manifest["archived_until"] = archived_until.isoformat()
+
+        path = self._manifest_path()
+        with open(path + ".tmp", "wb") as out:
+            out.write(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(path + ".tmp", path)
+        self.refresh()
+
+    def stats(self) -> dict:
+        self.refresh()
+        return {
+            "directory": self.directory,
+            "archived_until": self.archived_until.isoformat() if self.archived_until else None,
+            "segments": len(self._segments),
+            "rows": sum(segment.rows for segment in self._segments),
+            "chunks_read": self.chunks_read,
+            "chunks_skipped": self.chunks_skipped,
+        }
+
+
+class AuditLogArchiver:
+    """Moves audit logs older than ``after_days`` (whole days) from the
+    database into the archive, then deletes them from the database.
+
+    The manifest is committed before the delete. If the process dies in
+    between, the next run deletes the leftovers first, and queries never read
+    database rows older than the boundary anyway.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            archive: AuditLogArchive,
+            after_days: Optional[int],
+            chunk_rows: int,
+            check_interval: float
+    ):
+        self.engine = engine
+        self.archive = archive
+        self.after_days = after_days
+        self.chunk_rows = chunk_rows
+        self.check_interval = check_interval
+        self.lock_key = zlib.crc32(b"archive:devicelog")
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.archived_rows = 0
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._task is not None or self.after_days is None:
+            return
+        if self.engine.dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._run(), name="audit-log-archiver")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.exception("Audit log archiving failed")
+            await asyncio.sleep(self.check_interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        now = now or datetime.utcnow()
+        cutoff = (now - timedelta(days=self.after_days)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+
+        async with self.engine.connect() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+            )
+            await conn.commit()
+            if not locked:
+                return 0
+            try:
+                await asyncio.to_thread(self.archive.refresh)
+                lower = self.archive.archived_until
+                if lower is not None:
+                    await self._delete_before(conn, lower)
+                if lower is not None and cutoff <= lower:
+                    return 0
+
+                query = select(*AUDIT_LOG_COLUMNS).outerjoin(
+                    User, User.id == DeviceLog.user_id
+                ).where(
+                    DeviceLog.timestamp < cutoff
+                ).order_by(
+                    DeviceLog.timestamp, DeviceLog.id
+                ).execution_options(yield_per=self.chunk_rows)
+                if lower is not None:
+                    query = query.where(DeviceLog.timestamp >= lower)
+
+                oldest = lower or await conn.scalar(
+                    select(DeviceLog.timestamp).order_by(DeviceLog.timestamp).limit(1)
+                ) or cutoff
+                writer = await asyncio.to_thread(self.archive.open_segment, oldest, cutoff)
+                try:
+                    result = await conn.stream(query)
+                    async for partition in result.mappings().partitions(self.chunk_rows):
+                        await asyncio.to_thread(
+                            writer.write_chunk, [dict(row) for row in partition]
+                        )
+                    await conn.commit()
+                except BaseException:
+                    await asyncio.to_thread(writer.abort)
+                    raise
+
+                segment = await asyncio.to_thread(writer.close)
+                rows = writer.rows
+                await asyncio.to_thread(self.archive.commit, cutoff, segment)
+                await self._delete_before(conn, cutoff)
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key}
+                )
+                await conn.commit()
+
+        self.runs += 1
+        self.archived_rows += rows
+        self.last_run_at = time.time()
+        self.last_error = None
+        if rows:
+            logger.info("Archived %d audit log rows older than %s", rows, cutoff)
+        return rows
+
+    async def _delete_before(self, conn, boundary: datetime) -> None:
+        await conn.execute(delete(DeviceLog).where(DeviceLog.timestamp < boundary))
+        await conn.commit()
+
+    def stats(self) -> dict:
+        return {
+            **self.archive.stats(),
+            "after_days": self.after_days,
+            "runs": self.runs,
+            "failures": self.failures,
+            "archived_rows": self.archived_rows,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
+
+
+audit_log_archive = AuditLogArchive(settings.AUDIT_LOG_ARCHIVE_DIR)
+
+audit_log_archiver = AuditLogArchiver(
+    engine,
+    audit_log_archive,
+    after_days=settings.AUDIT_LOG_ARCHIVE_AFTER_DAYS,
+    chunk_rows=settings.AUDIT_LOG_ARCHIVE_CHUNK_ROWS,
+    check_interval=settings.AUDIT_LOG_ARCHIVE_CHECK_INTERVAL,
+)
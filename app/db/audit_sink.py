@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.models.models import DeviceLog
+
+logger = logging.getLogger(__name__)
+
+SYNC = "sync"
+ASYNC = "async"
+
+_STOP = object()
+
+
+class AuditLogSink:
+    """Buffers DeviceLog rows and writes them with one multi-row insert per
+    batch.
+
+    A batch is flushed once ``batch_size`` rows are queued or
+    ``flush_interval_ms`` has passed since its first row. In ``sync`` mode
+    the sink is bypassed and every entry is written in the caller's
+    transaction instead.
+    """
+
+    def __init__(
+            self,
+            mode: str,
+            max_queue: int,
+            batch_size: int,
+            flush_interval_ms: float,
+            max_attempts: int = 3,
+            session_factory: async_sessionmaker = AsyncSessionLocal
+    ):
+        if mode not in (SYNC, ASYNC):
+            raise ValueError(f"Unknown audit log mode: {mode}")
+        self.mode = mode
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_attempts = max_attempts
+        self.session_factory = session_factory
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def asynchronous(self) -> bool:
+        return self.mode == ASYNC
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        if not self.asynchronous or self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(), name="audit-log-sink")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # Everything queued before the sentinel is flushed before _run returns.
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def submit(self, log_data: dict) -> None:
+        self.start()
+        # Blocks when the queue is full so producers slow down instead of
+        # dropping audit entries.
+        await self._queue.put(log_data)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(DeviceLog), batch)
+                    await db.commit()
+            except Exception:
+                logger.exception(
+                    "Audit log flush of %d rows failed (attempt %d/%d)",
+                    len(batch), attempt, self.max_attempts
+                )
+                if attempt == self.max_attempts:
+                    self.failed_rows += len(batch)
+                    return
+                await asyncio.sleep(0.1 * 2 ** attempt)
+                continue
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.flushed_rows += len(batch)
+            self.last_flush_ms = elapsed_ms
+            self.total_flush_ms += elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            return
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.flushes if self.flushes else 0.0,
+        }
+
+
+audit_log_sink = AuditLogSink(
+    mode=settings.AUDIT_LOG_MODE,
+    max_queue=settings.AUDIT_LOG_QUEUE_SIZE,
+    batch_size=settings.AUDIT_LOG_BATCH_SIZE,
+    flush_interval_ms=settings.AUDIT_LOG_FLUSH_INTERVAL_MS,
+)
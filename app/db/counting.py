@@ -0,0 +1,82 @@
+import json
+from typing import NamedTuple, Optional, Sequence
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement
+
+from app.core.config import settings
+
+EXACT = "exact"
+ESTIMATED = "estimated"
+NONE = "none"
+
+COUNT_STRATEGIES = (EXACT, ESTIMATED, NONE)
+COUNT_STRATEGY_PATTERN = f"^({'|'.join(COUNT_STRATEGIES)})$"
+
+if settings.PAGINATION_COUNT_STRATEGY not in COUNT_STRATEGIES:
+    raise ValueError(f"Unknown pagination count strategy: {settings.PAGINATION_COUNT_STRATEGY}")
+
+
+class RowCount(NamedTuple):
+    value: Optional[int]
+    strategy: str
+
+
+async def count_rows(
+        db: AsyncSession,
+        model,
+        filters: Sequence[ColumnElement],
+        strategy: str = EXACT
+) -> RowCount:
+    """Row count for a list endpoint according to ``strategy``.
+
+    ``estimated`` reads planner statistics and falls back to an exact count
+    when Postgres has none; ``none`` skips counting entirely. The returned
+    strategy is the one that actually produced the value.
+    """
+    if strategy == NONE:
+        return RowCount(None, NONE)
+
+    if strategy == ESTIMATED and db.bind.dialect.name == "postgresql":
+        estimate = await _estimate_rows(db, model, filters)
+        if estimate is not None:
+            return RowCount(estimate, ESTIMATED)
+
+    total = await db.scalar(
+        select(func.count()).select_from(model).where(*filters)
+    )
+    return RowCount(total, EXACT)
+
+
+async def _estimate_rows(db: AsyncSession, model, filters) -> Optional[int]:
+    if not filters:
+        # A partitioned table has no storage of its own; sum its partitions.
+        reltuples = await db.scalar(
+            text(
+                "SELECT CASE WHEN c.relkind = 'p' THEN ("
+                "SELECT sum(greatest(p.reltuples, 0)) FROM pg_inherits i "
+                "JOIN pg_class p ON p.oid = i.inhrelid WHERE i.inhparent = c.oid"
+                ") ELSE c.reltuples END::bigint "
+                "FROM pg_class c WHERE c.oid = to_regclass(:name)"
+            ),
+            {"name": model.__tablename__}
+        )
+        # -1 (or 0 on older servers) means the table was never analyzed.
+        return reltuples if reltuples and reltuples > 0 else None
+
+    # Filter values stay bound parameters; EXPLAIN plans them the same way.
+    compiled = select(model.id).where(*filters).compile(
+        dialect=db.bind.dialect,
+        compile_kwargs={"render_postcompile": True}
+    )
+    params = compiled.construct_params()
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled.string}",
+        tuple(params[name] for name in compiled.positiontup)
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import re
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.database import engine
+from app.db.archive import AuditLogArchive, audit_log_archive
+
+logger = logging.getLogger(__name__)
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+PARTITION_INTERVALS = (DAY, WEEK, MONTH)
+
+DETACH = "detach"
+DROP = "drop"
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+
+    @property
+    def is_default(self) -> bool:
+        return self.lower is None
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == DAY:
+        return day
+    if interval == WEEK:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == DAY:
+        return start + timedelta(days=1)
+    if interval == WEEK:
+        return start + timedelta(weeks=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_p{start:%Y%m%d}"
+
+
+class PartitionMaintainer:
+    """Keeps a range-partitioned table ``partitions_ahead`` periods ahead of
+    the clock and detaches or drops partitions older than the retention.
+
+    A detached partition is no longer visible through the API, so one is
+    only detached once ``archive`` holds everything it covers; until then
+    it is kept attached. Dropping does not wait for the archive.
+
+    Runs once at startup and then every ``check_interval`` seconds. Several
+    workers may run it; a transaction-level advisory lock lets only one of
+    them touch the catalog at a time.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            table: str,
+            interval: str,
+            partitions_ahead: int,
+            retention_days: Optional[int],
+            expired_partitions: str,
+            check_interval: float,
+            archive: Optional[AuditLogArchive] = None
+    ):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Unknown partition interval: {interval}")
+        if expired_partitions not in (DETACH, DROP):
+            raise ValueError(f"Unknown expired partition action: {expired_partitions}")
+        self.engine = engine
+        self.table = table
+        self.interval = interval
+        self.partitions_ahead = partitions_ahead
+        self.retention_days = retention_days
+        self.expired_partitions = expired_partitions
+        self.check_interval = check_interval
+        self.archive = archive
+        self.lock_key = zlib.crc32(f"partitions:{table}".encode())
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failures = 0
+        self.created = 0
+        self.expired = 0
+        self.unarchived = 0
+        self.last_run_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.partitions = 0
+        self.default_rows: Optional[int] = None
+
+    def start(self) -> None:
+        if self._task is not None or self.engine.dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._run(), name=f"partitions-{self.table}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.exception("Partition maintenance of %s failed", self.table)
+            await asyncio.sleep(self.check_interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.utcnow()
+        if self.archive is not None and self.expired_partitions == DETACH:
+            await asyncio.to_thread(self.archive.refresh)
+        async with self.engine.begin() as conn:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": self.lock_key}
+            )
+            if not locked:
+                return
+            if not await self._is_partitioned(conn):
+                return
+
+            partitions = await self._partitions(conn)
+            self.created += await self._create_ahead(conn, partitions, now)
+            if self.retention_days is not None:
+                self.expired += await self._expire(conn, partitions, now)
+
+            partitions = await self._partitions(conn)
+            self.partitions = len(partitions)
+            default = next((p for p in partitions if p.is_default), None)
+            if default is not None:
+                self.default_rows = await conn.scalar(
+                    text(f'SELECT count(*) FROM "{default.name}"')
+                )
+                if self.default_rows:
+                    logger.warning(
+                        "%d rows of %s landed in %s; no partition covered them",
+                        self.default_rows, self.table, default.name
+                    )
+
+        self.runs += 1
+        self.last_run_at = time.time()
+        self.last_error = None
+
+    async def _is_partitioned(self, conn: AsyncConnection) -> bool:
+        relkind = await conn.scalar(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"),
+            {"table": self.table}
+        )
+        return relkind == "p"
+
+    async def _partitions(self, conn: AsyncConnection) -> List[Partition]:
+        result = await conn.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:table)"
+            ),
+            {"table": self.table}
+        )
+        partitions = []
+        for name, bound in result:
+            match = _BOUND_RE.search(bound or "")
+            if match:
+                lower, upper = (datetime.fromisoformat(value) for value in match.groups())
+                partitions.append(Partition(name, lower, upper))
+            else:
+                partitions.append(Partition(name, None, None))
+        return partitions
+
+    async def _create_ahead(
+            self,
+            conn: AsyncConnection,
+            partitions: List[Partition],
+            now: datetime
+    ) -> int:
+        ranges = [(p.lower, p.upper) for p in partitions if not p.is_default]
+        created = 0
+        start = period_start(now, self.interval)
+        for _ in range(self.partitions_ahead + 1):
+            end = next_period(start, self.interval)
+            # Existing partitions may be coarser (e.g. made under another
+            # interval setting); only fill what they leave uncovered.
+            lower = max(
+                [upper for lower, upper in ranges if lower <= start < upper],
+                default=start
+            )
+            if lower < end and not any(lo < end and lower < up for lo, up in ranges):
+                name = partition_name(self.table, lower)
+                try:
+                    async with conn.begin_nested():
+                        await conn.execute(text(
+                            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self.table}" '
+                            f"FOR VALUES FROM ('{lower.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+                        ))
+                except DBAPIError as e:
+                    # Typically rows for this period already sit in the default partition.
+                    logger.warning("Could not create partition %s: %s", name, e.orig)
+                else:
+                    ranges.append((lower, end))
+                    created += 1
+                    logger.info("Created partition %s", name)
+            start = end
+        return created
+
+    async def _expire(
+            self,
+            conn: AsyncConnection,
+            partitions: List[Partition],
+            now: datetime
+    ) -> int:
+        cutoff = now - timedelta(days=self.retention_days)
+        archived_until = self.archive.archived_until if self.archive is not None else None
+        expired = 0
+        unarchived = []
+        for partition in partitions:
+            if partition.is_default or partition.upper > cutoff:
+                continue
+            if self.expired_partitions == DROP:
+                await conn.execute(text(f'DROP TABLE "{partition.name}"'))
+                logger.info("Dropped partition %s", partition.name)
+            elif archived_until is None or partition.upper > archived_until:
+                unarchived.append(partition.name)
+                continue
+            else:
+                await conn.execute(text(
+                    f'ALTER TABLE "{self.table}" DETACH PARTITION "{partition.name}"'
+                ))
+                logger.info("Detached partition %s", partition.name)
+            expired += 1
+
+        self.unarchived = len(unarchived)
+        if unarchived:
+            logger.warning(
+                "Not detaching %s past the retention: not archived yet", ", ".join(unarchived)
+            )
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "table": self.table,
+            "interval": self.interval,
+            "partitions": self.partitions,
+            "default_rows": self.default_rows,
+            "created": self.created,
+            "expired": self.expired,
+            "unarchived": self.unarchived,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_error": self.last_error,
+        }
+
+
+devicelog_partitions = PartitionMaintainer(
+    engine,
+    table="devicelog",
+    interval=settings.AUDIT_LOG_PARTITION_INTERVAL,
+    partitions_ahead=settings.AUDIT_LOG_PARTITIONS_AHEAD,
+    retention_days=settings.AUDIT_LOG_RETENTION_DAYS,
+    expired_partitions=settings.AUDIT_LOG_EXPIRED_PARTITIONS,
+    check_interval=settings.AUDIT_LOG_PARTITION_CHECK_INTERVAL,
+    archive=audit_log_archive,
+)
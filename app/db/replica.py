@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "read_primary_until"
+FORCE_PRIMARY_HEADER = "x-read-primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Statements that never modify data; anything else counts as a write.
+_READ_ONLY_STATEMENT = re.compile(
+    r"\s*(SELECT|EXPLAIN|SHOW|SET|SAVEPOINT|RELEASE|ROLLBACK)\b", re.IGNORECASE
+)
+
+# Zero when the replica has replayed everything it received, otherwise the
+# age of the last replayed transaction.
+REPLICATION_LAG_QUERY = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+
+class ReplicaMonitor:
+    """Caches whether the read replica is reachable and close enough to the
+    primary to serve reads."""
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            max_lag_seconds: float,
+            check_interval: float,
+            check_timeout: float = 1.0
+    ):
+        self.engine = engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at = 0.0
+        self.replica_reads = 0
+        self.primary_fallbacks = 0
+        self._lock = asyncio.Lock()
+
+    async def is_usable(self) -> bool:
+        if time.monotonic() - self.checked_at >= self.check_interval and not self._lock.locked():
+            async with self._lock:
+                await self._check()
+
+        if self.healthy:
+            self.replica_reads += 1
+        else:
+            self.primary_fallbacks += 1
+        return self.healthy
+
+    async def _read_lag(self) -> Optional[float]:
+        async with self.engine.connect() as conn:
+            return await conn.scalar(REPLICATION_LAG_QUERY)
+
+    async def _check(self) -> None:
+        try:
+            # Covers the connect too: a replica that accepts connections but
+            # never answers must not hold up the request.
+            lag = await asyncio.wait_for(self._read_lag(), self.check_timeout)
+        except Exception as e:
+            if self.healthy:
+                logger.warning("Read replica unavailable, falling back to primary: %s", e)
+            self.healthy = False
+            self.lag_seconds = None
+            self.last_error = str(e)
+        else:
+            self.lag_seconds = float(lag or 0)
+            self.healthy = self.lag_seconds <= self.max_lag_seconds
+            self.last_error = None if self.healthy else "replication lag too high"
+        finally:
+            self.checked_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "max_lag_seconds": self.max_lag_seconds,
+            "last_error": self.last_error,
+            "replica_reads": self.replica_reads,
+            "primary_fallbacks": self.primary_fallbacks,
+        }
+
+
+class _RequestWrites:
+    __slots__ = ("committed",)
+
+    def __init__(self):
+        self.committed = False
+
+
+_request_writes: ContextVar[Optional[_RequestWrites]] = ContextVar("request_writes", default=None)
+
+
+def track_primary_writes(engine: AsyncEngine) -> None:
+    """Marks the current request once a transaction that modified data has
+    committed on ``engine``, the primary."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _request_writes.get() is not None and not _READ_ONLY_STATEMENT.match(statement):
+            conn.info["uncommitted_write"] = True
+
+    @event.listens_for(sync_engine, "commit")
+    def commit(conn):
+        writes = _request_writes.get()
+        if conn.info.pop("uncommitted_write", False) and writes is not None:
+            writes.committed = True
+
+    @event.listens_for(sync_engine, "rollback")
+    def rollback(conn):
+        conn.info.pop("uncommitted_write", None)
+
+
+def wants_primary(request: Request) -> bool:
+    if request.headers.get(FORCE_PRIMARY_HEADER):
+        return True
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadYourWritesMiddleware:
+    """After a request that committed a write on the primary, marks the
+    client with a short-lived cookie so its following reads go to the
+    primary instead of a lagging replica.
+
+    Needs ``track_primary_writes`` on the primary engine. Non-safe requests
+    that only read (a login, say) leave reads on the replica; a write
+    committed after the response has started (a streamed body) sets no
+    cookie.
+    """
+
+    def __init__(self, app: ASGIApp, window_seconds: float):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        writes = _RequestWrites()
+
+        async def send_with_cookie(message: Message) -> None:
+            if (
+                    message["type"] == "http.response.start"
+                    and message["status"] < 400
+                    and writes.committed
+            ):
+                until = time.time() + self.window_seconds
+                cookie = (
+                    f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.window_seconds) + 1}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = _request_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
@@ -1,80 +1,153 @@
-from typing import Tuple, List, Dict, Any
+from typing import Tuple, List, Dict, Any, Optional, Iterable, AsyncIterator
 
-from fastapi import HTTPException
-from sqlalchemy import select, func
+from sqlalchemy import select, update, delete, or_, Row, RowMapping
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.models import ISGDevice
+from app.db.counting import EXACT, RowCount, count_rows
+from app.models.models import ChangeCounter, ISGDevice
 
 
+UNIQUE_FIELDS = ("uid", "ip_address")
+DEVICE_CHANGE_COUNTER = "isgdevice"
+
+DEVICE_LIST_COLUMNS = (
+    ISGDevice.id,
+    ISGDevice.uid,
+    ISGDevice.ip_address,
+    ISGDevice.port,
+    ISGDevice.admin_username,
+    ISGDevice.admin_password,
+)
+
+
+def unique_violation_field(error: IntegrityError) -> Optional[str]:
+    """Column of ``isgdevice`` whose unique constraint ``error`` violated."""
+    cause = error.orig.__cause__ if error.orig is not None else None
+    constraint = getattr(cause, "constraint_name", None)
+    if constraint is None:
+        diag = getattr(error.orig, "diag", None)
+        constraint = getattr(diag, "constraint_name", None)
+    if constraint is None:
+        return None
+
+    for field in UNIQUE_FIELDS:
+        if field in constraint:
+            return field
+    return None
 
 
 class DeviceRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def check_device_exists(
+    async def create_device(
             self,
-            uid: str = None,
-            ip_address: str = None,
-            port: int = None
-    ) -> bool:
-        if not any([uid, ip_address, port]):
-            return False
-
-        query = select(ISGDevice).where(
-            (ISGDevice.uid == uid) if uid else False |
-            (ISGDevice.ip_address == ip_address) if ip_address else False |
-            (ISGDevice.port == port) if port else False
+            device_data: dict
+    ) -> ISGDevice | None:
+        # Returns None instead of raising when uid or ip_address is taken.
+        result = await self.db.execute(
+            pg_insert(ISGDevice)
+            .values(**device_data)
+            .on_conflict_do_nothing()
+            .returning(ISGDevice)
         )
+        return result.scalar_one_or_none()
 
-        result = await self.db.execute(query)
-        return result.scalar_one_or_none() is not None
+    async def insert_devices(
+            self,
+            devices_data: List[dict]
+    ) -> List[Row]:
+        if not devices_data:
+            return []
+
+        # Rows hitting a unique constraint are skipped, not raised.
+        stmt = pg_insert(ISGDevice).on_conflict_do_nothing().returning(
+            ISGDevice.id, ISGDevice.uid
+        )
+        result = await self.db.execute(stmt, devices_data)
+        return list(result.all())
 
-    async def create_device(
+    async def find_conflicts(
             self,
-            device_data: dict,
-            user_id: int
-    ) -> ISGDevice:
-        try:
-            db_device = ISGDevice(**device_data)
-            self.db.add(db_device)
-            await self.db.commit()
-            await self.db.refresh(db_device)
-            return db_device
-        except IntegrityError as e:
-            await self.db.rollback()
-            if "unique constraint" in str(e).lower():
-                raise HTTPException(
-                    400,
-                    detail="Device with these parameters already exists"
-                )
-            raise HTTPException(
-                500,
-                detail=f"Database error: {str(e)}"
-            )
-        except Exception as e:
-            await self.db.rollback()
-            raise HTTPException(
-                400,
-                detail=f"Unexpected error: {str(e)}"
+            uids: Iterable[str] = (),
+            ip_addresses: Iterable[str] = ()
+    ) -> Dict[Tuple[str, str], int]:
+        uids, ip_addresses = set(uids), set(ip_addresses)
+        if not uids and not ip_addresses:
+            return {}
+
+        result = await self.db.execute(
+            select(ISGDevice.id, ISGDevice.uid, ISGDevice.ip_address).where(
+                or_(ISGDevice.uid.in_(uids), ISGDevice.ip_address.in_(ip_addresses))
             )
+        )
+
+        # (field, value) -> id of the device already holding it
+        conflicts = {}
+        for device_id, uid, ip_address in result:
+            if uid in uids:
+                conflicts[("uid", uid)] = device_id
+            if ip_address in ip_addresses:
+                conflicts[("ip_address", ip_address)] = device_id
+        return conflicts
 
     async def get_devices(
         self,
         page_number: int = 1,
-        page_size: int = 10
-    ) -> Tuple[List[ISGDevice], int]:
-        offset = (page_number - 1) * page_size
-
-        stmt = select(ISGDevice).offset(offset).limit(page_size)
-        result = await self.db.execute(stmt)
-        devices = result.scalars().all()
-
-        total = await self.db.scalar(select(func.count(ISGDevice.id)))
+        page_size: int = 10,
+        after_id: Optional[int] = None,
+        before_id: Optional[int] = None,
+        count_strategy: str = EXACT
+    ) -> Tuple[List[RowMapping], RowCount, bool]:
+        # Plain row mappings: nothing is hydrated into the identity map.
+        stmt = select(*DEVICE_LIST_COLUMNS)
+        if after_id is not None:
+            stmt = stmt.where(ISGDevice.id > after_id).order_by(ISGDevice.id)
+        elif before_id is not None:
+            stmt = stmt.where(ISGDevice.id < before_id).order_by(ISGDevice.id.desc())
+        else:
+            offset = (page_number - 1) * page_size
+            stmt = stmt.order_by(ISGDevice.id).offset(offset)
+
+        result = await self.db.execute(stmt.limit(page_size + 1))
+        devices = list(result.mappings().all())
+
+        has_more = len(devices) > page_size
+        devices = devices[:page_size]
+        if before_id is not None:
+            devices.reverse()
+
+        total = await count_rows(self.db, ISGDevice, [], count_strategy)
+
+        return devices, total, has_more
+
+    async def stream_devices(
+            self,
+            batch_size: int = 1000
+    ) -> AsyncIterator[RowMapping]:
+        query = select(
+            *ISGDevice.__table__.columns
+        ).order_by(ISGDevice.id).execution_options(yield_per=batch_size)
+
+        result = await self.db.stream(query)
+        async for row in result.mappings():
+            yield row
+
+    async def get_probe_targets(self) -> List[Tuple[int, str, int]]:
+        result = await self.db.execute(
+            select(ISGDevice.id, ISGDevice.ip_address, ISGDevice.port)
+        )
+        return [tuple(row) for row in result]
 
-        return devices, total
+    async def get_command_targets(self, device_ids: Iterable[int]) -> List[RowMapping]:
+        result = await self.db.execute(
+            select(*DEVICE_LIST_COLUMNS)
+            .where(ISGDevice.id.in_(set(device_ids)))
+            .order_by(ISGDevice.id)
+        )
+        return list(result.mappings().all())
 
     async def get_device(
             self,
@@ -83,29 +156,57 @@ class DeviceRepository:
         return await self.db.get(ISGDevice, device_id)
 
 
+    async def get_device_values_for_update(
+            self,
+            device_id: int
+    ) -> Optional[Dict[str, Any]]:
+        result = await self.db.execute(
+            select(*ISGDevice.__table__.columns)
+            .where(ISGDevice.id == device_id)
+            .with_for_update()
+        )
+        row = result.mappings().one_or_none()
+        return dict(row) if row is not None else None
+
     async def update_device_fields(
             self,
-            device: ISGDevice,
+            device_id: int,
             update_data: Dict[str, Any]
     ) -> ISGDevice:
-        try:
-            for key, value in update_data.items():
-                setattr(device, key, value)
-
-            await self.db.commit()
-            await self.db.refresh(device)
-            return device
-        except IntegrityError as e:
-            await self.db.rollback()
-            if "unique constraint" in str(e).lower():
-                raise ValueError("Data update causes duplicate in unique field")
-            raise
-
-
+        result = await self.db.execute(
+            update(ISGDevice)
+            .where(ISGDevice.id == device_id)
+            .values(**update_data)
+            .returning(ISGDevice)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
 
-    async def delete_device(self, device: ISGDevice):
-        await self.db.delete(device)
-        await self.db.commit()
+    async def delete_device(self, device_id: int) -> Optional[Dict[str, Any]]:
+        result = await self.db.execute(
+            delete(ISGDevice)
+            .where(ISGDevice.id == device_id)
+            .returning(*ISGDevice.__table__.columns)
+        )
+        row = result.mappings().one_or_none()
+        return dict(row) if row is not None else None
 
-    async def get_device_data(self, device: ISGDevice) -> dict:
-        return {c.name: getattr(device, c.name) for c in device.__table__.columns}
\ No newline at end of file
+    async def get_change_version(self) -> int:
+        version = await self.db.scalar(
+            select(ChangeCounter.version)
+            .where(ChangeCounter.name == DEVICE_CHANGE_COUNTER)
+        )
+        return version or 0
+
+    async def bump_change_version(self) -> int:
+        # The counter row stays locked until commit, so call this last.
+        result = await self.db.execute(
+            pg_insert(ChangeCounter)
+            .values(name=DEVICE_CHANGE_COUNTER, version=1)
+            .on_conflict_do_update(
+                index_elements=[ChangeCounter.name],
+                set_={"version": ChangeCounter.version + 1}
+            )
+            .returning(ChangeCounter.version)
+        )
+        return result.scalar_one()
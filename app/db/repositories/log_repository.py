@@ -1,11 +1,45 @@
 from datetime import datetime
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, AsyncIterator
 
-from sqlalchemy import select, func
+from sqlalchemy import select, insert, tuple_, RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
 
-from app.models.models import DeviceLog
+from app.db.audit_sink import audit_log_sink
+from app.db.counting import EXACT, RowCount, count_rows
+from app.models.models import DeviceLog, User
+
+
+AUDIT_LOG_COLUMNS = (
+    DeviceLog.id,
+    DeviceLog.user_id,
+    User.username,
+    DeviceLog.action,
+    DeviceLog.object_type,
+    DeviceLog.object_id,
+    DeviceLog.timestamp,
+    DeviceLog.details,
+)
+
+
+def audit_log_filters(
+        object_type: Optional[str] = None,
+        object_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+) -> list:
+    filters = []
+    if object_type:
+        filters.append(DeviceLog.object_type == object_type)
+    if object_id:
+        filters.append(DeviceLog.object_id == object_id)
+    if user_id:
+        filters.append(DeviceLog.user_id == user_id)
+    if since:
+        filters.append(DeviceLog.timestamp >= since)
+    if until:
+        filters.append(DeviceLog.timestamp < until)
+    return filters
 
 
 class LogRepository:
@@ -18,36 +52,88 @@ class LogRepository:
             page_size: int = 100,
             object_type: Optional[str] = None,
             object_id: Optional[int] = None,
-            user_id: Optional[int] = None
-    ) -> Tuple[List[DeviceLog], int]:
-        offset = (page_number - 1) * page_size
+            user_id: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            after: Optional[Tuple[datetime, int]] = None,
+            before: Optional[Tuple[datetime, int]] = None,
+            count_strategy: str = EXACT
+    ) -> Tuple[List[RowMapping], RowCount, bool]:
+        # Only the columns LogWithUser needs, username straight from the join.
+        query = select(*AUDIT_LOG_COLUMNS).outerjoin(
+            User, User.id == DeviceLog.user_id
+        )
 
-        query = select(DeviceLog).options(
-            joinedload(DeviceLog.user)
-        ).order_by(
-            DeviceLog.timestamp.desc()
-        ).offset(offset).limit(page_size)
+        filters = audit_log_filters(object_type, object_id, user_id, since, until)
+        if filters:
+            query = query.where(*filters)
 
-        count_query = select(func.count(DeviceLog.id))
+        # Newest first; "after" walks towards older rows, "before" towards newer.
+        # The plain timestamp bound is redundant with the row comparison but
+        # lets Postgres prune partitions, which it cannot do from a row value.
+        sort_key = tuple_(DeviceLog.timestamp, DeviceLog.id)
+        if after is not None:
+            query = query.where(
+                sort_key < tuple_(*after), DeviceLog.timestamp <= after[0]
+            ).order_by(
+                DeviceLog.timestamp.desc(), DeviceLog.id.desc()
+            )
+        elif before is not None:
+            query = query.where(
+                sort_key > tuple_(*before), DeviceLog.timestamp >= before[0]
+            ).order_by(
+                DeviceLog.timestamp, DeviceLog.id
+            )
+        else:
+            offset = (page_number - 1) * page_size
+            query = query.order_by(
+                DeviceLog.timestamp.desc(), DeviceLog.id.desc()
+            ).offset(offset)
 
-        filters = []
-        if object_type:
-            filters.append(DeviceLog.object_type == object_type)
-        if object_id:
-            filters.append(DeviceLog.object_id == object_id)
-        if user_id:
-            filters.append(DeviceLog.user_id == user_id)
+        result = await self.db.execute(query.limit(page_size + 1))
+        logs = list(result.mappings().all())
 
-        if filters:
-            query = query.where(*filters)
-            count_query = count_query.where(*filters)
+        has_more = len(logs) > page_size
+        logs = logs[:page_size]
+        if before is not None:
+            logs.reverse()
+
+        total = await count_rows(self.db, DeviceLog, filters, count_strategy)
 
-        result = await self.db.execute(query)
-        logs = result.unique().scalars().all()
+        return logs, total, has_more
 
-        total = await self.db.scalar(count_query)
+    async def count_audit_logs(
+            self,
+            object_type: Optional[str] = None,
+            object_id: Optional[int] = None,
+            user_id: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None
+    ) -> int:
+        filters = audit_log_filters(object_type, object_id, user_id, since, until)
+        total = await count_rows(self.db, DeviceLog, filters, EXACT)
+        return total.value
 
-        return logs, total
+    async def stream_audit_logs(
+            self,
+            object_type: Optional[str] = None,
+            object_id: Optional[int] = None,
+            user_id: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 1000
+    ) -> AsyncIterator[RowMapping]:
+        query = select(*AUDIT_LOG_COLUMNS).outerjoin(
+            User, User.id == DeviceLog.user_id
+        ).where(
+            *audit_log_filters(object_type, object_id, user_id, since, until)
+        ).order_by(
+            DeviceLog.timestamp.desc(), DeviceLog.id.desc()
+        ).execution_options(yield_per=batch_size)
+
+        result = await self.db.stream(query)
+        async for row in result.mappings():
+            yield row
 
     async def create_device_log(
             self,
@@ -57,15 +143,25 @@ class LogRepository:
             object_id: int,
             details: dict = None
     ) -> DeviceLog:
-        db_log = DeviceLog(
-            user_id=user_id,
-            action=action,
-            object_type=object_type,
-            object_id=object_id,
-            timestamp=datetime.utcnow(),
-            details=details
-        )
+        log_data = {
+            "user_id": user_id,
+            "action": action,
+            "object_type": object_type,
+            "object_id": object_id,
+            "timestamp": datetime.utcnow(),
+            "details": details,
+        }
+        if audit_log_sink.asynchronous:
+            await audit_log_sink.submit(log_data)
+            return DeviceLog(**log_data)
+
+        db_log = DeviceLog(**log_data)
         self.db.add(db_log)
         await self.db.commit()
         await self.db.refresh(db_log)
         return db_log
+
+    async def add_device_logs(self, logs_data: List[dict]) -> None:
+        if not logs_data:
+            return
+        await self.db.execute(insert(DeviceLog), logs_data)
@@ -40,4 +40,11 @@ class UserRepository:
         self.db.add(user)
         await self.db.commit()
         await self.db.refresh(user)
-        return user
\ No newline at end of file
+        return user
+
+    async def update_user_active(self, user: User, is_active: bool) -> User:
+        user.is_active = is_active
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        return user
@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import List
+
+from app.db.audit_sink import audit_log_sink
+from app.db.repositories.log_repository import LogRepository
+
+
+class UnitOfWork:
+    """One transaction for a mutation and the audit entries it produces.
+
+    Audit entries recorded during the block are written with a single insert
+    right before the commit, or handed to the asynchronous audit sink once
+    the commit has succeeded. Any exception rolls everything back.
+    """
+
+    def __init__(self, log_repository: LogRepository):
+        self.log_repository = log_repository
+        self.db = log_repository.db
+        self._logs: List[dict] = []
+
+    async def __aenter__(self) -> "UnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            await self.db.rollback()
+            return
+        await self.commit()
+
+    def record_log(
+            self,
+            user_id: int,
+            action: str,
+            object_type: str,
+            object_id: int,
+            details: dict = None
+    ) -> None:
+        self._logs.append({
+            "user_id": user_id,
+            "action": action,
+            "object_type": object_type,
+            "object_id": object_id,
+            "timestamp": datetime.utcnow(),
+            "details": details,
+        })
+
+    async def commit(self) -> None:
+        logs, self._logs = self._logs, []
+        try:
+            if not audit_log_sink.asynchronous:
+                await self.log_repository.add_device_logs(logs)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        if audit_log_sink.asynchronous:
+            for log_data in logs:
+                await audit_log_sink.submit(log_data)
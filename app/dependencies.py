@@ -1,7 +1,7 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.db.repositories.device_repository import DeviceRepository
 from app.db.repositories.log_repository import LogRepository
 from app.db.repositories.user_repository import UserRepository
@@ -34,6 +34,9 @@ async def get_log_service(
 ) -> LogService:
     return LogService(log_repository)
 
+async def get_log_read_service(db: AsyncSession = Depends(get_read_db)) -> LogService:
+    return LogService(LogRepository(db))
+
 async def get_device_repository(db: AsyncSession = Depends(get_db)) -> DeviceRepository:
     return DeviceRepository(db)
 
@@ -42,4 +45,7 @@ async def get_device_service(
     device_repository: DeviceRepository = Depends(get_device_repository),
     log_repository: LogRepository = Depends(get_log_repository)
 ) -> DeviceService:
-    return DeviceService(device_repository, log_repository)
\ No newline at end of file
+    return DeviceService(device_repository, log_repository)
+
+async def get_device_read_service(db: AsyncSession = Depends(get_read_db)) -> DeviceService:
+    return DeviceService(DeviceRepository(db), LogRepository(db))
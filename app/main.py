@@ -3,20 +3,57 @@ from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI
 
+from app.api.endpoints import metrics_router
 from app.api.routers import api_router
-from app.database import engine, Base
+from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.metrics import MetricsMiddleware
+from app.core.query_tracker import QueryTrackerMiddleware, query_tracking
+from app.core.rate_limit import RateLimitMiddleware, rate_limit_backend
+from app.database import engine, read_engine, warm_pool
+from app.db.archive import audit_log_archiver
+from app.db.audit_sink import audit_log_sink
+from app.db.partitions import devicelog_partitions
+from app.db.replica import ReadYourWritesMiddleware
+from app.services.command_executor import command_executor
+from app.services.mail_dispatcher import mail_dispatcher
+from app.services.reachability import reachability_prober
 
 
-# @asynccontextmanager
-# async def lifespan(app: FastAPI):
-#     async with engine.begin() as conn:
-#         await conn.run_sync(Base.metadata.create_all)
-#
-#     yield
-#     await engine.dispose()
-#
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warm_pool(engine, min(settings.DB_POOL_WARMUP, settings.DB_POOL_SIZE))
+    if read_engine is not None:
+        await warm_pool(read_engine, min(settings.DB_POOL_WARMUP, settings.DB_POOL_SIZE))
+    mail_dispatcher.start()
+    audit_log_sink.start()
+    devicelog_partitions.start()
+    audit_log_archiver.start()
+    reachability_prober.start()
+    yield
+    await command_executor.stop()
+    await reachability_prober.stop()
+    await audit_log_archiver.stop()
+    await devicelog_partitions.stop()
+    await audit_log_sink.stop()
+    await mail_dispatcher.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
+    if read_engine is not None:
+        await read_engine.dispose()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+if read_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=settings.READ_YOUR_WRITES_SECONDS)
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, backend=rate_limit_backend)
+if query_tracking.enabled:
+    app.add_middleware(QueryTrackerMiddleware, tracking=query_tracking)
+if settings.METRICS_ENABLED:
+    # Outermost, so requests turned away by the rate limiter are timed too.
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router.router)
 app.include_router(api_router, prefix="/api/v1")
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship, declarative_base
 
 Base = declarative_base()
@@ -30,14 +30,22 @@ class ISGDevice(Base):
     admin_password = Column(String, nullable=False)
 
 
+class ChangeCounter(Base):
+    __tablename__ = "change_counter"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
 class DeviceLog(Base):
     __tablename__ = "devicelog"
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     action = Column(String, nullable=False)
     object_type = Column(String, nullable=False)
     object_id = Column(Integer, nullable=False)
-    timestamp = Column(DateTime, nullable=False)
+    # Part of the key because the table is range-partitioned on it.
+    timestamp = Column(DateTime, primary_key=True, nullable=False)
     details = Column(JSON, nullable=False)
 
     @property
@@ -45,3 +53,13 @@ class DeviceLog(Base):
         return self.user.username if self.user else None
 
     user = relationship("User", back_populates="devicelog")
+
+    # Every audit-log query filters by user_id and reads newest first.
+    __table_args__ = (
+        Index("ix_devicelog_user_id_timestamp", "user_id", "timestamp", "id"),
+        Index(
+            "ix_devicelog_user_id_object",
+            "user_id", "object_id", "object_type", "timestamp", "id"
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
@@ -1,5 +1,9 @@
+import ipaddress
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, conint, constr, field_validator, model_validator
+from typing_extensions import TypedDict
 
 
 class ISGDeviceBase(BaseModel):
@@ -13,10 +17,109 @@ class ISGDeviceBase(BaseModel):
 
 
 class ISGDeviceCreate(ISGDeviceBase):
-    pass
+    # Only checked on the way in, so rows stored before still read back.
+    port: conint(ge=1, le=65535)
+
+
+class DeviceReachability(BaseModel):
+    reachable: Optional[bool] = None
+    latency_ms: Optional[float] = None
+    checked_at: Optional[datetime] = None
+    changed_at: Optional[datetime] = None
+    consecutive_failures: int = 0
+    error: Optional[str] = None
+
+
+class DeviceStatus(DeviceReachability):
+    device_id: int
+    ip_address: str
+    port: int
+
+
+class DeviceStatusList(BaseModel):
+    devices: List[DeviceStatus]
+    reachable: int
+    unreachable: int
+    unknown: int
 
 
 class ISGDevice(ISGDeviceBase):
     id: int
+    # None until the device has been picked up by the reachability prober.
+    reachability: Optional[DeviceReachability] = None
     model_config = ConfigDict(from_attributes=True)
 
+
+class ISGDeviceRow(TypedDict):
+    id: int
+    uid: str
+    ip_address: str
+    port: int
+    admin_username: str
+    admin_password: str
+
+
+# Validates row mappings straight into plain dicts, no model instances.
+device_list_adapter = TypeAdapter(List[ISGDeviceRow])
+
+
+class DeviceConflict(BaseModel):
+    index: Optional[int] = None
+    field: str
+    value: Any
+    device_id: Optional[int] = None
+
+
+class DeviceImportError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class ImportedDevice(BaseModel):
+    index: int
+    id: int
+    uid: str
+
+
+class BulkImportResult(BaseModel):
+    received: int
+    created: List[ImportedDevice]
+    conflicts: List[DeviceConflict]
+    errors: List[DeviceImportError]
+
+
+class CommandRunRequest(BaseModel):
+    device_ids: List[int] = Field(min_length=1)
+    # One line each; the device transport is line based.
+    commands: List[constr(min_length=1, max_length=4096, pattern=r"^[^\r\n]+$")] = Field(
+        min_length=1,
+        max_length=100
+    )
+    stop_on_error: bool = True
+    timeout: Optional[float] = Field(None, gt=0, le=600)
+
+
+class DiscoveryRequest(BaseModel):
+    networks: List[str] = Field(min_length=1, max_length=64)
+    ports: List[conint(ge=1, le=65535)] = Field(min_length=1, max_length=64)
+    register_new: bool = False
+    # Credentials stored with every registered device.
+    admin_username: Optional[str] = None
+    admin_password: Optional[str] = None
+    uid_prefix: constr(min_length=1, max_length=50) = "discovered"
+    timeout: Optional[float] = Field(None, gt=0, le=30)
+
+    @field_validator("networks")
+    def valid_networks(cls, v):
+        for network in v:
+            try:
+                ipaddress.ip_network(network, strict=False)
+            except ValueError:
+                raise ValueError(f"Not an IP network: {network}")
+        return v
+
+    @model_validator(mode="after")
+    def credentials_to_register(self):
+        if self.register_new and not (self.admin_username and self.admin_password):
+            raise ValueError("admin_username and admin_password are required to register devices")
+        return self
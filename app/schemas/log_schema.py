@@ -1,6 +1,8 @@
 from datetime import datetime
+from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class DeviceLogBase(BaseModel):
@@ -25,3 +27,18 @@ class DeviceLog(DeviceLogBase):
 class LogWithUser(DeviceLog):
     username: str
     model_config = ConfigDict(from_attributes=True)
+
+
+class LogWithUserRow(TypedDict):
+    id: int
+    user_id: int
+    username: str
+    action: str
+    object_type: str
+    object_id: int
+    timestamp: datetime
+    details: Optional[dict]
+
+
+# Validates row mappings straight into plain dicts, no model instances.
+log_list_adapter = TypeAdapter(List[LogWithUserRow])
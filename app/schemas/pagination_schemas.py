@@ -1,14 +1,18 @@
-from typing import TypeVar, Generic, List
+from typing import TypeVar, Generic, List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
 T = TypeVar('T')
 
 class Pagination(BaseModel):
-    page_number: int
+    page_number: Optional[int] = None
     page_size: int
-    num_pages: int
-    total_results: int
+    num_pages: Optional[int] = None
+    total_results: Optional[int] = None
+    count_strategy: str = "exact"
+    has_more: bool = False
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
 
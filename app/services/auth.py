@@ -1,16 +1,14 @@
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from authx import AuthX, AuthXConfig
 
 from app.core.config import settings
+from app.core.hashing import password_hasher
 from app.models.models import User
 from app.database import AsyncSessionLocal
+from app.services.mail_dispatcher import mail_dispatcher
 from sqlalchemy.future import select
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 config = AuthXConfig(
@@ -32,7 +30,7 @@ async def authenticate_user(username: str, password: str) -> User | None:
         user = result.scalar_one_or_none()
         if not user:
             return None
-        if not pwd_context.verify(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         return user
 
@@ -46,7 +44,4 @@ def send_email_with_code(recipient: str, code: str) -> None:
     body = f'Your password reset code is: {code}\nIt is valid for 10 minutes.'
     msg.attach(MIMEText(body, 'plain'))
 
-    with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-        server.starttls()
-        server.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
-        server.send_message(msg)
\ No newline at end of file
+    mail_dispatcher.enqueue(msg)
\ No newline at end of file
@@ -0,0 +1,507 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Mapping, Optional, Protocol, Sequence, Set, Tuple
+from uuid import uuid4
+
+import orjson
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.db.repositories.log_repository import LogRepository
+from app.db.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+FAILED = "failed"
+ERROR = "error"
+NOT_FOUND = "not_found"
+
+_DONE = object()
+
+# LOGIN arguments are separated by spaces and commands by line breaks.
+_UNSAFE_CREDENTIAL = re.compile(r"[\s\x00-\x1f\x7f]")
+
+
+class TransportError(Exception):
+    """The connection to a device failed or the device broke the protocol."""
+
+
+class CommandNotSentError(TransportError):
+    """The connection was found closed before the command was written, so
+    sending it again cannot run it twice."""
+
+
+class AuthenticationError(Exception):
+    """The device refused the stored credentials, or they cannot be sent;
+    retrying will not help."""
+
+
+class DeviceTransport(Protocol):
+    async def connect(self) -> None: ...
+
+    async def execute(self, command: str) -> Tuple[bool, str]: ...
+
+    async def close(self) -> None: ...
+
+
+class TcpLineTransport:
+    """Line-based text protocol over plain TCP.
+
+    The connection is authenticated once with ``LOGIN <username> <password>``;
+    after that every command is one line and every reply is one line that
+    starts with ``OK`` or ``ERR``. Nothing is encrypted, credentials
+    included, so devices should only be reached over a management network.
+    Credentials with whitespace or control characters are refused rather
+    than sent, as they would split or add protocol lines.
+    """
+
+    def __init__(self, device: Mapping, max_line: int = 64 * 1024):
+        self.host = device["ip_address"]
+        self.port = device["port"]
+        self.username = device["admin_username"]
+        self.password = device["admin_password"]
+        self.max_line = max_line
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self) -> None:
+        if any(_UNSAFE_CREDENTIAL.search(value) for value in (self.username, self.password)):
+            raise AuthenticationError(
+                "Stored credentials contain whitespace or control characters"
+            )
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port, limit=self.max_line
+        )
+        ok, reply = await self._request(f"LOGIN {self.username} {self.password}")
+        if not ok:
+            raise AuthenticationError(f"Login rejected: {reply}")
+
+    async def execute(self, command: str) -> Tuple[bool, str]:
+        if self._reader.at_eof() or self._writer.is_closing():
+            # Typically a pooled connection the device closed while idle.
+            raise CommandNotSentError("Connection closed by device")
+        return await self._request(command)
+
+    async def _request(self, line: str) -> Tuple[bool, str]:
+        self._writer.write(line.encode() + b"\n")
+        await self._writer.drain()
+        try:
+            reply = await self._reader.readline()
+        except ValueError:
+            raise TransportError(f"Reply longer than {self.max_line} bytes")
+        if not reply.endswith(b"\n"):
+            raise TransportError("Connection closed by device")
+
+        status, _, text = reply.decode(errors="replace").rstrip("\r\n").partition(" ")
+        if status not in ("OK", "ERR"):
+            raise TransportError(f"Unexpected reply: {reply[:100]!r}")
+        return status == "OK", text
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except OSError:
+            pass
+
+
+TRANSPORTS: Dict[str, Callable[[Mapping], DeviceTransport]] = {
+    "tcp-line": TcpLineTransport,
+}
+
+
+class _PooledConnection:
+    __slots__ = ("key", "transport", "lock", "last_used")
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.transport: Optional[DeviceTransport] = None
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class DeviceConnectionPool:
+    """At most one open, authenticated connection per device, kept between
+    runs for ``idle_timeout`` seconds.
+
+    A connection is used by one run at a time and is thrown away as soon as
+    anything goes wrong on it, including a timeout in the middle of a reply.
+    """
+
+    def __init__(
+            self,
+            transport_factory: Callable[[Mapping], DeviceTransport],
+            idle_timeout: float = 60,
+            max_idle: int = 1000
+    ):
+        self.transport_factory = transport_factory
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._connections: Dict[int, _PooledConnection] = {}
+
+        self.connects = 0
+        self.reuses = 0
+        self.discards = 0
+
+    @asynccontextmanager
+    async def connection(self, device: Mapping) -> AsyncIterator[DeviceTransport]:
+        key = (device["ip_address"], device["port"], device["admin_username"], device["admin_password"])
+        entry = self._connections.get(device["id"])
+        if entry is None or entry.key != key:
+            if entry is not None and not entry.lock.locked():
+                await self._discard(entry)
+            entry = self._connections[device["id"]] = _PooledConnection(key)
+
+        async with entry.lock:
+            if entry.transport is None:
+                transport = self.transport_factory(device)
+                try:
+                    await transport.connect()
+                except BaseException:
+                    await self._close(transport)
+                    raise
+                entry.transport = transport
+                self.connects += 1
+            else:
+                self.reuses += 1
+
+            try:
+                yield entry.transport
+            except BaseException:
+                await self._discard(entry)
+                raise
+            finally:
+                entry.last_used = time.monotonic()
+                if self._connections.get(device["id"]) is not entry:
+                    # The device was readdressed while this connection was busy.
+                    await self._discard(entry)
+
+    async def sweep(self) -> None:
+        """Closes connections idle for longer than ``idle_timeout`` and the
+        least recently used ones beyond ``max_idle``."""
+        now = time.monotonic()
+        idle = sorted(
+            (entry for entry in self._connections.values()
+             if entry.transport is not None and not entry.lock.locked()),
+            key=lambda entry: entry.last_used
+        )
+        excess = len(idle) - self.max_idle
+        for i, entry in enumerate(idle):
+            if i < excess or now - entry.last_used > self.idle_timeout:
+                await self._discard(entry)
+
+        for device_id, entry in list(self._connections.items()):
+            if entry.transport is None and not entry.lock.locked():
+                del self._connections[device_id]
+
+    async def close(self) -> None:
+        for entry in list(self._connections.values()):
+            await self._discard(entry)
+        self._connections.clear()
+
+    async def _discard(self, entry: _PooledConnection) -> None:
+        transport, entry.transport = entry.transport, None
+        if transport is not None:
+            self.discards += 1
+            await self._close(transport)
+
+    @staticmethod
+    async def _close(transport: DeviceTransport) -> None:
+        try:
+            await transport.close()
+        except Exception:
+            pass
+
+    @property
+    def open_connections(self) -> int:
+        return sum(1 for entry in self._connections.values() if entry.transport is not None)
+
+
+class CommandRun:
+    def __init__(self, commands: List[str], targets: int):
+        self.id = uuid4().hex
+        self.commands = commands
+        self.targets = targets
+        self._events: asyncio.Queue = asyncio.Queue()
+
+    def publish(self, event: dict) -> None:
+        self._events.put_nowait(event)
+
+    def finish(self) -> None:
+        self._events.put_nowait(_DONE)
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        """One NDJSON line per device as soon as it is done, then the summary."""
+        while True:
+            event = await self._events.get()
+            if event is _DONE:
+                return
+            yield orjson.dumps(event) + b"\n"
+
+
+class CommandExecutor:
+    """Runs a list of commands against many devices at once.
+
+    At most ``concurrency`` devices are worked on at any time, across all
+    runs. Each attempt on a device (connect, login and the remaining
+    commands) is bounded by ``timeout``; transport failures are retried
+    with jittered exponential backoff, resuming where the last attempt
+    stopped. Once a command has been sent without getting a reply the
+    device may or may not have run it, and as commands need not be
+    idempotent that device is not retried. A run keeps going when its
+    client disconnects and always ends with one audit log entry.
+    """
+
+    def __init__(
+            self,
+            pool: DeviceConnectionPool,
+            session_factory: async_sessionmaker,
+            concurrency: int = 50,
+            timeout: float = 30,
+            retries: int = 2,
+            backoff: float = 0.5
+    ):
+        self.pool = pool
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._runs: Set[asyncio.Task] = set()
+
+        self.started_runs = 0
+        self.finished_runs = 0
+        self.targets = 0
+        self.target_errors = 0
+        self.retried = 0
+        self.in_flight = 0
+
+    def submit(
+            self,
+            devices: Sequence[Mapping],
+            commands: List[str],
+            user_id: int,
+            missing_ids: Sequence[int] = (),
+            stop_on_error: bool = True,
+            timeout: Optional[float] = None
+    ) -> CommandRun:
+        run = CommandRun(commands, len(devices) + len(missing_ids))
+        task = asyncio.create_task(
+            self._execute(run, devices, user_id, missing_ids, stop_on_error, timeout or self.timeout),
+            name=f"command-run-{run.id}"
+        )
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+        self.started_runs += 1
+        return run
+
+    async def stop(self, timeout: float = 10) -> None:
+        if self._runs:
+            done, pending = await asyncio.wait(set(self._runs), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        await self.pool.close()
+
+    async def _execute(
+            self,
+            run: CommandRun,
+            devices: Sequence[Mapping],
+            user_id: int,
+            missing_ids: Sequence[int],
+            stop_on_error: bool,
+            timeout: float
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            await self.pool.sweep()
+            results = [
+                {"device_id": device_id, "status": NOT_FOUND, "error": "Device not found"}
+                for device_id in missing_ids
+            ]
+            for result in results:
+                run.publish(result)
+
+            async def target(device: Mapping) -> None:
+                result = await self._run_target(device, run.commands, stop_on_error, timeout)
+                results.append(result)
+                run.publish(result)
+
+            await asyncio.gather(*(target(device) for device in devices))
+
+            summary = {
+                "run_id": run.id,
+                "devices": run.targets,
+                **{status: sum(1 for result in results if result["status"] == status)
+                   for status in (OK, FAILED, ERROR, NOT_FOUND)},
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            }
+            try:
+                await self._record(run, user_id, summary, results)
+            except Exception:
+                logger.exception("Could not write the audit log entry of command run %s", run.id)
+            run.publish({"summary": summary})
+        finally:
+            self.finished_runs += 1
+            run.finish()
+
+    async def _run_target(
+            self,
+            device: Mapping,
+            commands: List[str],
+            stop_on_error: bool,
+            timeout: float
+    ) -> dict:
+        started = time.perf_counter()
+        outputs: List[dict] = []
+        unanswered: List[str] = []
+        attempts = 0
+        error = None
+        self.targets += 1
+        while True:
+            attempts += 1
+            try:
+                # The slot is only held while talking to the device, not
+                # while backing off.
+                async with self._semaphore:
+                    self.in_flight += 1
+                    try:
+                        await asyncio.wait_for(
+                            self._attempt(device, commands, outputs, unanswered, stop_on_error),
+                            timeout
+                        )
+                    finally:
+                        self.in_flight -= 1
+                error = None
+                break
+            except AuthenticationError as e:
+                error = str(e)
+                break
+            except asyncio.TimeoutError:
+                error = f"Timed out after {timeout:g}s"
+            except (TransportError, OSError) as e:
+                error = str(e) or e.__class__.__name__
+            except Exception as e:
+                # E.g. a stored port out of range or an unusable host. Only
+                # this device fails, and retrying would fail the same way.
+                logger.exception("Command run failed on device %s", device["id"])
+                error = f"{e.__class__.__name__}: {e}"
+                break
+
+            if unanswered:
+                error = f"No reply to {unanswered[0]!r}, not retried: {error}"
+                break
+            if attempts > self.retries:
+                break
+            self.retried += 1
+            await asyncio.sleep(self.backoff * 2 ** (attempts - 1) * random.uniform(0.5, 1.5))
+
+        if error is not None:
+            status = ERROR
+            self.target_errors += 1
+        else:
+            status = OK if all(output["ok"] for output in outputs) else FAILED
+
+        result = {
+            "device_id": device["id"],
+            "ip_address": device["ip_address"],
+            "port": device["port"],
+            "status": status,
+            "attempts": attempts,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "results": outputs,
+        }
+        if error is not None:
+            result["error"] = error
+        return result
+
+    async def _attempt(
+            self,
+            device: Mapping,
+            commands: List[str],
+            outputs: List[dict],
+            unanswered: List[str],
+            stop_on_error: bool
+    ) -> None:
+        async with self.pool.connection(device) as transport:
+            while len(outputs) < len(commands):
+                command = commands[len(outputs)]
+                try:
+                    ok, output = await transport.execute(command)
+                except CommandNotSentError:
+                    raise
+                except BaseException:
+                    unanswered.append(command)
+                    raise
+                outputs.append({"command": command, "ok": ok, "output": output})
+                if not ok and stop_on_error:
+                    return
+
+    async def _record(
+            self,
+            run: CommandRun,
+            user_id: int,
+            summary: dict,
+            results: List[dict]
+    ) -> None:
+        # Command output can be large or sensitive; only outcomes are kept.
+        details = {
+            **summary,
+            "commands": run.commands,
+            "results": [
+                {key: result[key] for key in ("device_id", "status", "attempts", "error") if key in result}
+                for result in sorted(results, key=lambda result: result["device_id"])
+            ],
+        }
+        async with self.session_factory() as db:
+            async with UnitOfWork(LogRepository(db)) as uow:
+                uow.record_log(
+                    user_id=user_id,
+                    action="execute",
+                    object_type="command_run",
+                    # A run spans many devices; their ids are in the details.
+                    object_id=0,
+                    details=details
+                )
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._runs),
+            "started_runs": self.started_runs,
+            "finished_runs": self.finished_runs,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "targets": self.targets,
+            "target_errors": self.target_errors,
+            "retried": self.retried,
+            "open_connections": self.pool.open_connections,
+            "connects": self.pool.connects,
+            "reuses": self.pool.reuses,
+            "discards": self.pool.discards,
+        }
+
+
+if settings.COMMAND_TRANSPORT not in TRANSPORTS:
+    raise ValueError(f"Unknown command transport: {settings.COMMAND_TRANSPORT}")
+
+command_executor = CommandExecutor(
+    DeviceConnectionPool(
+        TRANSPORTS[settings.COMMAND_TRANSPORT],
+        idle_timeout=settings.COMMAND_CONNECTION_IDLE_SECONDS,
+        max_idle=settings.COMMAND_MAX_IDLE_CONNECTIONS,
+    ),
+    AsyncSessionLocal,
+    concurrency=settings.COMMAND_CONCURRENCY,
+    timeout=settings.COMMAND_TIMEOUT,
+    retries=settings.COMMAND_RETRIES,
+    backoff=settings.COMMAND_RETRY_BACKOFF,
+)
@@ -1,11 +1,40 @@
-from typing import Dict, Any
+import ipaddress
+from typing import Dict, Any, Optional, List, Iterable, AsyncIterator
 
 from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 
-from app.db.repositories.device_repository import DeviceRepository
+from app.core.config import settings
+from app.core.etag import version_cache
+from app.core.pagination import NEXT, PREV, build_cursors, decode_cursor
+from app.core.serialization import dump_rows
+from app.database import AsyncSessionLocal
+from app.db.repositories.device_repository import (
+    DEVICE_CHANGE_COUNTER,
+    UNIQUE_FIELDS,
+    DeviceRepository,
+    unique_violation_field,
+)
 from app.db.repositories.log_repository import LogRepository
-from app.schemas.device_schemas import ISGDevice
-from app.schemas.pagination_schemas import PaginatedResponse, Pagination
+from app.db.unit_of_work import UnitOfWork
+from app.schemas.device_schemas import (
+    BulkImportResult,
+    DeviceConflict,
+    DeviceImportError,
+    DeviceReachability,
+    DiscoveryRequest,
+    ImportedDevice,
+    ISGDevice,
+    ISGDeviceCreate,
+    device_list_adapter,
+)
+from app.schemas.pagination_schemas import Pagination
+from app.services.command_executor import CommandRun, command_executor
+from app.services.discovery import count_hosts, discovery_scanner, parse_networks
+from app.services.reachability import reachability_prober
+
+BULK_CHUNK_SIZE = 1000
 
 
 class DeviceService:
@@ -17,53 +46,224 @@ class DeviceService:
         self.device_repository = device_repository
         self.log_repository = log_repository
 
+    async def _conflict_error(
+            self,
+            device_data: Dict[str, Any],
+            fields: Iterable[str] = UNIQUE_FIELDS,
+            exclude_id: Optional[int] = None
+    ) -> HTTPException:
+        fields = [field for field in fields if device_data.get(field) is not None]
+        existing = await self.device_repository.find_conflicts(
+            uids=[device_data["uid"]] if "uid" in fields else [],
+            ip_addresses=[device_data["ip_address"]] if "ip_address" in fields else []
+        )
+        conflicts = [
+            DeviceConflict(
+                field=field,
+                value=device_data[field],
+                device_id=existing.get((field, device_data[field]))
+            )
+            for field in fields
+            if existing.get((field, device_data[field])) not in (None, exclude_id)
+        ]
+        if not conflicts:
+            # The colliding row vanished in the meantime; still name the keys.
+            conflicts = [
+                DeviceConflict(field=field, value=device_data[field])
+                for field in fields
+            ]
+
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "Device with these parameters already exists",
+                "conflicts": [
+                    conflict.model_dump(exclude={"index"}) for conflict in conflicts
+                ],
+            }
+        )
+
     async def create_device(
             self,
             device_data: dict,
             user_id: int
     ) -> ISGDevice:
-        if await self.device_repository.check_device_exists(
-                uid=device_data.get("uid"),
-                ip_address=device_data.get("ip_address"),
-                port=device_data.get("port")
-        ):
-            raise HTTPException(
-                400,
-                detail="Device already exists"
+        async with UnitOfWork(self.log_repository) as uow:
+            db_device = await self.device_repository.create_device(device_data)
+            if db_device is None:
+                raise await self._conflict_error(device_data)
+
+            uow.record_log(
+                user_id=user_id,
+                action="Create",
+                object_type="isg_device",
+                object_id=db_device.id,
+                details=device_data
             )
-        db_device = await self.device_repository.create_device(device_data, user_id)
-
-        await self.log_repository.create_device_log(
-            user_id=user_id,
-            action="Create",
-            object_type="isg_device",
-            object_id=db_device.id,
-            details=device_data
-        )
+            version = await self.device_repository.bump_change_version()
 
+        version_cache.set(DEVICE_CHANGE_COUNTER, version)
         return db_device
 
+    async def bulk_create_devices(
+            self,
+            items: List[Any],
+            user_id: int
+    ) -> BulkImportResult:
+        errors = []
+        conflicts = []
+        accepted = []
+        seen = {}
+
+        for index, item in enumerate(items):
+            try:
+                device = ISGDeviceCreate.model_validate(item)
+            except ValidationError as e:
+                errors.append(DeviceImportError(
+                    index=index,
+                    errors=e.errors(include_url=False, include_context=False, include_input=False)
+                ))
+                continue
+
+            duplicate = None
+            for field in UNIQUE_FIELDS:
+                key = (field, getattr(device, field))
+                if key in seen:
+                    duplicate = DeviceConflict(index=index, field=field, value=key[1])
+                    break
+            if duplicate:
+                conflicts.append(duplicate)
+                continue
+
+            seen[("uid", device.uid)] = index
+            seen[("ip_address", device.ip_address)] = index
+            accepted.append((index, device.model_dump()))
+
+        created = []
+        async with UnitOfWork(self.log_repository) as uow:
+            for start in range(0, len(accepted), BULK_CHUNK_SIZE):
+                chunk = accepted[start:start + BULK_CHUNK_SIZE]
+                inserted = await self.device_repository.insert_devices(
+                    [device_data for _, device_data in chunk]
+                )
+                ids_by_uid = {row.uid: row.id for row in inserted}
+
+                skipped = [
+                    (index, device_data) for index, device_data in chunk
+                    if device_data["uid"] not in ids_by_uid
+                ]
+                if skipped:
+                    existing = await self.device_repository.find_conflicts(
+                        uids=[device_data["uid"] for _, device_data in skipped],
+                        ip_addresses=[device_data["ip_address"] for _, device_data in skipped]
+                    )
+                    for index, device_data in skipped:
+                        for field in UNIQUE_FIELDS:
+                            device_id = existing.get((field, device_data[field]))
+                            if device_id is not None:
+                                conflicts.append(DeviceConflict(
+                                    index=index,
+                                    field=field,
+                                    value=device_data[field],
+                                    device_id=device_id
+                                ))
+                                break
+                        else:
+                            # The colliding row is already gone again.
+                            conflicts.append(DeviceConflict(
+                                index=index,
+                                field="uid",
+                                value=device_data["uid"]
+                            ))
+
+                for index, device_data in chunk:
+                    device_id = ids_by_uid.get(device_data["uid"])
+                    if device_id is None:
+                        continue
+                    uow.record_log(
+                        user_id=user_id,
+                        action="Create",
+                        object_type="isg_device",
+                        object_id=device_id,
+                        details=device_data
+                    )
+                    created.append(ImportedDevice(
+                        index=index,
+                        id=device_id,
+                        uid=device_data["uid"]
+                    ))
+
+            version = await self.device_repository.bump_change_version() if created else None
+
+        if version is not None:
+            version_cache.set(DEVICE_CHANGE_COUNTER, version)
+        conflicts.sort(key=lambda conflict: conflict.index)
+        return BulkImportResult(
+            received=len(items),
+            created=created,
+            conflicts=conflicts,
+            errors=errors
+        )
+
     async def list_devices(
             self,
             page_number: int,
-            page_size: int
-    ) -> PaginatedResponse[ISGDevice]:
-        devices, total = await self.device_repository.get_devices(
+            page_size: int,
+            cursor: Optional[str] = None,
+            count_strategy: Optional[str] = None
+    ) -> dict:
+        count_strategy = count_strategy or settings.PAGINATION_COUNT_STRATEGY
+        key, direction = decode_cursor(cursor) if cursor else (None, None)
+        try:
+            key_id = int(key[0]) if key else None
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        devices, total, has_more = await self.device_repository.get_devices(
             page_number=page_number,
-            page_size=page_size
+            page_size=page_size,
+            after_id=key_id if direction == NEXT else None,
+            before_id=key_id if direction == PREV else None,
+            count_strategy=count_strategy
         )
 
-        num_pages = (total + page_size - 1) // page_size
+        num_pages = (total.value + page_size - 1) // page_size if total.value is not None else None
+        next_cursor, prev_cursor = build_cursors(
+            devices,
+            lambda device: [device["id"]],
+            direction,
+            has_more,
+            page_number=page_number,
+            key=key
+        )
 
-        return PaginatedResponse[ISGDevice](
-            data=devices,
-            pagination=Pagination(
-                page_number=page_number,
+        data = dump_rows(device_list_adapter, devices)
+        for device in data:
+            device["reachability"] = reachability_prober.status(device["id"])
+
+        return {
+            "data": data,
+            "pagination": Pagination(
+                page_number=None if cursor else page_number,
                 page_size=page_size,
                 num_pages=num_pages,
-                total_results=total
-            )
-        )
+                total_results=total.value,
+                count_strategy=total.strategy,
+                has_more=next_cursor is not None,
+                next_cursor=next_cursor,
+                prev_cursor=prev_cursor
+            ).model_dump(),
+        }
+
+    async def get_version(self, cached: bool = False) -> int:
+        if cached:
+            version = version_cache.get(DEVICE_CHANGE_COUNTER)
+            if version is not None:
+                return version
+
+        version = await self.device_repository.get_change_version()
+        version_cache.set(DEVICE_CHANGE_COUNTER, version)
+        return version
 
     async def get_device(
             self,
@@ -77,7 +277,103 @@ class DeviceService:
                 detail="Device not found"
             )
 
-        return device
+        result = ISGDevice.model_validate(device)
+        reachability = reachability_prober.status(device_id)
+        if reachability is not None:
+            result.reachability = DeviceReachability(**reachability)
+        return result
+
+    async def run_commands(
+            self,
+            device_ids: List[int],
+            commands: List[str],
+            user_id: int,
+            stop_on_error: bool = True,
+            timeout: Optional[float] = None
+    ) -> CommandRun:
+        device_ids = list(dict.fromkeys(device_ids))
+        if len(device_ids) > settings.COMMAND_MAX_TARGETS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.COMMAND_MAX_TARGETS} devices per run"
+            )
+
+        devices = await self.device_repository.get_command_targets(device_ids)
+        found = {device["id"] for device in devices}
+        return command_executor.submit(
+            devices,
+            commands,
+            user_id,
+            missing_ids=[device_id for device_id in device_ids if device_id not in found],
+            stop_on_error=stop_on_error,
+            timeout=timeout
+        )
+
+    async def discover_devices(
+            self,
+            discovery: DiscoveryRequest,
+            user_id: int
+    ) -> AsyncIterator[bytes]:
+        networks = parse_networks(discovery.networks)
+        ports = list(dict.fromkeys(discovery.ports))
+        targets = sum(count_hosts(network) for network in networks) * len(ports)
+        if targets > settings.DISCOVERY_MAX_TARGETS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"{targets} targets requested, at most {settings.DISCOVERY_MAX_TARGETS} per scan"
+            )
+        slot = discovery_scanner.reserve()
+        if slot is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many discovery scans running, try again later",
+                headers={"Retry-After": "60"},
+            )
+
+        known = {}
+        try:
+            for device_id, ip_address, port in await self.device_repository.get_probe_targets():
+                try:
+                    known[str(ipaddress.ip_address(ip_address))] = (device_id, port)
+                except ValueError:
+                    continue
+        except BaseException:
+            slot.release()
+            raise
+
+        # Runs while the response streams, after the request's session is
+        # gone, so every batch gets a session of its own.
+        async def register_found(items: List[dict]) -> BulkImportResult:
+            async with AsyncSessionLocal() as db:
+                service = DeviceService(DeviceRepository(db), LogRepository(db))
+                return await service.bulk_create_devices(items, user_id)
+
+        return discovery_scanner.run(
+            slot,
+            networks,
+            ports,
+            known,
+            register=register_found if discovery.register_new else None,
+            device_template={
+                "admin_username": discovery.admin_username,
+                "admin_password": discovery.admin_password,
+            },
+            uid_prefix=discovery.uid_prefix,
+            timeout=discovery.timeout
+        )
+
+    def get_statuses(
+            self,
+            device_ids: Optional[List[int]] = None,
+            reachable: Optional[bool] = None
+    ) -> dict:
+        devices = reachability_prober.statuses(device_ids, reachable)
+        return {
+            "devices": devices,
+            "reachable": sum(1 for device in devices if device["reachable"] is True),
+            "unreachable": sum(1 for device in devices if device["reachable"] is False),
+            "unknown": sum(1 for device in devices if device["reachable"] is None),
+        }
 
     async def update_device(
             self,
@@ -85,42 +381,43 @@ class DeviceService:
             update_data: Dict[str, Any],
             user_id: int
     ) -> ISGDevice:
-        device = await self.device_repository.get_device(device_id)
-        if not device:
-            raise HTTPException(status_code=404, detail="Device not found")
-
-        new_uid = update_data.get("uid")
-        if new_uid and new_uid != device.uid:
-            if await self.device_repository.check_device_exists(new_uid):
-                raise ValueError(f"UID '{new_uid}' already exists")
-
-        old_values = {c.name: getattr(device, c.name) for c in device.__table__.columns}
-
         try:
-            updated_device = await self.device_repository.update_device_fields(
-                device,
-                update_data
-            )
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
+            async with UnitOfWork(self.log_repository) as uow:
+                old_values = await self.device_repository.get_device_values_for_update(device_id)
+                if not old_values:
+                    raise HTTPException(status_code=404, detail="Device not found")
 
-        new_values = {c.name: getattr(updated_device, c.name) for c in device.__table__.columns}
+                updated_device = await self.device_repository.update_device_fields(
+                    device_id,
+                    update_data
+                )
 
-        changes = {
-            k: {"old": old_values[k], "new": new_values[k]}
-            for k in old_values
-            if old_values[k] != new_values[k]
-        }
+                new_values = {c.name: getattr(updated_device, c.name) for c in updated_device.__table__.columns}
 
-        if changes:
-            await self.log_repository.create_device_log(
-                user_id=user_id,
-                action="update",
-                object_type="isg_device",
-                object_id=device_id,
-                details=changes
-            )
+                changes = {
+                    k: {"old": old_values[k], "new": new_values[k]}
+                    for k in old_values
+                    if old_values[k] != new_values[k]
+                }
 
+                version = None
+                if changes:
+                    uow.record_log(
+                        user_id=user_id,
+                        action="update",
+                        object_type="isg_device",
+                        object_id=device_id,
+                        details=changes
+                    )
+                    version = await self.device_repository.bump_change_version()
+        except IntegrityError as e:
+            field = unique_violation_field(e)
+            if field is None:
+                raise
+            raise await self._conflict_error(update_data, [field], exclude_id=device_id)
+
+        if version is not None:
+            version_cache.set(DEVICE_CHANGE_COUNTER, version)
         return updated_device
 
     async def delete_device(
@@ -128,21 +425,19 @@ class DeviceService:
             device_id: int,
             user_id: int
     ) -> str:
+        async with UnitOfWork(self.log_repository) as uow:
+            device_data = await self.device_repository.delete_device(device_id)
+            if not device_data:
+                raise HTTPException(status_code=404, detail="Device not found")
 
-        device = await self.device_repository.get_device(device_id)
-        if not device:
-            raise HTTPException(status_code=404, detail="Device not found")
-
-        device_data = await self.device_repository.get_device_data(device)
-
-        await self.device_repository.delete_device(device)
-
-        await self.log_repository.create_device_log(
-            user_id=user_id,
-            action="delete",
-            object_type="isg_device",
-            object_id=device_id,
-            details=device_data
-        )
+            uow.record_log(
+                user_id=user_id,
+                action="delete",
+                object_type="isg_device",
+                object_id=device_id,
+                details=device_data
+            )
+            version = await self.device_repository.bump_change_version()
 
-        return f"device {device_id} deleted"
\ No newline at end of file
+        version_cache.set(DEVICE_CHANGE_COUNTER, version)
+        return f"device {device_id} deleted"
@@ -0,0 +1,309 @@
+import asyncio
+import ipaddress
+import logging
+import time
+import weakref
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import orjson
+
+from app.core.config import settings
+from app.core.rate_limit import InMemoryRateLimitBackend
+from app.schemas.device_schemas import BulkImportResult
+from app.services.reachability import probe_tcp
+
+logger = logging.getLogger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+_DONE = object()
+
+
+def parse_networks(networks: Sequence[str]) -> List[Network]:
+    """Parses CIDR ranges (or single addresses) and merges overlapping ones."""
+    parsed = [ipaddress.ip_network(network, strict=False) for network in networks]
+    merged = []
+    for version in (4, 6):
+        merged += ipaddress.collapse_addresses(
+            network for network in parsed if network.version == version
+        )
+    return merged
+
+
+class ScanSlot:
+    """One of the scanner's ``max_scans`` slots; releasing it more than
+    once is a no-op."""
+
+    def __init__(self, scanner: "DiscoveryScanner"):
+        self._scanner: Optional["DiscoveryScanner"] = scanner
+
+    def release(self) -> None:
+        scanner, self._scanner = self._scanner, None
+        if scanner is not None:
+            scanner.running -= 1
+
+
+def count_hosts(network: Network) -> int:
+    # hosts() leaves out the network and broadcast addresses of IPv4 ranges.
+    if network.version == 4 and network.prefixlen < 31:
+        return network.num_addresses - 2
+    return network.num_addresses
+
+
+class DiscoveryScanner:
+    """Connect scanner for finding devices on whole subnets.
+
+    Targets are generated lazily, one port at a time across all hosts, so a
+    host's ports are spread over the whole sweep instead of being hit back
+    to back. Every connect first takes a token from a bucket shared by all
+    scans (``rate``/``burst``) and one from a bucket of its host
+    (``host_rate``/``host_burst``); ``concurrency`` connects per scan are in
+    flight at most.
+    """
+
+    def __init__(
+            self,
+            concurrency: int = 500,
+            timeout: float = 1,
+            rate: float = 1000,
+            burst: float = 100,
+            host_rate: float = 10,
+            host_burst: float = 5,
+            max_scans: int = 2,
+            progress_interval: float = 1,
+            register_batch: int = 500
+    ):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate = rate
+        self.burst = burst
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.max_scans = max_scans
+        self.progress_interval = progress_interval
+        self.register_batch = register_batch
+        self._buckets = InMemoryRateLimitBackend(max_keys=max(concurrency * 4, 10000))
+
+        self.running = 0
+        self.scans = 0
+        self.probes = 0
+        self.open_ports = 0
+        self.in_flight = 0
+
+    def reserve(self) -> Optional[ScanSlot]:
+        """Claims a scan slot, or returns None if all ``max_scans`` are
+        taken. Check and claim happen in one step, so concurrent requests
+        cannot both get the last slot."""
+        if self.running >= self.max_scans:
+            return None
+        self.running += 1
+        return ScanSlot(self)
+
+    async def _take(self, key: str, rate: float, burst: float) -> None:
+        while True:
+            wait = await self._buckets.consume(key, rate, burst)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def _probe(self, host: str, port: int, timeout: float) -> Optional[float]:
+        await self._take("global", self.rate, self.burst)
+        await self._take(host, self.host_rate, self.host_burst)
+        self.in_flight += 1
+        try:
+            reachable, latency_ms, _ = await probe_tcp(host, port, timeout)
+        finally:
+            self.in_flight -= 1
+        self.probes += 1
+        return latency_ms if reachable else None
+
+    async def scan(
+            self,
+            networks: Sequence[Network],
+            ports: Sequence[int],
+            timeout: Optional[float] = None
+    ) -> AsyncIterator[Tuple[str, int, Optional[float]]]:
+        """Yields ``(host, port, latency_ms)`` for every target as it is
+        probed; latency is None when nothing accepted the connection."""
+        timeout = timeout or self.timeout
+        targets: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        workers = min(self.concurrency, sum(count_hosts(network) for network in networks) * len(ports))
+
+        async def produce() -> None:
+            for port in ports:
+                for network in networks:
+                    for host in network.hosts():
+                        await targets.put((str(host), port))
+            for _ in range(workers):
+                await targets.put(None)
+
+        async def work() -> None:
+            while True:
+                target = await targets.get()
+                if target is None:
+                    break
+                host, port = target
+                await results.put((host, port, await self._probe(host, port, timeout)))
+            await results.put(_DONE)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(work()) for _ in range(workers)]
+        try:
+            remaining = workers
+            while remaining:
+                result = await results.get()
+                if result is _DONE:
+                    remaining -= 1
+                else:
+                    yield result
+            # Surfaces a failure of the producer.
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(
+            self,
+            slot: ScanSlot,
+            networks: Sequence[Network],
+            ports: Sequence[int],
+            known: Dict[str, Tuple[int, int]],
+            register: Optional[Callable[[List[dict]], Awaitable[BulkImportResult]]] = None,
+            device_template: Optional[dict] = None,
+            uid_prefix: str = "discovered",
+            timeout: Optional[float] = None
+    ) -> AsyncIterator[bytes]:
+        """Scans and streams NDJSON events: ``found`` for every open port,
+        ``registered`` per inserted batch, ``progress`` every
+        ``progress_interval`` seconds and a final ``done``.
+
+        ``known`` maps the ip addresses already in ``isgdevice`` to their
+        (id, port); at most one device per address is registered. ``slot``
+        comes from ``reserve()`` and is released when the stream ends, or
+        when it is dropped without ever being iterated.
+        """
+        stream = self._run(slot, networks, ports, known, register, device_template, uid_prefix, timeout)
+        weakref.finalize(stream, slot.release)
+        return stream
+
+    async def _run(
+            self,
+            slot: ScanSlot,
+            networks: Sequence[Network],
+            ports: Sequence[int],
+            known: Dict[str, Tuple[int, int]],
+            register: Optional[Callable[[List[dict]], Awaitable[BulkImportResult]]],
+            device_template: Optional[dict],
+            uid_prefix: str,
+            timeout: Optional[float]
+    ) -> AsyncIterator[bytes]:
+        hosts = sum(count_hosts(network) for network in networks)
+        total = hosts * len(ports)
+        started = time.perf_counter()
+        counts = {"scanned": 0, "open": 0, "known": 0, "new": 0, "registered": 0, "conflicts": 0}
+        pending: List[dict] = []
+        claimed = set(known)
+
+        def progress(event: str) -> bytes:
+            elapsed = time.perf_counter() - started
+            return orjson.dumps({
+                "event": event,
+                "targets": total,
+                **counts,
+                "elapsed_seconds": round(elapsed, 3),
+                "rate": round(counts["scanned"] / elapsed, 1) if elapsed else 0.0,
+            }) + b"\n"
+
+        async def flush() -> bytes:
+            items, pending[:] = list(pending), []
+            result = await register(items)
+            counts["registered"] += len(result.created)
+            counts["conflicts"] += len(result.conflicts)
+            return orjson.dumps({
+                "event": "registered",
+                "created": [
+                    {"id": device.id, "uid": device.uid, **{
+                        key: items[device.index][key] for key in ("ip_address", "port")
+                    }}
+                    for device in result.created
+                ],
+                "conflicts": [conflict.model_dump() for conflict in result.conflicts],
+            }) + b"\n"
+
+        self.scans += 1
+        try:
+            yield orjson.dumps({
+                "event": "started",
+                "networks": [str(network) for network in networks],
+                "ports": list(ports),
+                "hosts": hosts,
+                "targets": total,
+            }) + b"\n"
+
+            next_progress = time.monotonic() + self.progress_interval
+            async for host, port, latency_ms in self.scan(networks, ports, timeout):
+                counts["scanned"] += 1
+                if latency_ms is not None:
+                    self.open_ports += 1
+                    counts["open"] += 1
+                    existing = known.get(host)
+                    if existing is not None:
+                        counts["known"] += 1
+                    else:
+                        counts["new"] += 1
+                    yield orjson.dumps({
+                        "event": "found",
+                        "ip_address": host,
+                        "port": port,
+                        "latency_ms": latency_ms,
+                        "device_id": existing[0] if existing else None,
+                    }) + b"\n"
+
+                    if register is not None and host not in claimed:
+                        claimed.add(host)
+                        pending.append({
+                            **device_template,
+                            "uid": f"{uid_prefix}-{host}-{port}",
+                            "ip_address": host,
+                            "port": port,
+                        })
+                        if len(pending) >= self.register_batch:
+                            yield await flush()
+
+                if time.monotonic() >= next_progress:
+                    yield progress("progress")
+                    next_progress = time.monotonic() + self.progress_interval
+
+            if pending:
+                yield await flush()
+            yield progress("done")
+        finally:
+            slot.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "max_scans": self.max_scans,
+            "scans": self.scans,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "probes": self.probes,
+            "open_ports": self.open_ports,
+            "rate": self.rate,
+            "host_rate": self.host_rate,
+        }
+
+
+discovery_scanner = DiscoveryScanner(
+    concurrency=settings.DISCOVERY_CONCURRENCY,
+    timeout=settings.DISCOVERY_TIMEOUT,
+    rate=settings.DISCOVERY_RATE,
+    burst=settings.DISCOVERY_BURST,
+    host_rate=settings.DISCOVERY_HOST_RATE,
+    host_burst=settings.DISCOVERY_HOST_BURST,
+    max_scans=settings.DISCOVERY_MAX_SCANS,
+    progress_interval=settings.DISCOVERY_PROGRESS_INTERVAL,
+    register_batch=settings.DISCOVERY_REGISTER_BATCH,
+)
@@ -0,0 +1,94 @@
+import csv
+import io
+import zlib
+from typing import AsyncIterator, Callable, Mapping, Sequence
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FORMAT_PATTERN = f"^({'|'.join(EXPORT_FORMATS)})$"
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Rows are buffered into chunks of roughly this size before being sent.
+CHUNK_SIZE = 64 * 1024
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value).decode()
+    return value
+
+
+async def _encode(
+        rows: AsyncIterator[Mapping],
+        export_format: str,
+        columns: Sequence[str]
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO() if export_format == "csv" else bytearray()
+    writer = csv.writer(buffer) if export_format == "csv" else None
+    if writer:
+        writer.writerow(columns)
+
+    async for row in rows:
+        if writer:
+            writer.writerow([_csv_value(row[column]) for column in columns])
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            buffer += orjson.dumps({column: row[column] for column in columns})
+            buffer += b"\n"
+            if len(buffer) >= CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+
+    tail = buffer.getvalue().encode() if writer else bytes(buffer)
+    if tail:
+        yield tail
+
+
+async def _gzip(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(
+        stream: Callable[[AsyncSession], AsyncIterator[Mapping]],
+        export_format: str,
+        columns: Sequence[str],
+        filename: str,
+        compress: bool = False,
+        session_factory: async_sessionmaker = AsyncSessionLocal
+) -> StreamingResponse:
+    # The request-scoped session is closed before a streaming body is sent,
+    # so the export runs on its own session for as long as the client reads.
+    async def body() -> AsyncIterator[bytes]:
+        async with session_factory() as db:
+            chunks = _encode(stream(db), export_format, columns)
+            if compress:
+                chunks = _gzip(chunks)
+            async for chunk in chunks:
+                yield chunk
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers=headers
+    )
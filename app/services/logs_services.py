@@ -1,9 +1,18 @@
-from typing import Optional
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, List, Mapping, Optional, Tuple
 
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.pagination import NEXT, PREV, build_cursors, decode_cursor
+from app.core.serialization import dump_rows
+from app.db.archive import ArchiveFilter, audit_log_archive
+from app.db.counting import EXACT, RowCount
 from app.db.repositories.log_repository import LogRepository
 from app.models.models import DeviceLog
-from app.schemas.log_schema import LogWithUser
-from app.schemas.pagination_schemas import PaginatedResponse
+from app.schemas.log_schema import log_list_adapter
+from app.schemas.pagination_schemas import Pagination
 
 
 class LogService:
@@ -16,34 +25,153 @@ class LogService:
             page_size: int,
             object_type: Optional[str] = None,
             object_id: Optional[int] = None,
-            user_id: Optional[int] = None
-    ) -> PaginatedResponse[LogWithUser]:
-        logs, total = await self.log_repository.get_audit_logs(
+            user_id: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            cursor: Optional[str] = None,
+            count_strategy: Optional[str] = None
+    ) -> dict:
+        count_strategy = count_strategy or settings.PAGINATION_COUNT_STRATEGY
+        key, direction = decode_cursor(cursor) if cursor else (None, None)
+        try:
+            seek = (datetime.fromisoformat(key[0]), int(key[1])) if key else None
+        except (TypeError, ValueError, IndexError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # Rows older than the archive boundary are served from the archive,
+        # never from the database, even if the archiver has not deleted them yet.
+        with_archive = await asyncio.to_thread(audit_log_archive.covers, since)
+        hot_since = audit_log_archive.archived_until if with_archive else since
+
+        logs, total, has_more = await self.log_repository.get_audit_logs(
             page_number=page_number,
             page_size=page_size,
             object_type=object_type,
             object_id=object_id,
-            user_id=user_id
+            user_id=user_id,
+            since=hot_since,
+            until=until,
+            after=seek if direction == NEXT else None,
+            before=seek if direction == PREV else None,
+            count_strategy=count_strategy
         )
 
-        result = []
-        for log in logs:
-            log_data = LogWithUser.from_orm(log)
-            log_data.username = log.user.username
-            result.append(log_data)
-
-        num_pages = (total + page_size - 1) // page_size
-
-        return PaginatedResponse[LogWithUser](
-            data=result,
-            pagination={
-                "page_number": page_number,
-                "page_size": page_size,
-                "num_pages": num_pages,
-                "total_results": total
-            }
+        if with_archive:
+            archive_filter = ArchiveFilter(object_type, object_id, user_id, since, until)
+            logs, has_more = await self._merge_archive(
+                logs, has_more, total, archive_filter, page_number, page_size, direction, seek
+            )
+            if total.value is not None:
+                archived = await asyncio.to_thread(audit_log_archive.count, archive_filter)
+                total = RowCount(total.value + archived, total.strategy)
+
+        num_pages = (total.value + page_size - 1) // page_size if total.value is not None else None
+        next_cursor, prev_cursor = build_cursors(
+            logs,
+            lambda log: [log["timestamp"].isoformat(), log["id"]],
+            direction,
+            has_more,
+            page_number=page_number,
+            key=key
         )
 
+        return {
+            "data": dump_rows(log_list_adapter, logs),
+            "pagination": Pagination(
+                page_number=None if cursor else page_number,
+                page_size=page_size,
+                num_pages=num_pages,
+                total_results=total.value,
+                count_strategy=total.strategy,
+                has_more=next_cursor is not None,
+                next_cursor=next_cursor,
+                prev_cursor=prev_cursor
+            ).model_dump(),
+        }
+
+    async def _merge_archive(
+            self,
+            logs: List[dict],
+            has_more: bool,
+            total: RowCount,
+            archive_filter: ArchiveFilter,
+            page_number: int,
+            page_size: int,
+            direction: Optional[str],
+            seek: Optional[Tuple[datetime, int]]
+    ) -> Tuple[List[dict], bool]:
+        # Every archived row is older than every database row, so a page
+        # simply continues from one into the other.
+        if direction == PREV:
+            if seek[0] >= audit_log_archive.archived_until:
+                return logs, has_more
+            older = await asyncio.to_thread(
+                audit_log_archive.read, archive_filter, page_size + 1, before=seek
+            )
+            rows = older + list(reversed(logs))
+            has_more = has_more or len(rows) > page_size
+            return list(reversed(rows[:page_size])), has_more
+
+        if has_more:
+            return logs, has_more
+
+        offset = 0
+        if direction is None and not logs:
+            hot_total = total.value if total.strategy == EXACT else await self.log_repository.count_audit_logs(
+                object_type=archive_filter.object_type,
+                object_id=archive_filter.object_id,
+                user_id=archive_filter.user_id,
+                since=audit_log_archive.archived_until,
+                until=archive_filter.until
+            )
+            offset = max((page_number - 1) * page_size - hot_total, 0)
+
+        wanted = page_size + 1 - len(logs)
+        older = await asyncio.to_thread(
+            audit_log_archive.read,
+            archive_filter,
+            wanted,
+            offset=offset,
+            after=seek if direction == NEXT else None
+        )
+        rows = logs + older
+        return rows[:page_size], len(rows) > page_size
+
+    async def stream_audit_logs(
+            self,
+            object_type: Optional[str] = None,
+            object_id: Optional[int] = None,
+            user_id: Optional[int] = None,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 1000
+    ) -> AsyncIterator[Mapping]:
+        """Newest first, continuing into the archive past its boundary."""
+        with_archive = await asyncio.to_thread(audit_log_archive.covers, since)
+        hot_since = audit_log_archive.archived_until if with_archive else since
+
+        async for row in self.log_repository.stream_audit_logs(
+                object_type=object_type,
+                object_id=object_id,
+                user_id=user_id,
+                since=hot_since,
+                until=until,
+                batch_size=batch_size
+        ):
+            yield row
+        if not with_archive:
+            return
+
+        archive_filter = ArchiveFilter(object_type, object_id, user_id, since, until)
+        after = None
+        while True:
+            rows = await asyncio.to_thread(audit_log_archive.read, archive_filter, batch_size, after=after)
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["timestamp"], rows[-1]["id"])
+
     async def create_device_log(
             self,
             user_id: int,
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import random
+import smtplib
+from email.message import Message
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_failure(error: smtplib.SMTPException) -> bool:
+    """5xx replies will be refused again; 4xx ones are worth a retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code >= 500
+    return isinstance(error, smtplib.SMTPNotSupportedError)
+
+
+class _Envelope:
+    __slots__ = ("message", "attempts")
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.attempts = 0
+
+
+class MailDispatcher:
+    """Queue of outgoing mail drained by a small pool of long-lived,
+    authenticated SMTP connections.
+
+    Each worker owns one connection and sends everything that is already
+    queued over it in one go, so a burst of messages costs one handshake.
+    smtplib calls run in a thread to keep the event loop free.
+    """
+
+    def __init__(
+            self,
+            host: str,
+            port: int,
+            username: Optional[str],
+            password: Optional[str],
+            use_tls: bool = True,
+            pool_size: int = 2,
+            batch_size: int = 20,
+            max_queue: int = 1000,
+            idle_timeout: float = 60,
+            max_attempts: int = 5,
+            initial_backoff: float = 0.5,
+            max_backoff: float = 30,
+            connect_timeout: float = 10,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.connect_timeout = connect_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+        self.sent = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.handshakes = 0
+        self.reconnects = 0
+        self.in_flight = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"mail-dispatcher-{i}")
+            for i in range(self.pool_size)
+        ]
+
+    async def stop(self, timeout: float = 10) -> None:
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Mail dispatcher stopped with %d queued messages", self.queue_depth)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def enqueue(self, message: Message) -> None:
+        self.start()
+        try:
+            self._queue.put_nowait(_Envelope(message))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Mail queue is full, try again later",
+                headers={"Retry-After": "5"},
+            )
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "workers": len(self._workers),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "handshakes": self.handshakes,
+            "reconnects": self.reconnects,
+        }
+
+    async def _next_batch(self, connection: Optional[smtplib.SMTP]) -> List[_Envelope]:
+        if connection is None:
+            first = await self._queue.get()
+        else:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                return []
+
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _worker(self) -> None:
+        connection = None
+        backoff = self.initial_backoff
+        try:
+            while True:
+                batch = await self._next_batch(connection)
+                if not batch:
+                    await asyncio.to_thread(self._close, connection)
+                    connection = None
+                    continue
+
+                self.batches += 1
+                self.in_flight += len(batch)
+                pending = list(batch)
+                try:
+                    while pending:
+                        try:
+                            connection = await asyncio.to_thread(self._deliver, connection, pending)
+                            backoff = self.initial_backoff
+                        except (smtplib.SMTPException, OSError) as e:
+                            logger.warning("SMTP delivery failed, reconnecting: %s", e)
+                            await asyncio.to_thread(self._close, connection)
+                            connection = None
+                            self.reconnects += 1
+
+                            pending[0].attempts += 1
+                            if pending[0].attempts >= self.max_attempts:
+                                pending.pop(0)
+                                self.failed += 1
+
+                            await asyncio.sleep(backoff * random.uniform(0.5, 1.5))
+                            backoff = min(backoff * 2, self.max_backoff)
+                        except Exception:
+                            # Not a delivery problem, so retrying would fail the
+                            # same way; the connection may be mid-command.
+                            logger.exception("Dropping message to %s", pending[0].message["To"])
+                            await asyncio.to_thread(self._close, connection)
+                            connection = None
+                            pending.pop(0)
+                            self.failed += 1
+                finally:
+                    self.in_flight -= len(batch)
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            await asyncio.to_thread(self._close, connection)
+
+    def _connect(self) -> smtplib.SMTP:
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.connect_timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username and self.password:
+            connection.login(self.username, self.password)
+        self.handshakes += 1
+        return connection
+
+    def _deliver(
+            self,
+            connection: Optional[smtplib.SMTP],
+            pending: List[_Envelope]
+    ) -> smtplib.SMTP:
+        if connection is None:
+            connection = self._connect()
+
+        while pending:
+            try:
+                connection.send_message(pending[0].message)
+                self.sent += 1
+            except smtplib.SMTPException as e:
+                if not is_permanent_failure(e):
+                    raise
+                logger.error("Dropping undeliverable message to %s: %s", pending[0].message["To"], e)
+                self.failed += 1
+                connection.rset()
+            pending.pop(0)
+
+        return connection
+
+    @staticmethod
+    def _close(connection: Optional[smtplib.SMTP]) -> None:
+        if connection is None:
+            return
+        try:
+            connection.quit()
+        except (smtplib.SMTPException, OSError):
+            connection.close()
+
+
+mail_dispatcher = MailDispatcher(
+    host=settings.SMTP_SERVER,
+    port=settings.SMTP_PORT,
+    username=settings.EMAIL_SENDER,
+    password=settings.EMAIL_PASSWORD,
+    use_tls=settings.SMTP_USE_TLS,
+    pool_size=settings.SMTP_POOL_SIZE,
+    batch_size=settings.SMTP_BATCH_SIZE,
+    max_queue=settings.SMTP_QUEUE_SIZE,
+    idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+    max_attempts=settings.SMTP_MAX_ATTEMPTS,
+    max_backoff=settings.SMTP_MAX_BACKOFF,
+)
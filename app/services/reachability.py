@@ -0,0 +1,338 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.database import AsyncSessionLocal
+from app.db.repositories.device_repository import DeviceRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def probe_tcp(
+        host: str,
+        port: int,
+        timeout: float
+) -> Tuple[bool, Optional[float], Optional[str]]:
+    """One TCP connect: (reachable, latency in ms, error)."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        transport, _ = await asyncio.wait_for(
+            loop.create_connection(asyncio.Protocol, host, port), timeout
+        )
+    except asyncio.TimeoutError:
+        return False, None, "timeout"
+    except OSError as e:
+        return False, None, e.strerror or str(e)
+    latency_ms = (time.perf_counter() - started) * 1000
+    transport.close()
+    return True, round(latency_ms, 3), None
+
+
+class _DeviceState:
+    __slots__ = (
+        "device_id", "ip_address", "port", "reachable", "latency_ms",
+        "checked_at", "changed_at", "failures", "revision", "error", "next_probe_at",
+    )
+
+    def __init__(self, device_id: int, ip_address: str, port: int):
+        self.device_id = device_id
+        self.ip_address = ip_address
+        self.port = port
+        self.reachable: Optional[bool] = None
+        self.latency_ms: Optional[float] = None
+        self.checked_at: Optional[datetime] = None
+        self.changed_at: Optional[datetime] = None
+        self.failures = 0
+        self.revision = 0
+        self.error: Optional[str] = None
+        self.next_probe_at = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "reachable": self.reachable,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "changed_at": self.changed_at,
+            "consecutive_failures": self.failures,
+            "error": self.error,
+        }
+
+
+class ReachabilityProber:
+    """Keeps an in-memory table of which devices accept TCP connections on
+    their management port.
+
+    A scheduler hands devices that are due to ``concurrency`` workers, each
+    probe bounded by ``timeout``. Reachable devices are probed again every
+    ``interval`` seconds, unreachable ones back off exponentially up to
+    ``max_backoff``; both delays are jittered so probes do not bunch up.
+    The device list is reloaded from the database only when the device
+    change counter has moved.
+
+    The table lives in the process that probes, so with several workers
+    each one probes every device; it is off unless ``REACHABILITY_ENABLED``
+    is set, which should be done for a single worker only.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker,
+            enabled: bool = False,
+            concurrency: int = 100,
+            timeout: float = 2,
+            interval: float = 60,
+            max_backoff: float = 900,
+            jitter: float = 0.1,
+            refresh_interval: float = 10
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.refresh_interval = refresh_interval
+
+        self._states: Dict[int, _DeviceState] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._targets_version: Optional[int] = None
+        # Versions restart with the process; the epoch keeps ETags built
+        # from them from matching another process's.
+        self._epoch = uuid4().hex[:8]
+
+        self.version = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.transitions = 0
+        self.in_flight = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if not self.enabled or self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.concurrency)
+        self._tasks = [asyncio.create_task(self._schedule(), name="reachability-scheduler")]
+        self._tasks += [
+            asyncio.create_task(self._worker(), name=f"reachability-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def check(self, host: str, port: int) -> Tuple[bool, Optional[float], Optional[str]]:
+        self.in_flight += 1
+        try:
+            return await probe_tcp(host, port, self.timeout)
+        finally:
+            self.in_flight -= 1
+
+    def set_targets(self, targets: Iterable[Tuple[int, str, int]]) -> None:
+        """Replaces the probed devices. Devices that are new or whose
+        address changed start out unknown and are probed right away."""
+        now = time.monotonic()
+        states = {}
+        for device_id, ip_address, port in targets:
+            state = self._states.get(device_id)
+            if state is None or (state.ip_address, state.port) != (ip_address, port):
+                if state is not None and state.reachable is not None:
+                    self.version += 1
+                state = _DeviceState(device_id, ip_address, port)
+                state.next_probe_at = now
+                heapq.heappush(self._heap, (now, device_id))
+            states[device_id] = state
+
+        if any(
+                state.reachable is not None
+                for device_id, state in self._states.items() if device_id not in states
+        ):
+            self.version += 1
+        self._states = states
+
+    async def refresh(self) -> None:
+        async with self.session_factory() as db:
+            repository = DeviceRepository(db)
+            version = await repository.get_change_version()
+            if version == self._targets_version:
+                return
+            targets = await repository.get_probe_targets()
+
+        self.set_targets(targets)
+        self._targets_version = version
+        self.refreshes += 1
+        self.last_refresh_at = time.time()
+
+    async def probe_all(self) -> None:
+        """Probes every device once, regardless of its schedule."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(state: _DeviceState) -> None:
+            async with semaphore:
+                await self._probe(state)
+
+        await asyncio.gather(*(probe(state) for state in list(self._states.values())))
+
+    async def _schedule(self) -> None:
+        next_refresh = 0.0
+        while True:
+            if time.monotonic() >= next_refresh:
+                try:
+                    await self.refresh()
+                    self.last_error = None
+                except Exception as e:
+                    self.refresh_failures += 1
+                    self.last_error = str(e)
+                    logger.exception("Could not load devices to probe")
+                next_refresh = time.monotonic() + self.refresh_interval
+
+            while self._heap and self._heap[0][0] <= time.monotonic():
+                due, device_id = heapq.heappop(self._heap)
+                state = self._states.get(device_id)
+                # Entries of removed devices or superseded schedules are stale.
+                if state is None or state.next_probe_at != due:
+                    continue
+                # Blocks while all workers are busy.
+                await self._queue.put(state)
+
+            wake_at = min(self._heap[0][0], next_refresh) if self._heap else next_refresh
+            await asyncio.sleep(max(wake_at - time.monotonic(), 0))
+
+    async def _worker(self) -> None:
+        while True:
+            state = await self._queue.get()
+            try:
+                await self._probe(state)
+            except Exception:
+                logger.exception("Probing device %d failed", state.device_id)
+            finally:
+                self._queue.task_done()
+
+    async def _probe(self, state: _DeviceState) -> None:
+        reachable, latency_ms, error = await self.check(state.ip_address, state.port)
+        if self._states.get(state.device_id) is not state:
+            # Removed or readdressed while the probe was running.
+            return
+
+        now = datetime.utcnow()
+        self.probes += 1
+        before = state.as_dict()
+        if reachable is not state.reachable:
+            if state.reachable is not None:
+                self.transitions += 1
+                logger.info(
+                    "Device %d (%s:%d) is now %s", state.device_id, state.ip_address,
+                    state.port, "reachable" if reachable else "unreachable"
+                )
+            state.changed_at = now
+
+        state.reachable = reachable
+        state.latency_ms = latency_ms
+        state.checked_at = now
+        state.error = error
+        if reachable:
+            state.failures = 0
+            delay = self.interval
+        else:
+            state.failures += 1
+            self.probe_failures += 1
+            delay = min(self.interval * 2 ** (state.failures - 1), self.max_backoff)
+        if state.as_dict() != before:
+            state.revision += 1
+            self.version += 1
+
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        state.next_probe_at = time.monotonic() + delay
+        heapq.heappush(self._heap, (state.next_probe_at, state.device_id))
+
+    def status(self, device_id: int) -> Optional[dict]:
+        state = self._states.get(device_id)
+        return state.as_dict() if state is not None else None
+
+    def statuses(
+            self,
+            device_ids: Optional[Iterable[int]] = None,
+            reachable: Optional[bool] = None
+    ) -> List[dict]:
+        if device_ids is None:
+            states = sorted(self._states.values(), key=lambda state: state.device_id)
+        else:
+            states = [
+                self._states[device_id] for device_id in dict.fromkeys(device_ids)
+                if device_id in self._states
+            ]
+        return [
+            {
+                "device_id": state.device_id,
+                "ip_address": state.ip_address,
+                "port": state.port,
+                **state.as_dict(),
+            }
+            for state in states
+            if reachable is None or state.reachable is reachable
+        ]
+
+    def state_tag(self, device_id: Optional[int] = None) -> str:
+        """Changes whenever anything in the status of ``device_id`` (or of
+        any device) changes, the time of the last check included; meant to
+        be folded into ETags."""
+        if device_id is None:
+            return f"{self._epoch}.{self.version}"
+        state = self._states.get(device_id)
+        return f"{self._epoch}.{state.revision if state is not None else 0}"
+
+    async def get_version(self, cached: bool = False) -> str:
+        return self.state_tag()
+
+    def stats(self) -> dict:
+        states = self._states.values()
+        return {
+            "enabled": self.enabled,
+            "devices": len(self._states),
+            "reachable": sum(1 for state in states if state.reachable is True),
+            "unreachable": sum(1 for state in states if state.reachable is False),
+            "unknown": sum(1 for state in states if state.reachable is None),
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "transitions": self.transitions,
+            "version": self.version,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh_at": self.last_refresh_at,
+            "last_error": self.last_error,
+        }
+
+
+reachability_prober = ReachabilityProber(
+    AsyncSessionLocal,
+    enabled=settings.REACHABILITY_ENABLED,
+    concurrency=settings.REACHABILITY_CONCURRENCY,
+    timeout=settings.REACHABILITY_TIMEOUT,
+    interval=settings.REACHABILITY_INTERVAL,
+    max_backoff=settings.REACHABILITY_MAX_BACKOFF,
+    jitter=settings.REACHABILITY_JITTER,
+    refresh_interval=settings.REACHABILITY_REFRESH_INTERVAL,
+)
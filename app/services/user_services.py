@@ -1,11 +1,12 @@
 from fastapi import HTTPException
 from sqlalchemy.exc import IntegrityError
 
+from app.core.principal_cache import principal_cache
 from app.core.security import create_access_token
 from app.db.repositories.user_repository import UserRepository
 from app.models.models import User
 from app.schemas.user_schema import UserCreate
-from app.services.auth import pwd_context
+from app.core.hashing import password_hasher
 
 
 class UserService:
@@ -22,7 +23,7 @@ class UserService:
                 if await self.user_repository.get_by_email(user_data.email):
                     raise HTTPException(status_code=400, detail="Email already exists")
 
-                hashed_password = pwd_context.hash(user_data.password)
+                hashed_password = await password_hasher.hash(user_data.password)
                 new_user = User(
                     username=user_data.username,
                     email=user_data.email,
@@ -39,8 +40,10 @@ class UserService:
 
     async def authenticate_user(self, username: str, password: str) -> dict:
         user = await self.user_repository.get_by_username(username)
-        if not user or not pwd_context.verify(password, user.hashed_password):
+        if not user or not await password_hasher.verify(password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Incorrect username or password")
+        if user.is_active is False:
+            raise HTTPException(status_code=401, detail="Inactive user")
         return {
             "id": user.id,
             "username": user.username,
@@ -54,7 +57,7 @@ class UserService:
             old_password: str,
             new_password: str
     ) -> dict:
-        if not pwd_context.verify(old_password, user.hashed_password):
+        if not await password_hasher.verify(old_password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Incorrect old password")
 
         if len(new_password) < 8:
@@ -63,8 +66,13 @@ class UserService:
                 detail="New password is too short (minimum 8 characters)"
             )
 
-        new_hashed_password = pwd_context.hash(new_password)
+        new_hashed_password = await password_hasher.hash(new_password)
         await self.user_repository.update_user_password(user, new_hashed_password)
+        principal_cache.invalidate(user.id)
 
         return {"message": "Password changed successfully"}
 
+    async def set_active(self, user: User, is_active: bool) -> User:
+        user = await self.user_repository.update_user_active(user, is_active)
+        principal_cache.invalidate(user.id)
+        return user
@@ -0,0 +1,582 @@
+"""HTTP load test of the API: throughput and latency percentiles per endpoint.
+
+    python -m benchmarks.load_test seed --users 50 --devices 10000 --logs 200000
+    python -m benchmarks.load_test run --scenario mixed --concurrency 50 --duration 30 --output new.json
+    python -m benchmarks.load_test run --scenario login --compare base.json --threshold 10
+    python -m benchmarks.load_test run --scenario login-storm --no-seed --server-url http://127.0.0.1:8000
+    python -m benchmarks.load_test compare base.json new.json --threshold 10
+
+``seed`` writes a dataset straight into the database the app is configured
+for (the usual DB_* settings, already migrated): ``bench-user-N`` users
+sharing one password, devices ``bench-NNNNNN`` on 198.18.0.0/15 and audit
+log entries of those users, newest first one second apart. It only tops up
+what is missing, so running it again is cheap. ``run`` seeds the same way
+unless ``--no-seed`` is given.
+
+``run`` starts ``uvicorn app.main:app`` in a subprocess on a free port
+(``--workers``), with the rate limiter and the reachability prober turned
+off unless ``--server-env`` says otherwise, or targets ``--server-url``
+instead, e.g. a stand-in or an already running server on the same data.
+``--concurrency`` virtual users each log in once, then loop over the
+requests of the scenario, picked at random by weight from a generator
+seeded with ``--seed`` and their index. Requests completed during
+``--warmup`` are thrown away; the ones started during the next
+``--duration`` seconds are reported. ``--login-rate`` adds logins arriving
+at that average rate whether or not earlier ones have finished; the
+``login-storm`` scenario uses it (10/s by default) to time
+``/devices/devices`` while bcrypt is busy. The client is a single process,
+so keep an eye on its CPU when the server has many workers.
+
+Results are written as JSON with ``--output``. ``compare`` (or ``run
+--compare``) lists the change of every endpoint present in both files and
+exits with 1 if one's ``--metric`` percentile grew, or its throughput
+dropped, by more than ``--threshold`` percent. Endpoints with fewer than
+``--min-requests`` requests in either run are listed but not judged.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCH_PASSWORD = "bench-password"
+SERVER_ENV = {"RATE_LIMIT_ENABLED": "false", "REACHABILITY_ENABLED": "false"}
+
+# name -> [(weight, request)]
+SCENARIOS: Dict[str, List[Tuple[int, str]]] = {
+    "mixed": [
+        (30, "list_devices"),
+        (25, "get_device"),
+        (20, "audit_logs"),
+        (10, "update_device"),
+        (10, "device_status"),
+        (5, "login"),
+    ],
+    "read": [
+        (40, "list_devices"),
+        (35, "get_device"),
+        (25, "audit_logs"),
+    ],
+    "login": [
+        (1, "login"),
+    ],
+    # Users page through devices while logins arrive at a fixed rate next to
+    # them; shows whether bcrypt holds up requests that never touch it.
+    "login-storm": [
+        (1, "list_devices"),
+    ],
+}
+
+# Default --login-rate per scenario, logins per second.
+LOGIN_RATES = {"login-storm": 10}
+
+# Requests that pick devices by id.
+DEVICE_REQUESTS = {"get_device", "update_device", "device_status"}
+
+ENDPOINTS = {
+    "login": "POST /auth/login",
+    "list_devices": "GET /devices/devices",
+    "get_device": "GET /devices/devices/{device_id}",
+    "update_device": "PUT /devices/devices/{device_id}",
+    "device_status": "GET /devices/devices/status",
+    "audit_logs": "GET /logs/audit-logs/",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+async def seed(users: int, devices: int, logs: int, password: str = BENCH_PASSWORD) -> dict:
+    from sqlalchemy import func, select
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+    from app.core.hashing import pwd_context
+    from app.database import AsyncSessionLocal, engine
+    from app.db.repositories.device_repository import DeviceRepository
+    from app.models.models import DeviceLog, User
+
+    if devices > 2 ** 17:
+        raise ValueError("198.18.0.0/15 has room for 131072 devices")
+
+    try:
+        async with AsyncSessionLocal() as db:
+            hashed_password = pwd_context.hash(password)
+            await db.execute(pg_insert(User).on_conflict_do_nothing(), [
+                {
+                    "username": f"bench-user-{i}",
+                    "email": f"bench-user-{i}@example.com",
+                    "hashed_password": hashed_password,
+                    "is_active": True,
+                }
+                for i in range(users)
+            ])
+
+            repository = DeviceRepository(db)
+            created = 0
+            for start in range(0, devices, 5000):
+                created += len(await repository.insert_devices([
+                    {
+                        "uid": f"bench-{i:06d}",
+                        "ip_address": f"198.{18 + i // 65536}.{i // 256 % 256}.{i % 256}",
+                        "port": 22,
+                        "admin_username": "admin",
+                        "admin_password": "secret",
+                    }
+                    for i in range(start, min(start + 5000, devices))
+                ]))
+            if created:
+                await repository.bump_change_version()
+
+            user_ids = list(await db.scalars(
+                select(User.id).where(User.username.like("bench-user-%")).order_by(User.id)
+            ))
+            existing = await db.scalar(
+                select(func.count()).select_from(DeviceLog).where(DeviceLog.user_id.in_(user_ids))
+            )
+            now = datetime.utcnow()
+            for start in range(existing, logs, 10000):
+                await db.execute(pg_insert(DeviceLog), [
+                    {
+                        "user_id": user_ids[i % len(user_ids)],
+                        "action": ("create", "update", "delete")[i % 3],
+                        "object_type": "isg_device",
+                        "object_id": i % max(devices, 1) + 1,
+                        "timestamp": now - timedelta(seconds=i),
+                        "details": {"port": {"old": 22, "new": 2222}},
+                    }
+                    for i in range(start, min(start + 10000, logs))
+                ])
+            await db.commit()
+    finally:
+        await engine.dispose()
+
+    return {
+        "users": len(user_ids),
+        "devices_created": created,
+        "logs_created": max(logs - existing, 0),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env={**os.environ, **SERVER_ENV, **env},
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {process.returncode}")
+            try:
+                if (await client.get(f"{url}/openapi.json")).status_code == 200:
+                    return process, url
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("uvicorn did not start within 60 seconds")
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class VirtualUser:
+    def __init__(
+            self,
+            client: httpx.AsyncClient,
+            username: str,
+            devices: Dict[int, dict],
+            page_size: int,
+            rng: random.Random
+    ):
+        self.client = client
+        self.username = username
+        self.devices = devices
+        self.device_ids = list(devices)
+        self.page_size = page_size
+        self.rng = rng
+        self.etags: Dict[int, str] = {}
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post(
+            "/auth/login", data={"username": self.username, "password": BENCH_PASSWORD}
+        )
+        if response.status_code == 200:
+            self.client.headers["Authorization"] = "Bearer " + response.json()["access_token"]
+        return response
+
+    async def list_devices(self) -> httpx.Response:
+        return await self.client.get("/devices/devices", params={
+            "page_size": self.page_size, "page_number": self.rng.randint(1, 10),
+        })
+
+    async def get_device(self) -> httpx.Response:
+        # Half of the reads revalidate a copy the user has seen before.
+        device_id = self.rng.choice(self.device_ids)
+        etag = self.etags.get(device_id) if self.rng.random() < 0.5 else None
+        response = await self.client.get(
+            f"/devices/devices/{device_id}",
+            headers={"If-None-Match": etag} if etag else None
+        )
+        if "etag" in response.headers:
+            self.etags[device_id] = response.headers["etag"]
+        return response
+
+    async def update_device(self) -> httpx.Response:
+        device_id = self.rng.choice(self.device_ids)
+        return await self.client.put(
+            f"/devices/devices/{device_id}",
+            json={**self.devices[device_id], "port": self.rng.choice((22, 2222))}
+        )
+
+    async def device_status(self) -> httpx.Response:
+        ids = self.rng.sample(self.device_ids, min(20, len(self.device_ids)))
+        return await self.client.get("/devices/devices/status", params={"ids": ids})
+
+    async def audit_logs(self) -> httpx.Response:
+        return await self.client.get("/logs/audit-logs/", params={
+            "page_size": self.page_size, "page_number": self.rng.randint(1, 5),
+        })
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    # Nearest rank.
+    return ordered[max(int(len(ordered) * p / 100 + 0.5) - 1, 0)] if ordered else 0.0
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], errors: int, duration: float) -> dict:
+    ordered = sorted(latencies)
+    summary = {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / duration, 2),
+        "mean_ms": round(sum(ordered) / len(ordered), 3) if ordered else 0.0,
+        "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(percentile(ordered, p), 3)
+    return summary
+
+
+async def load_devices(client: httpx.AsyncClient, limit: int = 1000) -> Dict[int, dict]:
+    """The first ``limit`` bench devices, as bodies for PUT."""
+    devices: Dict[int, dict] = {}
+    cursor = None
+    while len(devices) < limit:
+        params = {"page_size": 100, "count": "none"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/devices/devices", params=params)
+        response.raise_for_status()
+        page = response.json()
+        for device in page["data"]:
+            if device["uid"].startswith("bench-"):
+                devices[device["id"]] = {
+                    key: device[key] for key in ("uid", "ip_address", "port", "admin_username", "admin_password")
+                }
+        cursor = page["pagination"].get("next_cursor")
+        if not cursor:
+            break
+    return devices
+
+
+async def drive(
+        url: str,
+        scenario: str,
+        users: int,
+        concurrency: int,
+        duration: float,
+        warmup: float,
+        page_size: int,
+        seed_value: int,
+        login_rate: float = 0
+) -> dict:
+    weights, names = zip(*((weight, name) for weight, name in SCENARIOS[scenario]))
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    errors: Dict[str, int] = defaultdict(int)
+
+    def record(name: str, started: float, request: Awaitable[httpx.Response], measure_from: float):
+        async def timed() -> None:
+            try:
+                status = (await request).status_code
+            except httpx.HTTPError:
+                status = 0
+            if started >= measure_from:
+                latencies[name].append((time.monotonic() - started) * 1000)
+                statuses[name][status] += 1
+                if not 200 <= status < 400:
+                    errors[name] += 1
+        return timed()
+
+    async with httpx.AsyncClient(base_url=f"{url}/api/v1", timeout=60) as setup:
+        response = await setup.post("/auth/login", data={"username": "bench-user-0", "password": BENCH_PASSWORD})
+        if response.status_code != 200:
+            raise RuntimeError(f"Cannot log in as bench-user-0 ({response.status_code}); seed first")
+        setup.headers["Authorization"] = "Bearer " + response.json()["access_token"]
+        devices = await load_devices(setup) if DEVICE_REQUESTS.intersection(names) else {}
+    if DEVICE_REQUESTS.intersection(names) and not devices:
+        raise RuntimeError("No bench devices found; seed first")
+
+    async def user_loop(index: int, client: httpx.AsyncClient, measure_from: float, measure_until: float) -> None:
+        rng = random.Random(seed_value * 100003 + index)
+        user = VirtualUser(client, f"bench-user-{index % users}", devices, page_size, rng)
+        await user.login()
+        requests: Dict[str, Callable[[], Awaitable[httpx.Response]]] = {name: getattr(user, name) for name in names}
+        while True:
+            started = time.monotonic()
+            if started >= measure_until:
+                return
+            name = rng.choices(names, weights)[0]
+            await record(name, started, requests[name](), measure_from)
+
+    async def login_stream(client: httpx.AsyncClient, measure_from: float, measure_until: float) -> None:
+        # Open loop: logins keep arriving on schedule however slow they get.
+        rng = random.Random(seed_value * 100003 - 1)
+        tasks = []
+        next_at = time.monotonic()
+        while next_at < measure_until:
+            await asyncio.sleep(max(next_at - time.monotonic(), 0))
+            request = client.post("/auth/login", data={
+                "username": f"bench-user-{rng.randrange(users)}", "password": BENCH_PASSWORD,
+            })
+            tasks.append(asyncio.create_task(record("login", next_at, request, measure_from)))
+            next_at += rng.expovariate(login_rate)
+        await asyncio.gather(*tasks)
+
+    # A client per virtual user, each with its own token and connection.
+    clients = [
+        httpx.AsyncClient(base_url=f"{url}/api/v1", limits=httpx.Limits(max_connections=1), timeout=60)
+        for _ in range(concurrency)
+    ]
+    storm = httpx.AsyncClient(base_url=f"{url}/api/v1", limits=httpx.Limits(max_connections=500), timeout=60)
+    try:
+        measure_from = time.monotonic() + warmup
+        measure_until = measure_from + duration
+        await asyncio.gather(
+            *(user_loop(i, client, measure_from, measure_until) for i, client in enumerate(clients)),
+            *([login_stream(storm, measure_from, measure_until)] if login_rate else [])
+        )
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients), storm.aclose())
+
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    all_statuses: Dict[int, int] = defaultdict(int)
+    for counts in statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] += count
+    return {
+        "total": summarize(all_latencies, all_statuses, sum(errors.values()), duration),
+        "endpoints": {
+            ENDPOINTS[name]: summarize(latencies[name], statuses[name], errors[name], duration)
+            for name in dict.fromkeys(names + (("login",) if login_rate else ())) if latencies[name]
+        },
+        "devices_used": len(devices),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict) -> None:
+    config = results["config"]
+    print(
+        f"{config['scenario']}: {config['concurrency']} users"
+        + (f" + {config['login_rate']} logins/s" if config.get("login_rate") else "")
+        + f", {config['duration']} s "
+        f"after {config['warmup']} s warmup, {config['workers'] or 'external'} workers"
+    )
+    print(f"  {'endpoint':<34} {'requests':>8} {'errors':>6} {'req/s':>9} "
+          + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES))
+    for name, summary in [*results["endpoints"].items(), ("total", results["total"])]:
+        print(
+            f"  {name:<34} {summary['requests']:>8} {summary['errors']:>6} {summary['throughput']:>9.1f} "
+            + " ".join(f"{summary[f'p{p}_ms']:>9.2f}" for p in PERCENTILES)
+        )
+
+
+def compare(
+        baseline: dict,
+        current: dict,
+        threshold: float,
+        metric: str = "p95_ms",
+        min_requests: int = 50
+) -> List[str]:
+    """Prints the change of every endpoint present in both results and
+    returns the ones that regressed by more than ``threshold`` percent.
+    Endpoints with fewer than ``min_requests`` in either run are too noisy
+    to judge and are only listed."""
+    for key in ("scenario", "concurrency", "login_rate", "duration", "page_size", "workers"):
+        if baseline["config"].get(key) != current["config"].get(key):
+            print(f"warning: {key} differs ({baseline['config'].get(key)} vs {current['config'].get(key)})")
+
+    def change(old: float, new: float) -> float:
+        return (new / old - 1) * 100 if old else 0.0
+
+    regressions = []
+    print(f"  {'endpoint':<34} {metric:>21} {'change':>8} {'req/s':>19} {'change':>8}")
+    pairs = [(name, baseline["endpoints"][name], summary)
+             for name, summary in current["endpoints"].items() if name in baseline["endpoints"]]
+    for name, old, new in [*pairs, ("total", baseline["total"], current["total"])]:
+        latency_change = change(old[metric], new[metric])
+        throughput_change = change(old["throughput"], new["throughput"])
+        if min(old["requests"], new["requests"]) < min_requests:
+            verdict = "  too few requests"
+        elif latency_change > threshold or throughput_change < -threshold:
+            regressions.append(name)
+            verdict = "  REGRESSION"
+        else:
+            verdict = ""
+        print(
+            f"  {name:<34} {old[metric]:>9.2f} -> {new[metric]:>8.2f} {latency_change:>+7.1f}% "
+            f"{old['throughput']:>8.1f} -> {new['throughput']:>8.1f} {throughput_change:>+7.1f}%"
+            + verdict
+        )
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict:
+    login_rate = args.login_rate if args.login_rate is not None else LOGIN_RATES.get(args.scenario, 0)
+    dataset = None
+    if not args.no_seed:
+        dataset = {
+            "users": args.users,
+            "devices": args.devices,
+            "logs": args.logs,
+            **await seed(args.users, args.devices, args.logs),
+        }
+
+    process = None
+    url = args.server_url
+    if url is None:
+        env = dict(pair.split("=", 1) for pair in args.server_env)
+        process, url = await start_server(args.workers, env)
+    try:
+        measured = await drive(
+            url, args.scenario, args.users, args.concurrency, args.duration,
+            args.warmup, args.page_size, args.seed, login_rate
+        )
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    return {
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": {
+            "scenario": args.scenario,
+            "concurrency": args.concurrency,
+            "login_rate": login_rate,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "page_size": args.page_size,
+            "workers": None if args.server_url else args.workers,
+            "seed": args.seed,
+            "users": args.users,
+        },
+        "dataset": dataset,
+        **measured,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def dataset_arguments(command: argparse.ArgumentParser) -> None:
+        command.add_argument("--users", type=int, default=50)
+        command.add_argument("--devices", type=int, default=10000)
+        command.add_argument("--logs", type=int, default=200000)
+
+    seed_command = commands.add_parser("seed")
+    dataset_arguments(seed_command)
+
+    run_command = commands.add_parser("run")
+    dataset_arguments(run_command)
+    run_command.add_argument("--no-seed", action="store_true")
+    run_command.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    run_command.add_argument("--concurrency", type=int, default=50)
+    run_command.add_argument("--login-rate", type=float, help="logins per second on top of the users")
+    run_command.add_argument("--duration", type=float, default=30)
+    run_command.add_argument("--warmup", type=float, default=5)
+    run_command.add_argument("--page-size", type=int, default=50)
+    run_command.add_argument("--seed", type=int, default=0)
+    run_command.add_argument("--workers", type=int, default=1)
+    run_command.add_argument("--server-url")
+    run_command.add_argument("--server-env", action="append", default=[], metavar="NAME=VALUE")
+    run_command.add_argument("--output")
+    run_command.add_argument("--compare", metavar="BASELINE")
+
+    compare_command = commands.add_parser("compare")
+    compare_command.add_argument("baseline")
+    compare_command.add_argument("current")
+
+    for command in (run_command, compare_command):
+        command.add_argument("--threshold", type=float, default=10)
+        command.add_argument("--metric", choices=[f"p{p}_ms" for p in PERCENTILES] + ["mean_ms"], default="p95_ms")
+        command.add_argument("--min-requests", type=int, default=50)
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        print(json.dumps(asyncio.run(seed(args.users, args.devices, args.logs))))
+        return 0
+
+    if args.command == "compare":
+        with open(args.baseline) as baseline, open(args.current) as current:
+            regressions = compare(
+                json.load(baseline), json.load(current), args.threshold, args.metric, args.min_requests
+            )
+        return 1 if regressions else 0
+
+    results = asyncio.run(run(args))
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(json.load(baseline), results, args.threshold, args.metric, args.min_requests)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
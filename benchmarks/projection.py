@@ -0,0 +1,146 @@
+"""ORM entities vs. column projections for large list pages.
+
+    python -m benchmarks.projection --rows 20000 --page-size 5000 --repeat 20
+
+Seeds an in-memory SQLite database (aiosqlite, from requirements-dev.txt;
+the app itself does not need it) and times one page of
+devices and of audit logs, query plus serialization, the way the list
+endpoints used to load them (full entities, joined User) against the
+projection queries ``DeviceRepository.get_devices`` and
+``LogRepository.get_audit_logs`` run now. Peak Python memory per page is
+taken with tracemalloc in a separate pass, as tracing slows everything down.
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+
+from app.core.serialization import dump_rows
+from app.db.counting import NONE
+from app.db.repositories.device_repository import DeviceRepository
+from app.db.repositories.log_repository import LogRepository
+from app.models.models import Base, DeviceLog, ISGDevice, User
+from app.schemas.device_schemas import ISGDevice as ISGDeviceSchema, device_list_adapter
+from app.schemas.log_schema import LogWithUser, log_list_adapter
+
+
+async def seed(session_factory: async_sessionmaker, rows: int) -> None:
+    started = datetime(2026, 1, 1)
+    async with session_factory() as db:
+        await db.execute(insert(User), [{"id": 1, "username": "operator", "email": "op@example.com"}])
+        await db.execute(insert(ISGDevice), [
+            {
+                "uid": f"device-{i:06d}",
+                "ip_address": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                "port": 22,
+                "admin_username": "admin",
+                "admin_password": "secret",
+            }
+            for i in range(rows)
+        ])
+        await db.execute(insert(DeviceLog), [
+            {
+                "id": i + 1,
+                "user_id": 1,
+                "action": "update",
+                "object_type": "isg_device",
+                "object_id": i,
+                "timestamp": started + timedelta(seconds=i),
+                "details": {"port": {"old": 22, "new": 2222}, "note": "x" * 64},
+            }
+            for i in range(rows)
+        ])
+        await db.commit()
+
+
+async def orm_devices(db: AsyncSession, page_size: int) -> list:
+    result = await db.execute(select(ISGDevice).order_by(ISGDevice.id).limit(page_size + 1))
+    devices = result.scalars().all()[:page_size]
+    return [ISGDeviceSchema.model_validate(device).model_dump() for device in devices]
+
+
+async def orm_logs(db: AsyncSession, page_size: int) -> list:
+    result = await db.execute(
+        select(DeviceLog).options(joinedload(DeviceLog.user))
+        .where(DeviceLog.user_id == 1)
+        .order_by(DeviceLog.timestamp.desc(), DeviceLog.id.desc())
+        .limit(page_size + 1)
+    )
+    logs = result.unique().scalars().all()[:page_size]
+    return [LogWithUser.model_validate(log).model_dump() for log in logs]
+
+
+async def projected_devices(db: AsyncSession, page_size: int) -> list:
+    devices, _, _ = await DeviceRepository(db).get_devices(page_size=page_size, count_strategy=NONE)
+    return dump_rows(device_list_adapter, devices)
+
+
+async def projected_logs(db: AsyncSession, page_size: int) -> list:
+    logs, _, _ = await LogRepository(db).get_audit_logs(
+        page_size=page_size, user_id=1, count_strategy=NONE
+    )
+    return dump_rows(log_list_adapter, logs)
+
+
+async def measure(label, load, session_factory, page_size: int, repeat: int) -> float:
+    samples = []
+    for attempt in range(repeat + 1):
+        gc.collect()
+        async with session_factory() as db:
+            started = time.perf_counter()
+            page = await load(db, page_size)
+            elapsed = time.perf_counter() - started
+        if attempt:
+            samples.append(elapsed * 1e3)
+        assert len(page) == page_size
+
+    gc.collect()
+    tracemalloc.start()
+    async with session_factory() as db:
+        page = await load(db, page_size)
+        _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(samples)
+    print(f"  {label:<10} median {median:8.2f} ms   min {min(samples):8.2f} ms   peak {peak / 2**20:7.2f} MiB")
+    return median
+
+
+async def main(rows: int, page_size: int, repeat: int) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        # SQLite cannot autoincrement devicelog.id, which is only part of the
+        # (partitioning) primary key; seed() numbers the rows itself.
+        DeviceLog.__table__.c.id.autoincrement = False
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(session_factory, rows)
+
+        print(f"devices, page of {page_size} out of {rows}, {repeat} runs")
+        old = await measure("entities", orm_devices, session_factory, page_size, repeat)
+        new = await measure("projection", projected_devices, session_factory, page_size, repeat)
+        print(f"  speedup x{old / new:.1f}")
+
+        print(f"audit logs, page of {page_size} out of {rows}, {repeat} runs")
+        old = await measure("entities", orm_logs, session_factory, page_size, repeat)
+        new = await measure("projection", projected_logs, session_factory, page_size, repeat)
+        print(f"  speedup x{old / new:.1f}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.page_size, args.repeat))
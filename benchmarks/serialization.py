@@ -0,0 +1,145 @@
+"""Serialization cost of one list page, old path vs. fast path.
+
+    python -m benchmarks.serialization --rows 100 --repeat 2000
+
+The old path builds a ``PaginatedResponse`` from ORM objects, lets FastAPI
+validate it again against the route's response_model and renders it with
+the stdlib json encoder. The fast path validates the row mappings the
+repositories return once through a precompiled ``TypeAdapter`` and renders
+with orjson. No database is needed; the rows are built in memory.
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.core.serialization import dump_rows, json_response
+from app.db.repositories.device_repository import DEVICE_LIST_COLUMNS
+from app.db.repositories.log_repository import AUDIT_LOG_COLUMNS
+from app.models.models import DeviceLog, ISGDevice, User
+from app.schemas.device_schemas import ISGDevice as ISGDeviceSchema, device_list_adapter
+from app.schemas.log_schema import LogWithUser, log_list_adapter
+from app.schemas.pagination_schemas import PaginatedResponse, Pagination
+
+
+def make_devices(rows: int) -> list:
+    return [
+        ISGDevice(
+            id=i,
+            uid=f"device-{i:06d}",
+            ip_address=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            port=22,
+            admin_username="admin",
+            admin_password="secret",
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def make_logs(rows: int) -> list:
+    user = User(id=1, username="operator")
+    started = datetime(2026, 1, 1)
+    return [
+        DeviceLog(
+            id=i,
+            user_id=1,
+            user=user,
+            action="update",
+            object_type="isg_device",
+            object_id=i,
+            timestamp=started + timedelta(seconds=i),
+            details={"port": {"old": 22, "new": 2222}},
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def as_rows(objects: list, columns) -> list:
+    return [{column.key: getattr(obj, column.key) for column in columns} for obj in objects]
+
+
+def pagination(rows: int) -> Pagination:
+    return Pagination(page_number=1, page_size=rows, num_pages=10, total_results=rows * 10)
+
+
+async def old_path(field, schema, rows) -> bytes:
+    content = PaginatedResponse[schema](data=rows, pagination=pagination(len(rows)))
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def old_logs_path(field, rows) -> bytes:
+    # What LogService used to do before handing the page to FastAPI.
+    data = []
+    for log in rows:
+        log_data = LogWithUser.from_orm(log)
+        log_data.username = log.user.username
+        data.append(log_data)
+    content = PaginatedResponse[LogWithUser](data=data, pagination=pagination(len(rows)))
+    serialized = await serialize_response(field=field, response_content=content)
+    return JSONResponse(serialized).body
+
+
+async def fast_path(adapter, rows) -> bytes:
+    content = {
+        "data": dump_rows(adapter, rows),
+        "pagination": pagination(len(rows)).model_dump(),
+    }
+    return json_response(content).body
+
+
+async def measure(label: str, run, repeat: int) -> float:
+    for _ in range(min(repeat, 50)):
+        await run()
+    samples = []
+    gc.collect()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await run()
+        samples.append((time.perf_counter() - started) * 1e6)
+    median = statistics.median(samples)
+    p95 = statistics.quantiles(samples, n=20)[-1]
+    print(f"  {label:<6} min {min(samples):9.1f} us   median {median:9.1f} us   p95 {p95:9.1f} us")
+    return median
+
+
+async def main(rows: int, repeat: int) -> None:
+    devices = make_devices(rows)
+    logs = make_logs(rows)
+    device_rows = as_rows(devices, DEVICE_LIST_COLUMNS)
+    log_rows = as_rows(logs, AUDIT_LOG_COLUMNS)
+    device_field = create_model_field("response", PaginatedResponse[ISGDeviceSchema], mode="serialization")
+    log_field = create_model_field("response", PaginatedResponse[LogWithUser], mode="serialization")
+
+    # Both paths must produce the same document.
+    assert orjson.loads(await old_path(device_field, ISGDeviceSchema, devices)) == orjson.loads(
+        await fast_path(device_list_adapter, device_rows)
+    )
+    assert orjson.loads(await old_logs_path(log_field, logs)) == orjson.loads(
+        await fast_path(log_list_adapter, log_rows)
+    )
+
+    print(f"devices, {rows} rows per page, {repeat} runs")
+    old = await measure("old", lambda: old_path(device_field, ISGDeviceSchema, devices), repeat)
+    new = await measure("fast", lambda: fast_path(device_list_adapter, device_rows), repeat)
+    print(f"  speedup x{old / new:.1f}")
+
+    print(f"audit logs, {rows} rows per page, {repeat} runs")
+    old = await measure("old", lambda: old_logs_path(log_field, logs), repeat)
+    new = await measure("fast", lambda: fast_path(log_list_adapter, log_rows), repeat)
+    print(f"  speedup x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
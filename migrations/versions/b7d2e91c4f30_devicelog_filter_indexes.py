@@ -0,0 +1,56 @@
+"""devicelog filter indexes
+
+Revision ID: b7d2e91c4f30
+Revises: a30a2603d736
+Create Date: 2026-10-18 10:12:31.514207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e91c4f30'
+down_revision: Union[str, None] = 'a30a2603d736'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_devicelog_user_id_timestamp',
+            'devicelog',
+            ['user_id', 'timestamp', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_devicelog_user_id_object',
+            'devicelog',
+            ['user_id', 'object_id', 'object_type', 'timestamp', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_devicelog_user_id_object',
+            table_name='devicelog',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_devicelog_user_id_timestamp',
+            table_name='devicelog',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,34 @@
+"""change counter
+
+Revision ID: c3e8f1a2d5b7
+Revises: b7d2e91c4f30
+Create Date: 2026-10-18 13:40:02.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f1a2d5b7'
+down_revision: Union[str, None] = 'b7d2e91c4f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    change_counter = op.create_table(
+        'change_counter',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(change_counter, [{'name': 'isgdevice', 'version': 1}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('change_counter')
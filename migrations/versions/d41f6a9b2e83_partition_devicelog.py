@@ -0,0 +1,121 @@
+"""partition devicelog by timestamp
+
+Revision ID: d41f6a9b2e83
+Revises: c3e8f1a2d5b7
+Create Date: 2026-10-18 15:02:47.903215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a9b2e83'
+down_revision: Union[str, None] = 'c3e8f1a2d5b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, user_id, action, object_type, object_id, timestamp, details"
+
+
+def _rename_legacy(table: str, indexes: Sequence[str], constraints: Sequence[str]) -> None:
+    op.rename_table('devicelog', table)
+    for name in indexes:
+        op.execute(f'ALTER INDEX {name} RENAME TO {table}_{name}')
+    for name in constraints:
+        op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {name} TO {table}_{name}')
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_devicelog_id', 'devicelog', ['id'], unique=False)
+    op.create_index(
+        'ix_devicelog_user_id_timestamp', 'devicelog',
+        ['user_id', 'timestamp', 'id'], unique=False
+    )
+    op.create_index(
+        'ix_devicelog_user_id_object', 'devicelog',
+        ['user_id', 'object_id', 'object_type', 'timestamp', 'id'], unique=False
+    )
+
+
+def _columns() -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('devicelog_id_seq')"), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('object_type', sa.String(), nullable=False),
+        sa.Column('object_id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('details', sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='devicelog_user_id_fkey'),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _rename_legacy(
+        'devicelog_legacy',
+        indexes=['devicelog_pkey', 'ix_devicelog_id', 'ix_devicelog_user_id_timestamp', 'ix_devicelog_user_id_object'],
+        constraints=['devicelog_user_id_fkey'],
+    )
+
+    # The partition key has to be part of the primary key.
+    op.create_table(
+        'devicelog',
+        *_columns(),
+        sa.PrimaryKeyConstraint('id', 'timestamp', name='devicelog_pkey'),
+        postgresql_partition_by='RANGE (timestamp)',
+    )
+
+    # Monthly partitions from the oldest row up to three months ahead; the
+    # application's maintenance task keeps extending them from there.
+    op.execute("""
+        DO $$
+        DECLARE
+            period date := date_trunc('month', coalesce(
+                (SELECT min(timestamp) FROM devicelog_legacy), now() AT TIME ZONE 'utc'
+            ));
+            last_period date := date_trunc('month', now() AT TIME ZONE 'utc') + interval '3 months';
+        BEGIN
+            WHILE period <= last_period LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF devicelog FOR VALUES FROM (%L) TO (%L)',
+                    'devicelog_p' || to_char(period, 'YYYYMMDD'),
+                    period::timestamp,
+                    (period + interval '1 month')::timestamp
+                );
+                period := period + interval '1 month';
+            END LOOP;
+        END $$;
+    """)
+    op.execute("CREATE TABLE devicelog_default PARTITION OF devicelog DEFAULT")
+
+    op.execute(f"INSERT INTO devicelog ({COLUMNS}) SELECT {COLUMNS} FROM devicelog_legacy")
+    # Hand the id sequence over before the old table (its owner) is dropped.
+    op.execute("ALTER SEQUENCE devicelog_id_seq OWNED BY devicelog.id")
+    op.drop_table('devicelog_legacy')
+
+    # Built after the copy, which is much faster than maintaining them during it.
+    _create_indexes()
+    op.execute("ANALYZE devicelog")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _rename_legacy(
+        'devicelog_partitioned',
+        indexes=['devicelog_pkey', 'ix_devicelog_id', 'ix_devicelog_user_id_timestamp', 'ix_devicelog_user_id_object'],
+        constraints=['devicelog_user_id_fkey'],
+    )
+
+    op.create_table(
+        'devicelog',
+        *_columns(),
+        sa.PrimaryKeyConstraint('id', name='devicelog_pkey'),
+    )
+    op.execute(f"INSERT INTO devicelog ({COLUMNS}) SELECT {COLUMNS} FROM devicelog_partitioned")
+    op.execute("ALTER SEQUENCE devicelog_id_seq OWNED BY devicelog.id")
+    op.drop_table('devicelog_partitioned')
+    _create_indexes()
@@ -0,0 +1,80 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
+
+from app.core.security import create_access_token
+from app.database import get_db, get_read_db, get_read_sessionmaker
+from app.main import app
+from app.models.models import User
+
+
+def sessions_in(
+        connection: AsyncConnection,
+        join_transaction_mode: str = "create_savepoint"
+) -> async_sessionmaker:
+    """Sessions inside ``connection``'s transaction. A route's commit or
+    rollback then only reaches a savepoint, or with ``"rollback_only"``
+    (no SAVEPOINT statements) commits are dropped and a rollback ends the
+    whole transaction."""
+    return async_sessionmaker(
+        bind=connection, expire_on_commit=False, join_transaction_mode=join_transaction_mode
+    )
+
+
+async def create_user(connection: AsyncConnection, **values) -> int:
+    name = f"test-{uuid4().hex[:12]}"
+    values = {"username": name, "email": f"{name}@example.com", "hashed_password": "x", **values}
+    return await connection.scalar(insert(User).values(**values).returning(User.id))
+
+
+def new_device(**values) -> dict:
+    """Create payload for a device no other test uses."""
+    suffix = uuid4().hex
+    return {
+        "uid": f"test-{suffix}",
+        "ip_address": f"fd00::{suffix[:4]}:{suffix[4:8]}:{suffix[8:12]}:{suffix[12:16]}",
+        "port": 22,
+        "admin_username": "admin",
+        "admin_password": "secret",
+        **values,
+    }
+
+
+def bearer(user_id: int) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(str(user_id))}"}
+
+
+@asynccontextmanager
+async def api_client(
+        session_factory: async_sessionmaker,
+        user_id: Optional[int] = None
+) -> AsyncIterator[httpx.AsyncClient]:
+    """A client of the app whose requests use ``session_factory``, signed in
+    as ``user_id``. Reads share the request's session: two sessions would
+    nest savepoints on the one connection and could end them out of order."""
+    async def get_session():
+        async with session_factory() as session:
+            yield session
+
+    async def get_request_session(session: AsyncSession = Depends(get_db)):
+        return session
+
+    app.dependency_overrides.update({
+        get_db: get_session,
+        get_read_db: get_request_session,
+        get_read_sessionmaker: lambda: session_factory,
+    })
+    try:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://test/api/v1",
+            headers=bearer(user_id) if user_id is not None else None,
+        ) as client:
+            yield client
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,51 @@
+import os
+from typing import AsyncIterator
+
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# Settings are read at import time; these let the app be imported without a
+# .env. Tests that need PostgreSQL skip unless DB_HOST and friends point at one.
+for name, value in {
+    "DB_HOST": "127.0.0.1",
+    "DB_PORT": "5432",
+    "PG_USER": "postgres",
+    "PG_PASSWORD": "postgres",
+    "PG_DB": "isg_test",
+    "DOCKER_PORT": "8000",
+    "SMTP_SERVER": "127.0.0.1",
+    "SMTP_PORT": "25",
+    "EMAIL_SENDER": "api@example.com",
+    "EMAIL_PASSWORD": "secret",
+    "JWT_SECRET_KEY": "test-secret",
+    "JWT_ALGORITHM": "HS256",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.database import engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def pg_connection(anyio_backend) -> AsyncIterator[AsyncConnection]:
+    """A connection of the app's engine (with its event listeners) to the
+    configured, migrated database, inside a transaction that is rolled back
+    when the module is done."""
+    try:
+        connection = await engine.connect()
+    except (OSError, SQLAlchemyError) as e:
+        await engine.dispose()
+        pytest.skip(f"PostgreSQL is not reachable: {e}")
+
+    transaction = await connection.begin()
+    try:
+        yield connection
+    finally:
+        await transaction.rollback()
+        await connection.close()
+        await engine.dispose()
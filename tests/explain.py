@@ -0,0 +1,158 @@
+import json
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db.repositories.log_repository import LogRepository
+from app.models.models import User
+
+_RANGE_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+# Rows for the default partition go before any ranged partition can start.
+DEFAULT_PARTITION_RANGE = (datetime(2000, 1, 1), datetime(2000, 2, 1))
+
+
+@dataclass
+class Partition:
+    name: str
+    lower: datetime
+    upper: datetime
+    default: bool = False
+
+
+@dataclass
+class SeededLog:
+    user_ids: List[int]
+    partitions: List[Partition]
+
+
+@dataclass
+class Scan:
+    node_type: str
+    relation: str
+    indexes: List[str]
+
+
+async def devicelog_partitions(connection: AsyncConnection) -> List[Partition]:
+    rows = await connection.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'devicelog'::regclass ORDER BY c.relname"
+    ))
+    partitions = []
+    for name, bound in rows:
+        match = _RANGE_BOUND.search(bound)
+        if match:
+            lower, upper = (datetime.fromisoformat(value) for value in match.groups())
+            partitions.append(Partition(name, lower, upper))
+        else:
+            partitions.append(Partition(name, *DEFAULT_PARTITION_RANGE, default=True))
+    return sorted(partitions, key=lambda partition: partition.lower)
+
+
+async def seed_devicelog(
+        connection: AsyncConnection,
+        users: int = 100,
+        rows_per_partition: int = 10000
+) -> SeededLog:
+    """Spreads ``rows_per_partition`` rows evenly over the time range of
+    every devicelog partition, for ``users`` new users, then analyzes."""
+    prefix = f"plan-{uuid4().hex[:8]}"
+    user_ids = list((await connection.execute(
+        insert(User).returning(User.id),
+        [
+            {"username": f"{prefix}-{i}", "email": f"{prefix}-{i}@example.com", "hashed_password": "x"}
+            for i in range(users)
+        ]
+    )).scalars())
+
+    partitions = await devicelog_partitions(connection)
+    for partition in partitions:
+        await connection.execute(
+            text(
+                "INSERT INTO devicelog (user_id, action, object_type, object_id, timestamp, details) "
+                "SELECT (CAST(:user_ids AS integer[]))[1 + i % :users], 'update', "
+                "(ARRAY['device', 'user', 'command'])[1 + i % 3], (i / :users) % 500, "
+                "CAST(:lower AS timestamp) + (CAST(:upper AS timestamp) - CAST(:lower AS timestamp)) "
+                "* ((i + 0.5) / CAST(:rows AS float8)), json_build_object('seq', i) "
+                "FROM generate_series(0, :rows - 1) AS i"
+            ),
+            {
+                "user_ids": user_ids,
+                "users": users,
+                "lower": partition.lower,
+                "upper": partition.upper,
+                "rows": rows_per_partition,
+            }
+        )
+    await connection.execute(text("ANALYZE devicelog"))
+    await connection.execute(text("ANALYZE users"))
+    return SeededLog(user_ids, partitions)
+
+
+@contextmanager
+def captured_statements(connection: AsyncConnection) -> Iterator[List[Tuple[str, tuple]]]:
+    """Driver-level (statement, parameters) of everything executed on
+    ``connection`` inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_connection = connection.sync_connection
+    event.listen(sync_connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_connection, "before_cursor_execute", before_cursor_execute)
+
+
+async def selects(connection: AsyncConnection, method: str, **kwargs) -> List[Tuple[str, Optional[tuple]]]:
+    """The SELECTs a LogRepository ``method`` issues for ``kwargs``."""
+    session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint")
+    repository = LogRepository(session)
+    try:
+        with captured_statements(connection) as statements:
+            if method == "stream_audit_logs":
+                async for _ in repository.stream_audit_logs(**kwargs):
+                    pass
+            else:
+                await getattr(repository, method)(**kwargs)
+    finally:
+        await session.close()
+    return [(statement, parameters) for statement, parameters in statements
+            if statement.lstrip().upper().startswith("SELECT")]
+
+
+async def explain(connection: AsyncConnection, statement: str, parameters: Optional[tuple]) -> dict:
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters or ())
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def devicelog_scans(plan: dict) -> List[Scan]:
+    """Every scan of devicelog or one of its partitions in ``plan``."""
+    scans = []
+    relation = plan.get("Relation Name", "")
+    if relation.startswith("devicelog"):
+        indexes = [plan["Index Name"]] if "Index Name" in plan else [
+            child["Index Name"] for child in _walk(plan) if "Index Name" in child
+        ]
+        scans.append(Scan(plan["Node Type"], relation, indexes))
+    for child in plan.get("Plans", []):
+        scans += devicelog_scans(child)
+    return scans
+
+
+def _walk(plan: dict) -> Iterator[dict]:
+    for child in plan.get("Plans", []):
+        yield child
+        yield from _walk(child)
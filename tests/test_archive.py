@@ -0,0 +1,231 @@
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pytest
+
+from app.core.pagination import NEXT, PREV, decode_cursor
+from app.db.archive import MANIFEST, ArchiveFilter, AuditLogArchive
+from app.db.counting import EXACT, RowCount
+from app.services import logs_services
+from app.services.logs_services import LogService
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 1, 1)
+BOUNDARY = START + timedelta(days=2)
+
+
+def log(row_id: int, timestamp: datetime, user_id: int = 1, object_type: str = "device") -> dict:
+    return {
+        "id": row_id,
+        "user_id": user_id,
+        "username": f"user-{user_id}",
+        "action": "update",
+        "object_type": object_type,
+        "object_id": row_id,
+        "timestamp": timestamp,
+        "details": {"seq": row_id},
+    }
+
+
+def descending(rows: List[dict]) -> List[int]:
+    return [row["id"] for row in sorted(rows, key=lambda row: (row["timestamp"], row["id"]), reverse=True)]
+
+
+@pytest.fixture
+def rows() -> List[dict]:
+    """Two days of archived rows, every three hours, alternating users and
+    object types; rows 4 and 5 share a timestamp."""
+    rows = [
+        log(i, START + timedelta(hours=3 * i), user_id=1 + i % 2, object_type=("device", "user")[i % 3 == 0])
+        for i in range(16)
+    ]
+    rows[5]["timestamp"] = rows[4]["timestamp"]
+    return rows
+
+
+@pytest.fixture
+def archive(tmp_path, rows) -> AuditLogArchive:
+    archive = AuditLogArchive(str(tmp_path / "archive"))
+    for lower, upper in ((START, START + timedelta(days=1)), (START + timedelta(days=1), BOUNDARY)):
+        writer = archive.open_segment(lower, upper)
+        segment_rows = [row for row in rows if lower <= row["timestamp"] < upper]
+        for i in range(0, len(segment_rows), 3):
+            writer.write_chunk(segment_rows[i:i + 3])
+        archive.commit(upper, writer.close())
+    return archive
+
+
+def test_segments_and_manifest_round_trip(tmp_path, archive, rows):
+    with open(tmp_path / "archive" / MANIFEST) as f:
+        manifest = json.load(f)
+    assert manifest["archived_until"] == BOUNDARY.isoformat()
+    assert [(segment["lower"], segment["rows"]) for segment in manifest["segments"]] == [
+        (START.isoformat(), 8), ((START + timedelta(days=1)).isoformat(), 8)
+    ]
+    assert not list((tmp_path / "archive").glob("*.tmp"))
+
+    # A fresh instance, as in another worker, reads what was committed.
+    reopened = AuditLogArchive(archive.directory)
+    assert reopened.read(ArchiveFilter(), 100) == sorted(
+        rows, key=lambda row: (row["timestamp"], row["id"]), reverse=True
+    )
+    assert reopened.stats()["segments"] == 2 and reopened.stats()["rows"] == 16
+
+
+def test_empty_segment_is_not_recorded(tmp_path):
+    archive = AuditLogArchive(str(tmp_path))
+    assert not archive.covers(None)
+    writer = archive.open_segment(START, BOUNDARY)
+    archive.commit(BOUNDARY, writer.close())
+    assert archive.stats()["segments"] == 0
+    assert list(tmp_path.iterdir()) == [tmp_path / MANIFEST]
+
+
+def test_covers_only_queries_reaching_below_the_boundary(archive):
+    assert archive.covers(None)
+    assert archive.covers(BOUNDARY - timedelta(microseconds=1))
+    assert not archive.covers(BOUNDARY)
+
+
+@pytest.mark.parametrize("archive_filter", [
+    ArchiveFilter(),
+    ArchiveFilter(user_id=2),
+    ArchiveFilter(object_type="user"),
+    ArchiveFilter(object_id=7),
+    ArchiveFilter(since=START + timedelta(hours=10), until=START + timedelta(hours=30)),
+    ArchiveFilter(user_id=1, since=START + timedelta(hours=20)),
+])
+def test_read_and_count_apply_the_filter(archive, rows, archive_filter):
+    expected = descending([row for row in rows if archive_filter.matches(row)])
+    assert [row["id"] for row in archive.read(archive_filter, 100)] == expected
+    assert archive.count(archive_filter) == len(expected)
+    assert [row["id"] for row in archive.read(archive_filter, 2, offset=3)] == expected[3:5]
+
+
+def test_read_walks_both_ways_from_a_key(archive, rows):
+    expected = descending(rows)
+    by_id = {row["id"]: row for row in rows}
+    key = (by_id[5]["timestamp"], 5)
+
+    # Rows 4 and 5 share a timestamp; the id breaks the tie.
+    assert [row["id"] for row in archive.read(ArchiveFilter(), 3, after=key)] == [4, 3, 2]
+    assert [row["id"] for row in archive.read(ArchiveFilter(), 3, before=(by_id[4]["timestamp"], 4))] == [5, 6, 7]
+    assert [row["id"] for row in archive.read(ArchiveFilter(), 100, after=key)] == expected[expected.index(5) + 1:]
+
+
+def test_chunks_that_cannot_match_are_not_decompressed(archive):
+    archive.read(ArchiveFilter(since=START + timedelta(hours=40)), 100)
+    assert archive.chunks_read == 1
+
+    # Counting whole chunks needs the index only.
+    archive.chunks_read = 0
+    assert archive.count(ArchiveFilter(user_id=2)) == 8
+    assert archive.chunks_read == 0
+
+
+class HotRepositoryStandIn:
+    """The part of LogRepository the service uses, over a list of rows."""
+
+    def __init__(self, rows: List[dict]):
+        self.rows = sorted(rows, key=lambda row: (row["timestamp"], row["id"]), reverse=True)
+
+    def _filtered(self, object_type, object_id, user_id, since, until) -> List[dict]:
+        f = ArchiveFilter(object_type, object_id, user_id, since, until)
+        return [row for row in self.rows if f.matches(row)]
+
+    async def get_audit_logs(
+            self, page_number=1, page_size=100, object_type=None, object_id=None, user_id=None,
+            since=None, until=None, after=None, before=None, count_strategy=EXACT
+    ):
+        rows = self._filtered(object_type, object_id, user_id, since, until)
+        total = RowCount(len(rows), EXACT)
+        if after is not None:
+            rows = [row for row in rows if (row["timestamp"], row["id"]) < after]
+        elif before is not None:
+            rows = [row for row in reversed(rows) if (row["timestamp"], row["id"]) > before]
+        else:
+            rows = rows[(page_number - 1) * page_size:]
+        page = rows[:page_size]
+        if before is not None:
+            page.reverse()
+        return page, total, len(rows) > page_size
+
+    async def count_audit_logs(self, object_type=None, object_id=None, user_id=None, since=None, until=None):
+        return len(self._filtered(object_type, object_id, user_id, since, until))
+
+    async def stream_audit_logs(
+            self, object_type=None, object_id=None, user_id=None, since=None, until=None, batch_size=1000
+    ):
+        for row in self._filtered(object_type, object_id, user_id, since, until):
+            yield row
+
+
+@pytest.fixture
+def service(archive, rows, monkeypatch) -> LogService:
+    """Five rows newer than the boundary in the database, plus one older row
+    the archiver has not deleted yet."""
+    monkeypatch.setattr(logs_services, "audit_log_archive", archive)
+    hot = [log(100 + i, BOUNDARY + timedelta(hours=i), user_id=1 + i % 2) for i in range(5)]
+    return LogService(HotRepositoryStandIn(hot + [rows[-1]]))
+
+
+def expected_ids(rows: List[dict]) -> List[int]:
+    return [104, 103, 102, 101, 100] + descending(rows)
+
+
+async def walk(service: LogService, page_size: int, cursor: Optional[str] = None, **filters):
+    pages = []
+    while True:
+        page = await service.get_audit_logs(1, page_size, cursor=cursor, count_strategy=EXACT, **filters)
+        pages.append(page)
+        cursor = page["pagination"]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 4, 5, 7, 100])
+async def test_page_numbers_run_across_the_boundary(service, rows, page_size):
+    expected = expected_ids(rows)
+    seen = []
+    for number in range(1, len(expected) // page_size + 2):
+        page = await service.get_audit_logs(number, page_size, count_strategy=EXACT)
+        seen += [log["id"] for log in page["data"]]
+        assert page["pagination"]["total_results"] == len(expected)
+        assert page["pagination"]["has_more"] is (len(seen) < len(expected))
+    assert seen == expected
+
+
+@pytest.mark.parametrize("page_size", [2, 3, 5, 6])
+async def test_cursors_run_across_the_boundary_and_back(service, rows, page_size):
+    expected = expected_ids(rows)
+    pages = await walk(service, page_size)
+    assert [log["id"] for page in pages for log in page["data"]] == expected
+
+    back, cursor = [], pages[-1]["pagination"]["prev_cursor"]
+    assert decode_cursor(cursor)[1] == PREV
+    while cursor is not None:
+        page = await service.get_audit_logs(1, page_size, cursor=cursor, count_strategy=EXACT)
+        back = [log["id"] for log in page["data"]] + back
+        cursor = page["pagination"]["prev_cursor"]
+    assert back == expected[:-len(pages[-1]["data"])]
+    assert decode_cursor(pages[0]["pagination"]["next_cursor"])[1] == NEXT
+
+
+async def test_filters_apply_on_both_sides(service, rows):
+    expected = [103, 101] + descending([row for row in rows if row["user_id"] == 2])
+    pages = await walk(service, 3, user_id=2)
+    assert [log["id"] for page in pages for log in page["data"]] == expected
+
+    since = BOUNDARY - timedelta(hours=4)
+    pages = await walk(service, 3, since=since)
+    assert [log["id"] for page in pages for log in page["data"]] == [104, 103, 102, 101, 100, 15]
+
+
+async def test_stream_continues_into_the_archive(service, rows):
+    streamed = [row["id"] async for row in service.stream_audit_logs(batch_size=4)]
+    assert streamed == expected_ids(rows)
+
+    since = BOUNDARY + timedelta(hours=2)
+    assert [row["id"] async for row in service.stream_audit_logs(since=since)] == [104, 103, 102]
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.audit_sink import ASYNC, AuditLogSink
+from app.models.models import DeviceLog
+from tests.api import create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def user_id(pg_connection: AsyncConnection):
+    return await create_user(pg_connection)
+
+
+def entry(user_id: int, object_id: int) -> dict:
+    return {
+        "user_id": user_id, "action": "update", "object_type": "sink-test", "object_id": object_id,
+        "timestamp": datetime.utcnow(), "details": {},
+    }
+
+
+def sink(pg_connection: AsyncConnection, **kwargs) -> AuditLogSink:
+    options = {"max_queue": 100, "batch_size": 100, "flush_interval_ms": 60000, **kwargs}
+    return AuditLogSink(ASYNC, session_factory=sessions_in(pg_connection), **options)
+
+
+async def written(pg_connection: AsyncConnection, object_ids) -> int:
+    return await pg_connection.scalar(
+        select(func.count()).select_from(DeviceLog).where(
+            DeviceLog.object_type == "sink-test", DeviceLog.object_id.in_(list(object_ids))
+        )
+    )
+
+
+async def wait_for_flushes(audit_sink: AuditLogSink, flushes: int) -> None:
+    async def flushed():
+        while audit_sink.flushes < flushes:
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(flushed(), 5)
+
+
+async def test_full_batch_is_flushed_without_waiting(pg_connection, user_id):
+    audit_sink = sink(pg_connection, batch_size=3)
+    try:
+        for object_id in range(100, 107):
+            await audit_sink.submit(entry(user_id, object_id))
+        await wait_for_flushes(audit_sink, 2)
+
+        # The seventh row waits for more rows or the interval.
+        assert audit_sink.flushed_rows == 6
+        assert await written(pg_connection, range(100, 107)) == 6
+    finally:
+        await audit_sink.stop()
+    assert audit_sink.flushed_rows == 7
+
+
+async def test_partial_batch_is_flushed_after_the_interval(pg_connection, user_id):
+    audit_sink = sink(pg_connection, flush_interval_ms=50)
+    try:
+        for object_id in range(200, 202):
+            await audit_sink.submit(entry(user_id, object_id))
+        await asyncio.sleep(0.01)
+        assert audit_sink.flushes == 0
+
+        await wait_for_flushes(audit_sink, 1)
+        assert await written(pg_connection, range(200, 202)) == 2
+    finally:
+        await audit_sink.stop()
+
+
+async def test_stop_drains_the_queue(pg_connection, user_id):
+    audit_sink = sink(pg_connection, batch_size=2)
+    for object_id in range(300, 305):
+        await audit_sink.submit(entry(user_id, object_id))
+    await audit_sink.stop()
+
+    assert audit_sink.flushed_rows == 5
+    assert await written(pg_connection, range(300, 305)) == 5
+    assert audit_sink.stats()["queue_depth"] == 0
+
+
+async def test_failed_flush_is_counted_and_the_sink_keeps_going(pg_connection, user_id):
+    audit_sink = sink(pg_connection, batch_size=1, max_attempts=1)
+    try:
+        await audit_sink.submit({**entry(user_id, 400), "action": None})
+        await audit_sink.submit(entry(user_id, 401))
+        await wait_for_flushes(audit_sink, 1)
+    finally:
+        await audit_sink.stop()
+
+    assert (audit_sink.failed_rows, audit_sink.flushed_rows) == (1, 1)
+    assert await written(pg_connection, [400, 401]) == 1
+
+
+def test_sync_mode_bypasses_the_sink():
+    audit_sink = AuditLogSink("sync", max_queue=1, batch_size=1, flush_interval_ms=1)
+    audit_sink.start()
+    assert not audit_sink.asynchronous and audit_sink._task is None
+    with pytest.raises(ValueError):
+        AuditLogSink("later", max_queue=1, batch_size=1, flush_interval_ms=1)
@@ -0,0 +1,140 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.db.repositories.device_repository import DeviceRepository
+from app.db.repositories.log_repository import LogRepository
+from app.models.models import DeviceLog, ISGDevice
+from app.services import device_services
+from app.services.device_services import DeviceService
+from tests.api import api_client, create_user, new_device, sessions_in
+from tests.explain import captured_statements
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+def session_factory(pg_connection: AsyncConnection):
+    return sessions_in(pg_connection)
+
+
+@pytest.fixture(scope="module")
+async def user_id(pg_connection: AsyncConnection):
+    return await create_user(pg_connection)
+
+
+async def import_devices(session_factory, items, user_id):
+    async with session_factory() as db:
+        return await DeviceService(DeviceRepository(db), LogRepository(db)).bulk_create_devices(items, user_id)
+
+
+async def stored(pg_connection: AsyncConnection, items) -> int:
+    return await pg_connection.scalar(
+        select(func.count()).select_from(ISGDevice).where(ISGDevice.uid.in_([item["uid"] for item in items]))
+    )
+
+
+async def test_valid_rows_are_created_around_bad_ones(pg_connection, session_factory, user_id):
+    existing = new_device()
+    await import_devices(session_factory, [existing], user_id)
+    existing_id = await pg_connection.scalar(select(ISGDevice.id).where(ISGDevice.uid == existing["uid"]))
+
+    valid = [new_device() for _ in range(3)]
+    items = [
+        valid[0],
+        {**new_device(), "port": "not a port"},
+        valid[1],
+        new_device(uid=valid[0]["uid"]),
+        new_device(ip_address=existing["ip_address"]),
+        valid[2],
+        "not an object",
+    ]
+    result = await import_devices(session_factory, items, user_id)
+
+    assert result.received == 7
+    assert [(device.index, device.uid) for device in result.created] == [
+        (0, valid[0]["uid"]), (2, valid[1]["uid"]), (5, valid[2]["uid"])
+    ]
+    assert [(error.index, error.errors[0]["loc"]) for error in result.errors] == [(1, ("port",)), (6, ())]
+    assert [(c.index, c.field, c.device_id) for c in result.conflicts] == [
+        (3, "uid", None),
+        (4, "ip_address", existing_id),
+    ]
+    assert await stored(pg_connection, valid) == 3
+
+    logged = set(await pg_connection.scalars(
+        select(DeviceLog.object_id).where(DeviceLog.user_id == user_id, DeviceLog.action == "Create")
+    ))
+    assert {device.id for device in result.created} <= logged
+
+
+async def test_rows_are_inserted_in_chunks(pg_connection, session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(device_services, "BULK_CHUNK_SIZE", 2)
+    items = [new_device() for _ in range(5)]
+
+    with captured_statements(pg_connection) as statements:
+        result = await import_devices(session_factory, items, user_id)
+
+    inserts = [statement for statement, _ in statements if statement.startswith("INSERT INTO isgdevice")]
+    assert len(inserts) == 3
+    assert [device.index for device in result.created] == [0, 1, 2, 3, 4]
+    assert await stored(pg_connection, items) == 5
+
+
+async def test_database_error_rolls_back_every_chunk(pg_connection, session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(device_services, "BULK_CHUNK_SIZE", 2)
+    insert_devices = DeviceRepository.insert_devices
+    calls = 0
+
+    async def failing_second_chunk(self, devices_data):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("connection lost")
+        return await insert_devices(self, devices_data)
+
+    monkeypatch.setattr(DeviceRepository, "insert_devices", failing_second_chunk)
+    items = [new_device() for _ in range(4)]
+    with pytest.raises(RuntimeError):
+        await import_devices(session_factory, items, user_id)
+    assert await stored(pg_connection, items) == 0
+
+
+async def test_ndjson_and_json_bodies(pg_connection, session_factory, user_id):
+    items = [new_device(), new_device()]
+    async with api_client(session_factory, user_id) as client:
+        response = await client.post(
+            "/devices/bulk",
+            content="\n".join(json.dumps(item) for item in items) + "\n\n",
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 200
+        assert len(response.json()["created"]) == 2
+
+        response = await client.post(
+            "/devices/bulk",
+            content=json.dumps(new_device()) + "\n{broken\n",
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Line 2 is not valid JSON"
+
+        response = await client.post("/devices/bulk", json={"uid": "not a list"})
+        assert response.status_code == 400
+
+
+async def test_too_many_items_is_rejected(pg_connection, session_factory, user_id, monkeypatch):
+    monkeypatch.setattr(settings, "DEVICE_BULK_MAX_ITEMS", 2)
+    items = [new_device() for _ in range(3)]
+    async with api_client(session_factory, user_id) as client:
+        assert (await client.post("/devices/bulk", json=items)).status_code == 413
+        response = await client.post(
+            "/devices/bulk",
+            content="\n".join(json.dumps(item) for item in items),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert response.status_code == 413
+    assert await stored(pg_connection, items) == 0
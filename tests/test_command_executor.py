@@ -0,0 +1,205 @@
+import asyncio
+from typing import List, Optional
+
+import orjson
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.device_schemas import ISGDevice, ISGDeviceCreate
+from app.services.command_executor import (
+    ERROR,
+    FAILED,
+    NOT_FOUND,
+    OK,
+    CommandExecutor,
+    DeviceConnectionPool,
+    TcpLineTransport,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class DeviceStandIn:
+    """A device speaking the tcp-line protocol: ``echo <text>`` answers
+    ``OK <text>``, ``fail`` answers ``ERR``, ``hang`` never answers and
+    ``crash`` closes the connection without answering. Every line received
+    is kept in ``lines``."""
+
+    def __init__(self, password: str = "secret"):
+        self.password = password
+        self.port = 0
+        self.lines: List[str] = []
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._writers: List[asyncio.StreamWriter] = []
+
+    async def __aenter__(self) -> "DeviceStandIn":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop_connections(self) -> None:
+        for writer in self._writers:
+            writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.append(writer)
+        while line := await reader.readline():
+            self.lines.append(line.decode())
+            command, _, argument = line.decode().rstrip("\n").partition(" ")
+            if command == "crash":
+                break
+            if command == "LOGIN":
+                reply = "OK welcome" if argument.split(" ")[-1] == self.password else "ERR denied"
+            elif command == "echo":
+                reply = f"OK {argument}"
+            elif command == "hang":
+                await reader.read()
+                break
+            else:
+                reply = "ERR failed"
+            writer.write(reply.encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+
+class RecordingExecutor(CommandExecutor):
+    """Keeps the audit entries of its runs instead of writing them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(DeviceConnectionPool(TcpLineTransport), session_factory=None, **kwargs)
+        self.recorded: List[dict] = []
+
+    async def _record(self, run, user_id, summary, results) -> None:
+        self.recorded.append({"summary": summary, "results": results})
+
+
+def device(device_id: int, port: int, host: str = "127.0.0.1", password: str = "secret") -> dict:
+    return {
+        "id": device_id,
+        "ip_address": host,
+        "port": port,
+        "admin_username": "admin",
+        "admin_password": password,
+    }
+
+
+async def collect(run) -> List[dict]:
+    return [orjson.loads(line) async for line in run.stream()]
+
+
+async def test_bad_device_data_fails_only_that_device():
+    executor = RecordingExecutor(retries=2, backoff=0.01, timeout=5)
+    async with DeviceStandIn() as first, DeviceStandIn() as second:
+        run = executor.submit(
+            [
+                device(1, first.port),
+                device(2, 70000),
+                device(3, second.port, host="bad\x00host"),
+                device(4, second.port, password="wrong"),
+                device(5, second.port),
+            ],
+            ["echo one", "echo two"],
+            user_id=1,
+            missing_ids=[6],
+        )
+        events = await asyncio.wait_for(collect(run), 10)
+        await executor.stop()
+
+    results = {event["device_id"]: event for event in events if "device_id" in event}
+    assert {device_id: result["status"] for device_id, result in results.items()} == {
+        1: OK, 2: ERROR, 3: ERROR, 4: ERROR, 5: OK, 6: NOT_FOUND,
+    }
+    assert results[1]["results"][1]["output"] == "two"
+    # Neither bad data nor bad credentials are retried.
+    assert results[2]["attempts"] == results[3]["attempts"] == results[4]["attempts"] == 1
+    assert "OverflowError" in results[2]["error"]
+
+    summary = events[-1]["summary"]
+    assert (summary[OK], summary[FAILED], summary[ERROR], summary[NOT_FOUND]) == (2, 0, 3, 1)
+    assert [entry["summary"] for entry in executor.recorded] == [summary]
+    assert executor.stats()["in_flight"] == 0
+
+
+async def test_failed_command_and_timeout():
+    executor = RecordingExecutor(retries=1, backoff=0.01, timeout=0.3)
+    async with DeviceStandIn() as server:
+        run = executor.submit(
+            [device(1, server.port), device(2, server.port)],
+            ["echo one", "fail", "echo never"],
+            user_id=1,
+        )
+        failed = await asyncio.wait_for(collect(run), 10)
+
+        run = executor.submit([device(3, server.port)], ["hang"], user_id=1)
+        timed_out = await asyncio.wait_for(collect(run), 10)
+        await executor.stop()
+
+    assert [event["status"] for event in failed[:2]] == [FAILED, FAILED]
+    assert len(failed[0]["results"]) == 2
+    assert timed_out[0]["status"] == ERROR
+    # The device may have run it; it is not sent again.
+    assert timed_out[0]["attempts"] == 1
+    assert timed_out[0]["error"] == "No reply to 'hang', not retried: Timed out after 0.3s"
+
+
+async def test_command_without_reply_is_not_retried():
+    executor = RecordingExecutor(retries=2, backoff=0.01, timeout=5)
+    async with DeviceStandIn() as server:
+        run = executor.submit([device(1, server.port)], ["echo one", "crash", "echo two"], user_id=1)
+        events = await asyncio.wait_for(collect(run), 10)
+        await executor.stop()
+
+    assert events[0]["status"] == ERROR
+    assert events[0]["attempts"] == 1
+    assert events[0]["error"] == "No reply to 'crash', not retried: Connection closed by device"
+    assert [output["command"] for output in events[0]["results"]] == ["echo one"]
+    assert [line for line in server.lines if not line.startswith("LOGIN")] == ["echo one\n", "crash\n"]
+
+
+async def test_connection_closed_while_idle_is_retried():
+    executor = RecordingExecutor(retries=2, backoff=0.01, timeout=5)
+    async with DeviceStandIn() as server:
+        await asyncio.wait_for(collect(executor.submit([device(1, server.port)], ["echo one"], user_id=1)), 10)
+        server.drop_connections()
+        await asyncio.sleep(0.05)
+
+        events = await asyncio.wait_for(
+            collect(executor.submit([device(1, server.port)], ["echo two"], user_id=1)), 10
+        )
+        await executor.stop()
+
+    assert events[0]["status"] == OK
+    assert events[0]["attempts"] == 2
+    assert [line for line in server.lines if line.startswith("echo")] == ["echo one\n", "echo two\n"]
+
+
+@pytest.mark.parametrize("username, password", [
+    ("admin", "two words"),
+    ("admin", "secret\necho injected"),
+    ("admin\r", "secret"),
+    ("admin", "sec\x00ret"),
+])
+async def test_credentials_that_would_break_the_login_line_are_not_sent(username, password):
+    executor = RecordingExecutor(retries=2, backoff=0.01, timeout=5)
+    async with DeviceStandIn() as server:
+        target = {**device(1, server.port, password=password), "admin_username": username}
+        events = await asyncio.wait_for(collect(executor.submit([target], ["echo one"], user_id=1)), 10)
+        await executor.stop()
+
+    assert events[0]["status"] == ERROR
+    assert events[0]["attempts"] == 1
+    assert "whitespace or control characters" in events[0]["error"]
+    assert server.lines == []
+
+
+@pytest.mark.parametrize("port", [0, 65536, 70000])
+def test_device_port_must_be_valid(port):
+    values = {"uid": "d", "ip_address": "10.0.0.1", "port": port, "admin_username": "a", "admin_password": "p"}
+    with pytest.raises(ValidationError):
+        ISGDeviceCreate(**values)
+    # Rows stored before the check still serialize.
+    assert ISGDevice(id=1, **values).port == port
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, Integer, insert, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.orm import declarative_base
+
+from app.db.counting import ESTIMATED, EXACT, NONE, RowCount, count_rows
+from app.models.models import DeviceLog, ISGDevice
+from tests.api import api_client, create_user, sessions_in
+from tests.explain import captured_statements
+
+pytestmark = pytest.mark.anyio
+
+ProbeBase = declarative_base()
+
+
+class NeverAnalyzed(ProbeBase):
+    __tablename__ = "count_probe_never_analyzed"
+    id = Column(Integer, primary_key=True)
+
+
+@pytest.fixture(scope="module")
+def session_factory(pg_connection: AsyncConnection):
+    return sessions_in(pg_connection)
+
+
+@pytest.fixture(scope="module")
+async def logs(pg_connection: AsyncConnection):
+    """A user with five audit log rows."""
+    user_id = await create_user(pg_connection)
+    now = datetime.utcnow()
+    await pg_connection.execute(insert(DeviceLog), [
+        {"user_id": user_id, "action": "update", "object_type": "device", "object_id": i,
+         "timestamp": now - timedelta(seconds=i), "details": {}}
+        for i in range(5)
+    ])
+    return user_id
+
+
+async def test_exact_counts_the_filtered_rows(pg_connection, session_factory, logs):
+    async with session_factory() as db:
+        assert await count_rows(db, DeviceLog, [DeviceLog.user_id == logs], EXACT) == RowCount(5, EXACT)
+        assert await count_rows(db, DeviceLog, [DeviceLog.user_id == logs, DeviceLog.object_id < 2]) == (2, EXACT)
+
+
+async def test_none_issues_no_statement(pg_connection, session_factory):
+    async with session_factory() as db:
+        with captured_statements(pg_connection) as statements:
+            assert await count_rows(db, DeviceLog, [], NONE) == RowCount(None, NONE)
+    assert statements == []
+
+
+async def test_estimated_reads_planner_statistics(pg_connection, session_factory):
+    await pg_connection.execute(text("ANALYZE isgdevice"))
+    async with session_factory() as db:
+        exact = await count_rows(db, ISGDevice, [], EXACT)
+        estimate = await count_rows(db, ISGDevice, [], ESTIMATED)
+        filtered = await count_rows(db, DeviceLog, [DeviceLog.user_id == -1], ESTIMATED)
+
+    if exact.value == 0:
+        # An analyzed but empty table reads as never analyzed.
+        assert estimate == exact
+    else:
+        # A small table is analyzed in full.
+        assert estimate == RowCount(exact.value, ESTIMATED)
+    # With filters the planner's row estimate is used, at least 1 row.
+    assert filtered.strategy == ESTIMATED and filtered.value >= 1
+
+
+async def test_estimated_sums_the_partitions(pg_connection, session_factory):
+    await pg_connection.execute(text("ANALYZE devicelog"))
+    partitions = await pg_connection.scalar(text(
+        "SELECT sum(greatest(c.reltuples, 0))::bigint FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'devicelog'::regclass"
+    ))
+    async with session_factory() as db:
+        estimate = await count_rows(db, DeviceLog, [], ESTIMATED)
+    if partitions:
+        assert estimate == RowCount(partitions, ESTIMATED)
+    else:
+        assert estimate.strategy == EXACT
+
+
+async def test_estimated_falls_back_to_exact_without_statistics(pg_connection, session_factory):
+    await pg_connection.run_sync(NeverAnalyzed.__table__.create)
+    await pg_connection.execute(insert(NeverAnalyzed), [{"id": i} for i in range(3)])
+    async with session_factory() as db:
+        assert await count_rows(db, NeverAnalyzed, [], ESTIMATED) == RowCount(3, EXACT)
+
+
+@pytest.mark.parametrize("count, total, num_pages", [
+    ("exact", 5, 3),
+    ("none", None, None),
+])
+async def test_has_more_does_not_depend_on_the_count(pg_connection, session_factory, logs, count, total, num_pages):
+    async with api_client(session_factory, logs) as client:
+        first = (await client.get("/logs/audit-logs/", params={"page_size": 2, "count": count})).json()
+        last = (await client.get(
+            "/logs/audit-logs/", params={"page_size": 2, "page_number": 3, "count": count}
+        )).json()
+
+    assert first["pagination"]["count_strategy"] == count
+    assert (first["pagination"]["total_results"], first["pagination"]["num_pages"]) == (total, num_pages)
+    assert first["pagination"]["has_more"] is True
+    assert len(last["data"]) == 1
+    assert last["pagination"]["has_more"] is False
+
+
+async def test_unknown_count_strategy_is_rejected(pg_connection, session_factory, logs):
+    async with api_client(session_factory, logs) as client:
+        response = await client.get("/logs/audit-logs/", params={"count": "capped"})
+    assert response.status_code == 422
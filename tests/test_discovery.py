@@ -0,0 +1,105 @@
+import asyncio
+import gc
+import ipaddress
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.db.repositories.device_repository import DeviceRepository
+from app.db.repositories.log_repository import LogRepository
+from app.schemas.device_schemas import DiscoveryRequest
+from app.services.device_services import DeviceService
+from app.services.discovery import DiscoveryScanner, discovery_scanner
+
+pytestmark = pytest.mark.anyio
+
+LOOPBACK = [ipaddress.ip_network("127.0.0.1/32")]
+
+
+@pytest.fixture
+async def open_port():
+    server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.fixture
+async def closed_port():
+    server = await asyncio.start_server(lambda reader, writer: writer.close(), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+    return port
+
+
+def scanner(max_scans: int = 1) -> DiscoveryScanner:
+    return DiscoveryScanner(concurrency=4, timeout=0.5, rate=1000, burst=100, max_scans=max_scans)
+
+
+async def test_slots_are_claimed_synchronously():
+    discovery = scanner(max_scans=2)
+    first, second = discovery.reserve(), discovery.reserve()
+    assert first is not None and second is not None
+    assert discovery.reserve() is None
+
+    first.release()
+    first.release()
+    assert discovery.running == 1
+    assert discovery.reserve() is not None
+
+
+async def test_scan_reports_open_ports_and_releases_its_slot(open_port, closed_port):
+    discovery = scanner()
+    stream = discovery.run(discovery.reserve(), LOOPBACK, [open_port, closed_port], known={})
+    assert discovery.reserve() is None
+
+    events = [orjson.loads(line) async for line in stream]
+
+    assert [(event["ip_address"], event["port"]) for event in events if event["event"] == "found"] == [
+        ("127.0.0.1", open_port)
+    ]
+    assert events[-1]["event"] == "done"
+    assert (events[-1]["scanned"], events[-1]["open"]) == (2, 1)
+    assert discovery.running == 0
+
+
+async def test_closed_stream_releases_its_slot(open_port):
+    discovery = scanner()
+    stream = discovery.run(discovery.reserve(), LOOPBACK, [open_port], known={})
+    assert orjson.loads(await stream.__anext__())["event"] == "started"
+    await stream.aclose()
+    assert discovery.running == 0
+
+
+async def test_stream_that_never_starts_releases_its_slot(open_port):
+    discovery = scanner()
+    stream = discovery.run(discovery.reserve(), LOOPBACK, [open_port], known={})
+    assert discovery.running == 1
+    del stream
+    gc.collect()
+    assert discovery.running == 0
+
+
+async def test_request_holds_its_slot_before_streaming(pg_connection: AsyncConnection, monkeypatch, open_port):
+    monkeypatch.setattr(discovery_scanner, "max_scans", 1)
+    session = AsyncSession(bind=pg_connection, join_transaction_mode="create_savepoint")
+    service = DeviceService(DeviceRepository(session), LogRepository(session))
+    request = DiscoveryRequest(networks=["127.0.0.1/32"], ports=[open_port])
+    try:
+        stream = await service.discover_devices(request, user_id=1)
+        # The first scan has not started streaming yet but holds the slot.
+        with pytest.raises(HTTPException) as excinfo:
+            await service.discover_devices(request, user_id=1)
+        assert excinfo.value.status_code == 503
+
+        # Never iterated, e.g. the client went away before the body started.
+        del stream
+        gc.collect()
+        assert discovery_scanner.running == 0
+    finally:
+        await session.close()
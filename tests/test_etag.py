@@ -0,0 +1,113 @@
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from starlette.requests import Request
+
+from app.core.etag import VersionCache, etag_matches, make_etag, query_digest, version_cache
+from app.core.query_tracker import track_queries
+from app.db.repositories.device_repository import DEVICE_CHANGE_COUNTER, DeviceRepository
+from app.models.models import ChangeCounter
+from tests.api import api_client, create_user, new_device, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+
+def test_if_none_match_uses_the_weak_comparison():
+    etag = make_etag("device", 7, 12)
+    assert etag == '"device-7-12"'
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"device-7-11"', etag)
+
+
+def test_query_digest_ignores_parameter_order():
+    def request(query: bytes) -> Request:
+        return Request({"type": "http", "query_string": query, "headers": []})
+
+    assert query_digest(request(b"a=1&b=2")) == query_digest(request(b"b=2&a=1"))
+    assert query_digest(request(b"a=1")) != query_digest(request(b"a=2"))
+
+
+def test_version_cache_expires_and_never_goes_back():
+    cache = VersionCache(ttl_seconds=0.05)
+    cache.set("devices", 5)
+    cache.set("devices", 4)
+    assert cache.get("devices") == 5
+    time.sleep(0.06)
+    assert cache.get("devices") is None
+    cache.set("devices", 4)
+    assert cache.get("devices") == 4
+
+    assert VersionCache(ttl_seconds=0).get("devices") is None
+
+
+@pytest.fixture(scope="module")
+def session_factory(pg_connection: AsyncConnection):
+    return sessions_in(pg_connection)
+
+
+@pytest.fixture
+async def client(pg_connection, session_factory, monkeypatch):
+    # Earlier modules roll back their counter bumps, but the process-wide
+    # cache never goes back to a lower version.
+    monkeypatch.setattr(version_cache, "_versions", {})
+    async with api_client(session_factory, await create_user(pg_connection)) as client:
+        yield client
+
+
+async def stored_version(pg_connection: AsyncConnection) -> int:
+    return await pg_connection.scalar(
+        select(ChangeCounter.version).where(ChangeCounter.name == DEVICE_CHANGE_COUNTER)
+    )
+
+
+@pytest.mark.parametrize("path", ["/devices/devices/{device_id}", "/devices/devices"])
+async def test_304_until_a_write_changes_the_etag(client, path):
+    device_id = (await client.post("/devices/devices/", json=new_device())).json()["id"]
+    path = path.format(device_id=device_id)
+
+    first = await client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    with track_queries() as tracker:
+        cached = await client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+    # Answered from the cached version and principal: no statement at all.
+    assert tracker.count == 0
+
+    updated = await client.put(f"/devices/devices/{device_id}", json=new_device())
+    assert updated.status_code == 200
+
+    changed = await client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert (await client.get(path, headers={"If-None-Match": changed.headers["ETag"]})).status_code == 304
+
+
+async def test_writes_bump_the_change_counter(pg_connection, client):
+    before = await stored_version(pg_connection)
+    device_id = (await client.post("/devices/devices/", json=new_device())).json()["id"]
+    await client.put(f"/devices/devices/{device_id}", json=new_device())
+    await client.delete(f"/devices/devices/{device_id}")
+    assert await stored_version(pg_connection) == before + 3
+
+
+async def test_write_in_another_worker_shows_after_the_cache_ttl(pg_connection, session_factory, client, monkeypatch):
+    etag = (await client.get("/devices/devices")).headers["ETag"]
+
+    # Another process bumps the counter; this one only learns of it once
+    # its cached version expires.
+    async with session_factory() as db:
+        await DeviceRepository(db).bump_change_version()
+        await db.commit()
+    assert (await client.get("/devices/devices", headers={"If-None-Match": etag})).status_code == 304
+
+    monkeypatch.setattr(version_cache, "_versions", {})
+    assert (await client.get("/devices/devices", headers={"If-None-Match": etag})).status_code == 200
@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.models import DeviceLog
+from app.services import export_services
+from tests.api import api_client, create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+START = datetime(2026, 3, 1, 12, 0, 0)
+
+
+@pytest.fixture(scope="module")
+async def logs(pg_connection: AsyncConnection):
+    """A user with ten audit log rows an hour apart from START on; the ids
+    newest first."""
+    user_id = await create_user(pg_connection)
+    ids = (await pg_connection.execute(
+        insert(DeviceLog).returning(DeviceLog.id),
+        [
+            {"user_id": user_id, "action": "update", "object_type": "device", "object_id": i,
+             "timestamp": START + timedelta(hours=i), "details": {"seq": i, "note": 'a "quoted", value'}}
+            for i in range(10)
+        ]
+    )).scalars().all()
+    return user_id, list(reversed(ids))
+
+
+@pytest.fixture
+async def client(pg_connection: AsyncConnection, logs):
+    async with api_client(sessions_in(pg_connection), logs[0]) as client:
+        yield client
+
+
+def ndjson(response) -> list:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+async def test_ndjson_export_streams_every_row_newest_first(client, logs, monkeypatch):
+    # Small chunks so the body is sent in several pieces.
+    monkeypatch.setattr(export_services, "CHUNK_SIZE", 200)
+    response = await client.get("/logs/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="audit-logs.ndjson"'
+    rows = ndjson(response)
+    assert [row["id"] for row in rows] == logs[1]
+    assert rows[0]["details"] == {"seq": 9, "note": 'a "quoted", value'}
+    assert rows[0]["timestamp"] == (START + timedelta(hours=9)).isoformat()
+    assert rows[0]["username"].startswith("test-")
+
+
+async def test_csv_export_has_a_header_and_json_details(client, logs):
+    response = await client.get("/logs/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == ["id", "timestamp", "user_id", "username", "action", "object_type", "object_id", "details"]
+    assert [int(row[0]) for row in rows] == logs[1]
+    assert json.loads(rows[0][7]) == {"seq": 9, "note": 'a "quoted", value'}
+
+
+async def test_compressed_export_is_gzip(client):
+    plain = await client.get("/logs/export")
+    async with client.stream("GET", "/logs/export", params={"compress": "true"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    assert zlib.decompress(raw, 31) == plain.content
+
+
+@pytest.mark.parametrize("since, until", [
+    ("2026-03-01T14:00:00", "2026-03-01T17:00:00"),
+    ("2026-03-01T14:00:00Z", "2026-03-01T17:00:00Z"),
+    ("2026-03-01T16:00:00+02:00", "2026-03-01T12:00:00-05:00"),
+])
+async def test_since_and_until_may_carry_a_timezone(client, logs, since, until):
+    expected = logs[1][5:8]
+    response = await client.get("/logs/export", params={"since": since, "until": until})
+    assert response.status_code == 200
+    assert [row["id"] for row in ndjson(response)] == expected
+
+    response = await client.get("/logs/audit-logs/", params={"since": since, "until": until})
+    assert response.status_code == 200
+    assert [log["id"] for log in response.json()["data"]] == expected
+
+
+async def test_unknown_format_is_rejected(client):
+    assert (await client.get("/logs/export", params={"format": "xml"})).status_code == 422
@@ -0,0 +1,37 @@
+import pytest
+from passlib.exc import MissingBackendError
+
+from app.core import hashing
+from app.core.hashing import PasswordHasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_and_verify_round_trip():
+    hasher = PasswordHasher("auto", max_workers=1, max_pending=2)
+    try:
+        hashed = await hasher.hash("correct horse")
+        assert await hasher.verify("correct horse", hashed)
+        assert not await hasher.verify("wrong horse", hashed)
+        assert hasher.executor_kind in ("thread", "process")
+    finally:
+        hasher.shutdown()
+
+
+async def test_missing_backend_is_reported_on_first_use(monkeypatch):
+    handler = hashing.pwd_context.handler("bcrypt")
+
+    def get_backend():
+        raise MissingBackendError("no bcrypt backends available")
+
+    monkeypatch.setattr(handler, "get_backend", get_backend)
+    hasher = PasswordHasher("auto", max_workers=1, max_pending=2)
+    assert hasher.executor_kind == "auto"
+    with pytest.raises(RuntimeError, match="install the bcrypt package"):
+        await hasher.hash("password")
+    assert hasher.pending == 0
+
+
+def test_unknown_executor_is_rejected():
+    with pytest.raises(ValueError):
+        PasswordHasher("fiber", max_workers=1, max_pending=2)
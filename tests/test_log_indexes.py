@@ -0,0 +1,79 @@
+from datetime import timedelta
+from typing import Optional
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from tests.explain import SeededLog, devicelog_scans, explain, seed_devicelog, selects
+
+pytestmark = pytest.mark.anyio
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+BY_TIME = "user_id_timestamp"
+BY_OBJECT = "user_id_object_id"
+
+# (filters besides user_id, bounded by a time window, index the page must
+# use or None where either filter index is a good plan)
+COMBINATIONS = [
+    ({}, False, BY_TIME),
+    ({"object_type": "device"}, False, None),
+    ({"object_id": 7}, False, BY_OBJECT),
+    ({"object_id": 7, "object_type": "device"}, False, BY_OBJECT),
+    ({}, True, BY_TIME),
+    ({"object_type": "user"}, True, None),
+    ({"object_id": 7, "object_type": "device"}, True, BY_OBJECT),
+]
+
+
+@pytest.fixture(scope="module")
+async def seeded(pg_connection: AsyncConnection) -> SeededLog:
+    return await seed_devicelog(pg_connection)
+
+
+def filters_for(seeded: SeededLog, filters: dict, windowed: bool) -> dict:
+    filters = {"user_id": seeded.user_ids[3], **filters}
+    if windowed:
+        partition = next(p for p in reversed(seeded.partitions) if not p.default)
+        filters["since"] = partition.lower + timedelta(days=1)
+        filters["until"] = partition.lower + timedelta(days=3)
+    return filters
+
+
+async def assert_index_scans(connection: AsyncConnection, statement: str, parameters, index: Optional[str] = None):
+    plan = await explain(connection, statement, parameters)
+    scans = devicelog_scans(plan)
+    assert scans, plan
+    for scan in scans:
+        assert scan.node_type in INDEX_SCANS, f"{scan.node_type} on {scan.relation}:\n{statement}"
+        assert scan.indexes and all(BY_TIME in name or BY_OBJECT in name for name in scan.indexes), scan
+        # A lower time bound cannot prune the default partition, whose rows
+        # all predate it; either index finds nothing there just as fast.
+        if index is not None and not scan.relation.endswith("_default"):
+            assert all(index in name for name in scan.indexes), f"{scan.indexes}:\n{statement}"
+
+
+@pytest.mark.parametrize("filters, windowed, index", COMBINATIONS)
+async def test_page_and_count_use_filter_indexes(pg_connection, seeded, filters, windowed, index):
+    page, count = await selects(
+        pg_connection, "get_audit_logs", page_size=10, **filters_for(seeded, filters, windowed)
+    )
+    await assert_index_scans(pg_connection, *page, index=index)
+    await assert_index_scans(pg_connection, *count)
+
+
+@pytest.mark.parametrize("filters, windowed, index", COMBINATIONS)
+async def test_cursor_pages_use_filter_indexes(pg_connection, seeded, filters, windowed, index):
+    kwargs = filters_for(seeded, filters, windowed)
+    # Mid-range, so both directions have plenty of rows to page through.
+    start, end = kwargs.get("since", seeded.partitions[1].lower), kwargs.get("until", seeded.partitions[-1].upper)
+    key = (start + (end - start) / 2, 1)
+
+    for direction in ("after", "before"):
+        page, _ = await selects(pg_connection, "get_audit_logs", page_size=10, **kwargs, **{direction: key})
+        await assert_index_scans(pg_connection, *page, index=index)
+
+
+@pytest.mark.parametrize("filters, windowed, index", COMBINATIONS)
+async def test_export_uses_filter_indexes(pg_connection, seeded, filters, windowed, index):
+    (export,) = await selects(pg_connection, "stream_audit_logs", **filters_for(seeded, filters, windowed))
+    await assert_index_scans(pg_connection, *export)
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Optional, Set
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import engine
+from app.db.partitions import DETACH, DROP, MONTH, PartitionMaintainer
+from tests.explain import Partition, SeededLog, devicelog_scans, explain, seed_devicelog, selects
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+async def seeded(pg_connection: AsyncConnection) -> SeededLog:
+    return await seed_devicelog(pg_connection, rows_per_partition=2000)
+
+
+def ranged(seeded: SeededLog) -> List[Partition]:
+    return [partition for partition in seeded.partitions if not partition.default]
+
+
+def expected_partitions(seeded: SeededLog, since: Optional[datetime], until: Optional[datetime]) -> Set[str]:
+    """Partitions a [since, until) scan has to touch: the ranged ones it
+    overlaps, plus the default one unless they cover all of it."""
+    partitions = [
+        partition for partition in ranged(seeded)
+        if (until is None or partition.lower < until) and (since is None or partition.upper > since)
+    ]
+    names = {partition.name for partition in partitions}
+
+    covered_from = since
+    for partition in sorted(partitions, key=lambda p: p.lower):
+        if covered_from is None or partition.lower > covered_from:
+            break
+        covered_from = max(covered_from, partition.upper)
+    else:
+        if until is not None and covered_from is not None and covered_from >= until:
+            return names
+    return names | {next(p.name for p in seeded.partitions if p.default)}
+
+
+async def scanned(connection: AsyncConnection, statement: str, parameters) -> Set[str]:
+    plan = await explain(connection, statement, parameters)
+    return {scan.relation for scan in devicelog_scans(plan)}
+
+
+def windows(seeded: SeededLog) -> dict:
+    partitions = ranged(seeded)
+    last, previous = partitions[-1], partitions[-2]
+    return {
+        "one partition": (last.lower + timedelta(days=1), last.lower + timedelta(days=2)),
+        "exactly one partition": (last.lower, last.upper),
+        "two partitions": (previous.upper - timedelta(days=1), previous.upper + timedelta(days=1)),
+        "open end": (last.lower + timedelta(days=1), None),
+        "open start": (None, partitions[1].lower + timedelta(days=1)),
+    }
+
+
+WINDOWS = ["one partition", "exactly one partition", "two partitions", "open end", "open start"]
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+async def test_time_bounded_page_and_count_prune_partitions(pg_connection, seeded, window):
+    since, until = windows(seeded)[window]
+    expected = expected_partitions(seeded, since, until)
+    assert len(expected) < len(seeded.partitions)
+
+    page, count = await selects(
+        pg_connection, "get_audit_logs", page_size=10,
+        user_id=seeded.user_ids[0], since=since, until=until
+    )
+    assert await scanned(pg_connection, *page) == expected
+    assert await scanned(pg_connection, *count) == expected
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+async def test_time_bounded_export_prunes_partitions(pg_connection, seeded, window):
+    since, until = windows(seeded)[window]
+    (export,) = await selects(
+        pg_connection, "stream_audit_logs", user_id=seeded.user_ids[0], since=since, until=until
+    )
+    assert await scanned(pg_connection, *export) == expected_partitions(seeded, since, until)
+
+
+async def test_cursor_pages_prune_partitions_on_the_far_side(pg_connection, seeded):
+    partitions = ranged(seeded)
+    key = (partitions[-2].lower + timedelta(days=3), 1)
+
+    older, _ = await selects(
+        pg_connection, "get_audit_logs", page_size=10, user_id=seeded.user_ids[0], after=key
+    )
+    assert await scanned(pg_connection, *older) == expected_partitions(
+        seeded, None, key[0] + timedelta(microseconds=1)
+    )
+
+    newer, _ = await selects(
+        pg_connection, "get_audit_logs", page_size=10, user_id=seeded.user_ids[0], before=key
+    )
+    assert await scanned(pg_connection, *newer) == expected_partitions(seeded, key[0], None)
+
+
+async def test_unbounded_page_scans_every_partition(pg_connection, seeded):
+    page, _ = await selects(pg_connection, "get_audit_logs", page_size=10, user_id=seeded.user_ids[0])
+    assert await scanned(pg_connection, *page) == {partition.name for partition in seeded.partitions}
+
+
+@pytest.mark.parametrize("archived_until, action, expired", [
+    (None, DETACH, set()),
+    (datetime(2026, 2, 1), DETACH, {"retention_probe_p20260101"}),
+    (datetime(2026, 3, 1), DETACH, {"retention_probe_p20260101", "retention_probe_p20260201"}),
+    (None, DROP, {"retention_probe_p20260101", "retention_probe_p20260201"}),
+])
+async def test_only_archived_partitions_are_detached(pg_connection, archived_until, action, expired):
+    async with pg_connection.begin_nested() as savepoint:
+        await pg_connection.execute(text(
+            "CREATE TABLE retention_probe (timestamp timestamp NOT NULL) PARTITION BY RANGE (timestamp)"
+        ))
+        names = []
+        for lower, upper in (("2026-01-01", "2026-02-01"), ("2026-02-01", "2026-03-01"), ("2026-03-01", "2026-04-01")):
+            names.append(f"retention_probe_p{lower.replace('-', '')}")
+            await pg_connection.execute(text(
+                f"CREATE TABLE {names[-1]} PARTITION OF retention_probe FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+
+        maintainer = PartitionMaintainer(
+            engine, "retention_probe", MONTH, partitions_ahead=0, retention_days=30,
+            expired_partitions=action, check_interval=3600,
+            archive=SimpleNamespace(archived_until=archived_until),
+        )
+        partitions = await maintainer._partitions(pg_connection)
+        # Both of the first two partitions are past the retention.
+        assert await maintainer._expire(pg_connection, partitions, datetime(2026, 4, 1)) == len(expired)
+
+        remaining = {partition.name for partition in await maintainer._partitions(pg_connection)}
+        assert remaining == set(names) - expired
+        assert maintainer.stats()["unarchived"] == (2 - len(expired) if action == DETACH else 0)
+        await savepoint.rollback()
@@ -0,0 +1,147 @@
+import asyncio
+from email.message import EmailMessage
+from typing import List, Optional
+
+import pytest
+
+from app.services.mail_dispatcher import MailDispatcher
+
+pytestmark = pytest.mark.anyio
+
+
+class SMTPStandIn:
+    """Just enough of an SMTP server for smtplib: no TLS, no AUTH."""
+
+    def __init__(self, reject_rcpt: Optional[str] = None, data_replies: Optional[List[bytes]] = None):
+        self.reject_rcpt = reject_rcpt
+        # Replies to the next DATA commands, before the usual "250 queued".
+        self.data_replies = list(data_replies or [])
+        self.messages: List[bytes] = []
+        self.connections = 0
+        self.port = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def __aenter__(self) -> "SMTPStandIn":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        writer.write(b"220 stand-in ESMTP\r\n")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command == b"EHLO":
+                writer.write(b"250-stand-in\r\n250 8BITMIME\r\n")
+            elif command == b"RCPT" and self.reject_rcpt and self.reject_rcpt.encode() in line:
+                writer.write(b"550 no such user\r\n")
+            elif command == b"DATA":
+                writer.write(b"354 go ahead\r\n")
+                await writer.drain()
+                data = b""
+                while (chunk := await reader.readline()) != b".\r\n":
+                    data += chunk
+                reply = self.data_replies.pop(0) if self.data_replies else b"250 queued"
+                if reply.startswith(b"250"):
+                    self.messages.append(data)
+                writer.write(reply + b"\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+
+def make_dispatcher(port: int, **kwargs) -> MailDispatcher:
+    return MailDispatcher(
+        "127.0.0.1", port, None, None,
+        use_tls=False, pool_size=1, initial_backoff=0.01, **kwargs
+    )
+
+
+class UnrenderableMessage(EmailMessage):
+    def __copy__(self):
+        raise RuntimeError("cannot render message")
+
+
+def make_message(to: str, message_class: type = EmailMessage) -> EmailMessage:
+    message = message_class()
+    message["From"] = "api@example.com"
+    message["To"] = to
+    message["Subject"] = "test"
+    message.set_content("hello")
+    return message
+
+
+async def test_burst_goes_over_one_connection():
+    async with SMTPStandIn() as server:
+        dispatcher = make_dispatcher(server.port)
+        for i in range(5):
+            dispatcher.enqueue(make_message(f"user{i}@example.com"))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+
+    assert len(server.messages) == 5
+    assert server.connections == 1
+    assert dispatcher.stats()["sent"] == 5
+    assert dispatcher.stats()["handshakes"] == 1
+
+
+async def test_unexpected_error_drops_the_message_and_keeps_the_worker():
+    async with SMTPStandIn() as server:
+        dispatcher = make_dispatcher(server.port)
+        dispatcher.enqueue(make_message("first@example.com"))
+        dispatcher.enqueue(make_message("broken@example.com", UnrenderableMessage))
+        dispatcher.enqueue(make_message("third@example.com"))
+        await asyncio.wait_for(dispatcher._queue.join(), 5)
+
+        assert all(not worker.done() for worker in dispatcher._workers)
+        dispatcher.enqueue(make_message("later@example.com"))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+
+    stats = dispatcher.stats()
+    assert stats["sent"] == 3
+    assert stats["failed"] == 1
+    assert stats["in_flight"] == 0
+    assert len(server.messages) == 3
+
+
+async def test_rejected_recipient_is_dropped_without_reconnecting():
+    async with SMTPStandIn(reject_rcpt="bounce@") as server:
+        dispatcher = make_dispatcher(server.port)
+        dispatcher.enqueue(make_message("bounce@example.com"))
+        dispatcher.enqueue(make_message("ok@example.com"))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+
+    stats = dispatcher.stats()
+    assert (stats["sent"], stats["failed"], stats["reconnects"]) == (1, 1, 0)
+    assert server.connections == 1
+
+
+async def test_transient_data_reply_is_retried():
+    async with SMTPStandIn(data_replies=[b"451 try again later"]) as server:
+        dispatcher = make_dispatcher(server.port)
+        dispatcher.enqueue(make_message("later@example.com"))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+
+    stats = dispatcher.stats()
+    assert (stats["sent"], stats["failed"], stats["reconnects"]) == (1, 0, 1)
+    assert len(server.messages) == 1
+
+
+async def test_permanent_data_reply_is_dropped():
+    async with SMTPStandIn(data_replies=[b"554 message rejected"]) as server:
+        dispatcher = make_dispatcher(server.port)
+        dispatcher.enqueue(make_message("spam@example.com"))
+        dispatcher.enqueue(make_message("ok@example.com"))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+
+    stats = dispatcher.stats()
+    assert (stats["sent"], stats["failed"], stats["reconnects"]) == (1, 1, 0)
+    assert len(server.messages) == 1
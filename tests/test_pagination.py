@@ -0,0 +1,126 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.pagination import NEXT, PREV, build_cursors, decode_cursor, encode_cursor
+from app.models.models import DeviceLog
+from tests.api import api_client, create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+
+def raw_cursor(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("direction", [NEXT, PREV])
+def test_cursor_round_trip(direction):
+    key = [datetime(2026, 1, 2, 3, 4, 5, 678).isoformat(), 2 ** 40]
+    cursor = encode_cursor(key, direction)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == (key, direction)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    "x",
+    raw_cursor(b"\xff\xfe"),
+    raw_cursor(b"not json"),
+    raw_cursor(b"[1, 2]"),
+    raw_cursor(b'{"k": [1]}'),
+    raw_cursor(b'{"k": 1, "d": "next"}'),
+    raw_cursor(b'{"k": [], "d": "next"}'),
+    raw_cursor(b'{"k": [1], "d": "sideways"}'),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def key_of(row):
+    return [row]
+
+
+def test_page_number_mode_cursors():
+    assert build_cursors([1, 2], key_of, None, has_more=True, page_number=1) == (encode_cursor([2], NEXT), None)
+    assert build_cursors([3, 4], key_of, None, has_more=False, page_number=2) == (None, encode_cursor([3], PREV))
+    assert build_cursors([], key_of, None, has_more=False, page_number=9) == (None, None)
+
+
+def test_keyset_cursors_and_stepping_past_the_end():
+    assert build_cursors([3, 4], key_of, NEXT, has_more=False) == (None, encode_cursor([3], PREV))
+    assert build_cursors([3, 4], key_of, PREV, has_more=False) == (encode_cursor([4], NEXT), None)
+    # An empty page still leads back to where the cursor came from.
+    assert build_cursors([], key_of, NEXT, has_more=False, key=[9]) == (None, encode_cursor([9], PREV))
+    assert build_cursors([], key_of, PREV, has_more=False, key=[9]) == (encode_cursor([9], NEXT), None)
+
+
+@pytest.fixture(scope="module")
+async def logs(pg_connection: AsyncConnection):
+    """A user with seven audit log rows, three and two of them sharing a
+    timestamp, in (timestamp, id) descending order."""
+    user_id = await create_user(pg_connection)
+    now = datetime.utcnow().replace(microsecond=0)
+    timestamps = [now] * 3 + [now - timedelta(seconds=1)] * 2 + [now - timedelta(seconds=2)] * 2
+    ids = (await pg_connection.execute(
+        insert(DeviceLog).returning(DeviceLog.id),
+        [
+            {"user_id": user_id, "action": "update", "object_type": "device", "object_id": i,
+             "timestamp": timestamp, "details": {}}
+            for i, timestamp in enumerate(timestamps)
+        ]
+    )).scalars().all()
+    rows = sorted(zip(timestamps, ids), reverse=True)
+    return user_id, [row_id for _, row_id in rows]
+
+
+async def test_keyset_pages_are_stable_on_equal_timestamps(pg_connection, logs):
+    user_id, expected = logs
+    async with api_client(sessions_in(pg_connection), user_id) as client:
+        seen, cursors, cursor = [], [], None
+        while True:
+            params = {"page_size": 3, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/logs/audit-logs/", params=params)).json()
+            seen += [log["id"] for log in page["data"]]
+            cursors.append(page["pagination"]["prev_cursor"])
+            cursor = page["pagination"]["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+        # Walking back from the last page gives the same pages in reverse.
+        back, cursor = [], cursors[-1]
+        while cursor is not None:
+            page = (await client.get("/logs/audit-logs/", params={"page_size": 3, "cursor": cursor})).json()
+            back = [log["id"] for log in page["data"]] + back
+            cursor = page["pagination"]["prev_cursor"]
+        assert back == expected[:-1]
+
+        offsets = [
+            log["id"]
+            for number in (1, 2, 3)
+            for log in (await client.get(
+                "/logs/audit-logs/", params={"page_size": 3, "page_number": number}
+            )).json()["data"]
+        ]
+        assert offsets == expected
+
+
+@pytest.mark.parametrize("path, cursor", [
+    ("/logs/audit-logs/", "garbage"),
+    ("/logs/audit-logs/", encode_cursor(["yesterday", 1], NEXT)),
+    ("/logs/audit-logs/", encode_cursor([], NEXT)),
+    ("/devices/devices", encode_cursor(["one"], PREV)),
+    ("/devices/devices", raw_cursor(json.dumps({"k": [1], "d": "up"}).encode())),
+])
+async def test_invalid_cursor_is_a_bad_request(pg_connection, logs, path, cursor):
+    async with api_client(sessions_in(pg_connection), logs[0]) as client:
+        response = await client.get(path, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,63 @@
+from email.message import Message
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.models import User
+from app.services import auth
+from tests.api import api_client, create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+
+class QueueStandIn:
+    def __init__(self, full: bool = False):
+        self.full = full
+        self.messages: List[Message] = []
+
+    def enqueue(self, message: Message) -> None:
+        if self.full:
+            raise HTTPException(status_code=503, detail="Mail queue is full, try again later")
+        self.messages.append(message)
+
+
+@pytest.fixture(scope="module")
+def session_factory(pg_connection: AsyncConnection):
+    return sessions_in(pg_connection)
+
+
+async def reset_code(pg_connection: AsyncConnection, user_id: int):
+    return (await pg_connection.execute(
+        select(User.reset_code, User.reset_code_expiration).where(User.id == user_id)
+    )).one()
+
+
+async def test_code_is_stored_and_mailed(pg_connection, session_factory, monkeypatch):
+    queue = QueueStandIn()
+    monkeypatch.setattr(auth, "mail_dispatcher", queue)
+    user_id = await create_user(pg_connection)
+    email = await pg_connection.scalar(select(User.email).where(User.id == user_id))
+
+    async with api_client(session_factory) as client:
+        response = await client.post("/auth/request-password-reset", json={"email": email})
+
+    assert response.status_code == 200
+    code, expiration = await reset_code(pg_connection, user_id)
+    assert code is not None and expiration is not None
+    assert [message["To"] for message in queue.messages] == [email]
+    assert code in queue.messages[0].get_payload()[0].get_payload()
+
+
+async def test_full_mail_queue_leaves_no_code_behind(pg_connection, session_factory, monkeypatch):
+    monkeypatch.setattr(auth, "mail_dispatcher", QueueStandIn(full=True))
+    user_id = await create_user(pg_connection)
+    email = await pg_connection.scalar(select(User.email).where(User.id == user_id))
+
+    async with api_client(session_factory) as client:
+        response = await client.post("/auth/request-password-reset", json={"email": email})
+
+    assert response.status_code == 503
+    assert tuple(await reset_code(pg_connection, user_id)) == (None, None)
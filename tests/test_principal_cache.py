@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.hashing import password_hasher
+from app.core.principal_cache import PrincipalCache, principal_cache
+from app.db.repositories.user_repository import UserRepository, get_user_by_id
+from app.models.models import User
+from app.services.user_services import UserService
+from tests.api import api_client, create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+
+def user(user_id: int) -> User:
+    return User(id=user_id, username=f"user-{user_id}", email=f"user-{user_id}@example.com", is_active=True)
+
+
+def test_hit_returns_a_fresh_copy():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    exp = int(time.time()) + 600
+    cache.set(user(1), exp)
+
+    first, second = cache.get(1, exp), cache.get(1, exp)
+    assert first is not second
+    assert (first.id, first.username) == (1, "user-1")
+    assert cache.get(1, exp + 1) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_entries_expire_with_the_ttl_or_the_token():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.set(user(1), int(time.time()) - 1)
+    assert cache.get(1, int(time.time()) - 1) is None
+
+    cache.ttl_seconds = 0.01
+    exp = int(time.time()) + 600
+    cache.set(user(2), exp)
+    time.sleep(0.02)
+    assert cache.get(2, exp) is None
+
+
+def test_size_is_bounded_and_invalidation_drops_every_token():
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    exp = int(time.time()) + 600
+    cache.set(user(1), exp)
+    cache.set(user(1), exp + 1)
+    cache.set(user(2), exp)
+    assert cache.get(1, exp) is None
+    assert cache.evictions == 1
+
+    cache.invalidate(1)
+    assert cache.get(1, exp + 1) is None
+    assert cache.get(2, exp) is not None
+
+
+@pytest.fixture(scope="module")
+def session_factory(pg_connection: AsyncConnection):
+    return sessions_in(pg_connection)
+
+
+async def signed_in_user(pg_connection: AsyncConnection, session_factory):
+    user_id = await create_user(pg_connection, hashed_password=await password_hasher.hash("old-password"))
+    async with session_factory() as db:
+        return user_id, await get_user_by_id(db, str(user_id))
+
+
+async def test_deactivated_user_is_rejected_on_the_next_request(pg_connection, session_factory):
+    user_id, db_user = await signed_in_user(pg_connection, session_factory)
+    async with api_client(session_factory, user_id) as client:
+        assert (await client.get("/devices/devices/status")).status_code == 200
+        assert user_id in principal_cache._keys_by_user
+
+        async with session_factory() as db:
+            await UserService(UserRepository(db)).set_active(db_user, False)
+
+        response = await client.get("/devices/devices/status")
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Inactive user"
+
+
+async def test_password_change_drops_the_cached_principal(pg_connection, session_factory):
+    user_id, db_user = await signed_in_user(pg_connection, session_factory)
+    async with api_client(session_factory, user_id) as client:
+        assert (await client.get("/devices/devices/status")).status_code == 200
+        assert user_id in principal_cache._keys_by_user
+
+        async with session_factory() as db:
+            await UserService(UserRepository(db)).change_password(db_user, "old-password", "new-password")
+        assert user_id not in principal_cache._keys_by_user
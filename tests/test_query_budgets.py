@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.query_tracker import QueryBudgetExceeded, query_tracking, track_queries
+from tests.api import api_client, create_user, new_device, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+# (method, path, body, declared budget); {device_id} is a device created
+# for the request.
+BUDGETED_ROUTES = [
+    ("POST", "/devices/devices/", "device", 5),
+    ("POST", "/devices/bulk", "devices", 4),
+    ("GET", "/devices/devices", None, 4),
+    ("GET", "/devices/devices/status", None, 1),
+    ("GET", "/devices/devices/{device_id}", None, 3),
+    ("PUT", "/devices/devices/{device_id}", "device", 5),
+    ("DELETE", "/devices/devices/{device_id}", None, 4),
+    ("GET", "/logs/audit-logs/", None, 3),
+    ("GET", "/logs/export", None, 2),
+]
+
+
+@pytest.fixture(scope="module")
+async def client(pg_connection: AsyncConnection):
+    # Without savepoints, which would count as statements where BEGIN and
+    # COMMIT do not. Only successful requests are made, so nothing rolls
+    # the module's transaction back.
+    session_factory = sessions_in(pg_connection, "rollback_only")
+    async with api_client(session_factory, await create_user(pg_connection)) as client:
+        yield client
+
+
+@pytest.mark.parametrize("method, path, body, budget", BUDGETED_ROUTES)
+async def test_routes_stay_within_their_budget(client, monkeypatch, method, path, body, budget):
+    # QUERY_TRACKING is off here: track_queries() must count on its own.
+    assert not query_tracking.enabled
+    monkeypatch.setattr(query_tracking, "enforce_budgets", True)
+
+    # Authenticated once outside the tracker, so every route starts from
+    # the same (cached) principal.
+    created = await client.post("/devices/devices/", json=new_device())
+    assert created.status_code == 200, created.text
+    payload = {"device": new_device(), "devices": [new_device() for _ in range(3)]}.get(body)
+
+    with track_queries() as tracker:
+        response = await client.request(
+            method, path.format(device_id=created.json()["id"]), json=payload
+        )
+
+    assert response.status_code == 200, response.text
+    assert tracker.budget == budget
+    assert tracker.count <= budget, tracker.report()
+
+
+async def test_enforced_budget_stops_the_statement_over_it(pg_connection, monkeypatch):
+    monkeypatch.setattr(query_tracking, "enforce_budgets", True)
+    with pytest.raises(QueryBudgetExceeded):
+        with track_queries(budget=1) as tracker:
+            await pg_connection.exec_driver_sql("SELECT 1")
+            await pg_connection.exec_driver_sql("SELECT 2")
+    assert tracker.count == 2
+
+
+async def test_budget_is_checked_on_exit_when_not_enforced(pg_connection):
+    with pytest.raises(QueryBudgetExceeded):
+        with track_queries(budget=1) as tracker:
+            await pg_connection.exec_driver_sql("SELECT 1")
+            await pg_connection.exec_driver_sql("SELECT 2")
+    assert tracker.count == 2
@@ -0,0 +1,171 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from starlette.types import Receive, Scope, Send
+
+from app.core import rate_limit
+from app.core.rate_limit import (
+    MAX_INSPECTED_BODY,
+    InMemoryRateLimitBackend,
+    RateLimitMiddleware,
+    SqliteRateLimitBackend,
+)
+from app.core.security import create_access_token
+
+pytestmark = pytest.mark.anyio
+
+PATHS = {"/login": "username", "/change-password": "token"}
+
+
+async def echo(scope: Scope, receive: Receive, send: Send) -> None:
+    """Answers with the request body it received, chunk by chunk."""
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"|".join(chunks)})
+
+
+def limited(backend=None, **rates) -> RateLimitMiddleware:
+    rates = {"ip_per_minute": 0, "ip_burst": 0, "user_per_minute": 60, "user_burst": 2, **rates}
+    return RateLimitMiddleware(echo, backend or InMemoryRateLimitBackend(100), paths=PATHS, **rates)
+
+
+def client(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def test_username_is_limited_with_retry_after():
+    middleware = limited()
+    async with client(middleware) as http:
+        for _ in range(2):
+            response = await http.post("/login", data={"username": "Alice", "password": "x"})
+            assert response.status_code == 200
+
+        response = await http.post("/login", data={"username": " alice ", "password": "y"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+        response = await http.post("/login", data={"username": "bob", "password": "x"})
+        assert response.status_code == 200
+    assert middleware.backend.rejected == 1
+
+
+async def test_ip_limit_applies_per_path_and_unlisted_paths_pass():
+    async with client(limited(ip_per_minute=60, ip_burst=1, user_per_minute=0)) as http:
+        assert (await http.post("/login", json={"username": "a"})).status_code == 200
+        assert (await http.post("/login", json={"username": "b"})).status_code == 429
+        assert (await http.post("/change-password")).status_code == 200
+        for _ in range(3):
+            assert (await http.post("/other")).status_code == 200
+
+
+async def test_token_subject_is_the_identity():
+    async with client(limited(user_burst=1)) as http:
+        alice = {"Authorization": f"Bearer {create_access_token('1')}"}
+        assert (await http.post("/change-password", headers=alice)).status_code == 200
+        assert (await http.post("/change-password", headers=alice)).status_code == 429
+
+        bob = {"Cookie": f"access_token={create_access_token('2')}"}
+        assert (await http.post("/change-password", headers=bob)).status_code == 200
+        # No valid token, no identity: only the IP limit (off here) applies.
+        for _ in range(3):
+            assert (await http.post("/change-password", headers={"Authorization": "Bearer x"})).status_code == 200
+
+
+async def test_form_body_is_replayed_to_the_app():
+    body = "username=alice&password=s3cret%26more"
+    async with client(limited()) as http:
+        response = await http.post(
+            "/login", content=body, headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+    assert response.status_code == 200
+    assert response.text == body
+
+
+async def call(app, path: str, chunks: list) -> tuple:
+    """Sends the body in ``chunks``; returns the status and the body the
+    app saw."""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": path, "client": ("127.0.0.1", 1),
+        "headers": [(b"content-type", b"application/x-www-form-urlencoded")],
+    }
+    await app(scope, receive, send)
+    return sent[0]["status"], sent[1]["body"]
+
+
+async def test_chunked_body_is_replayed_in_full():
+    status, seen = await call(limited(), "/login", [b"username=al", b"ice&password=x"])
+    assert status == 200
+    assert seen == b"username=alice&password=x"
+
+
+async def test_oversized_body_is_passed_through_without_identity():
+    middleware = limited(user_burst=1)
+    first = b"username=alice&padding=" + b"x" * MAX_INSPECTED_BODY
+    for _ in range(3):
+        status, seen = await call(middleware, "/login", [first, b"y" * 10, b"z" * 10])
+        assert status == 200
+        # Everything read while inspecting comes back, then the rest.
+        assert seen == first + b"|" + b"y" * 10 + b"|" + b"z" * 10
+    assert middleware.backend.rejected == 0
+
+
+async def test_memory_backend_evicts_least_recently_used():
+    backend = InMemoryRateLimitBackend(max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        await backend.consume(key, 1, 1)
+    assert list(backend._buckets) == ["a", "c"]
+    assert backend.evictions == 1
+
+
+async def test_sqlite_backend_refills_and_is_shared(tmp_path, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now))
+    path = str(tmp_path / "buckets.sqlite3")
+    first, second = SqliteRateLimitBackend(path, 100), SqliteRateLimitBackend(path, 100)
+
+    assert await first.consume("k", rate=0.5, capacity=2) == 0
+    assert await second.consume("k", rate=0.5, capacity=2) == 0
+    assert await first.consume("k", rate=0.5, capacity=2) == pytest.approx(2)
+
+    now += 1
+    assert await second.consume("k", rate=0.5, capacity=2) == pytest.approx(1)
+    now += 1
+    assert await first.consume("k", rate=0.5, capacity=2) == 0
+
+    # A long-idle bucket refills only up to its capacity.
+    now += 3600
+    assert await first.consume("k", rate=0.5, capacity=2) == 0
+    assert await first.consume("k", rate=0.5, capacity=2) == 0
+    assert await first.consume("k", rate=0.5, capacity=2) > 0
+
+
+async def test_sqlite_backend_expires_the_oldest_keys(tmp_path, monkeypatch):
+    now = time.time()
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(time=lambda: now))
+    backend = SqliteRateLimitBackend(str(tmp_path / "buckets.sqlite3"), max_keys=2)
+    for key in ("a", "b", "c"):
+        await backend.consume(key, rate=1, capacity=1)
+        now += 1
+    backend._evict()
+
+    keys = [key for key, in backend._conn.execute("SELECT key FROM buckets ORDER BY key")]
+    assert keys == ["b", "c"]
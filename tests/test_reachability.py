@@ -0,0 +1,116 @@
+import asyncio
+import socket
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.api.endpoints import devices_router
+from app.services import device_services
+from app.services.reachability import ReachabilityProber, probe_tcp
+from tests.api import api_client, create_user, sessions_in
+
+pytestmark = pytest.mark.anyio
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+async def open_port():
+    server = await asyncio.start_server(lambda reader, writer: writer.close(), HOST, 0)
+    yield server, server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def prober(**values) -> ReachabilityProber:
+    return ReachabilityProber(None, **{"interval": 10, "max_backoff": 35, "jitter": 0, "timeout": 1, **values})
+
+
+def delay_of(prober: ReachabilityProber, device_id: int) -> float:
+    return round(prober._states[device_id].next_probe_at - time.monotonic())
+
+
+async def test_probe_tcp_against_local_ports(open_port, closed_port):
+    reachable, latency_ms, error = await probe_tcp(HOST, open_port[1], 1)
+    assert reachable is True and latency_ms >= 0 and error is None
+    reachable, latency_ms, error = await probe_tcp(HOST, closed_port, 1)
+    assert reachable is False and latency_ms is None and error
+
+
+async def test_up_and_down_transitions(open_port, closed_port):
+    server, port = open_port
+    p = prober()
+    p.set_targets([(1, HOST, port), (2, HOST, closed_port)])
+    await p.probe_all()
+
+    assert [(s["device_id"], s["reachable"], s["consecutive_failures"]) for s in p.statuses()] == [
+        (1, True, 0), (2, False, 1)
+    ]
+    assert p.statuses(reachable=False)[0]["error"]
+    assert p.transitions == 0
+
+    server.close()
+    await server.wait_closed()
+    await p.probe_all()
+    status = p.status(1)
+    assert status["reachable"] is False and status["consecutive_failures"] == 1
+    assert status["changed_at"] == status["checked_at"]
+    assert p.transitions == 1
+
+
+async def test_unreachable_devices_back_off_up_to_the_maximum(open_port, closed_port):
+    p = prober()
+    p.set_targets([(1, HOST, open_port[1]), (2, HOST, closed_port)])
+
+    delays = []
+    for _ in range(4):
+        await p.probe_all()
+        delays.append((delay_of(p, 1), delay_of(p, 2)))
+    assert delays == [(10, 10), (10, 20), (10, 35), (10, 35)]
+    assert p.status(2)["consecutive_failures"] == 4
+
+
+async def test_state_tag_changes_with_every_status_change(open_port, closed_port):
+    p = prober()
+    p.set_targets([(1, HOST, open_port[1]), (2, HOST, closed_port)])
+    await p.probe_all()
+
+    # Neither device flips, but check times, latency and failure counts move.
+    for _ in range(2):
+        before = (p.state_tag(), p.state_tag(1), p.state_tag(2))
+        await p.probe_all()
+        after = (p.state_tag(), p.state_tag(1), p.state_tag(2))
+        assert all(tag != old for tag, old in zip(after, before))
+
+    # Removing a probed device changes the overall tag only.
+    p.set_targets([(1, HOST, open_port[1])])
+    assert p.state_tag() != after[0]
+    assert p.state_tag(1) == after[1]
+
+
+async def test_status_etag_follows_the_probes(pg_connection: AsyncConnection, open_port, monkeypatch):
+    p = prober()
+    monkeypatch.setattr(devices_router, "reachability_prober", p)
+    monkeypatch.setattr(device_services, "reachability_prober", p)
+    p.set_targets([(1, HOST, open_port[1])])
+    await p.probe_all()
+
+    async with api_client(sessions_in(pg_connection), await create_user(pg_connection)) as client:
+        first = await client.get("/devices/devices/status")
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert (await client.get("/devices/devices/status", headers={"If-None-Match": etag})).status_code == 304
+
+        await p.probe_all()
+        changed = await client.get("/devices/devices/status", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert changed.json() != first.json()
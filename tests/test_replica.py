@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app import database
+from app.core.config import settings
+from app.db.replica import (
+    FORCE_PRIMARY_HEADER,
+    STICKY_COOKIE,
+    ReadYourWritesMiddleware,
+    ReplicaMonitor,
+    track_primary_writes,
+    wants_primary,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_check_times_out_on_a_replica_that_never_answers():
+    async def accept_and_hang(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await reader.read()
+        writer.close()
+
+    server = await asyncio.start_server(accept_and_hang, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    engine = create_async_engine(f"postgresql+asyncpg://u:p@127.0.0.1:{port}/d", poolclass=NullPool)
+    monitor = ReplicaMonitor(engine, max_lag_seconds=5, check_interval=5, check_timeout=0.2)
+    try:
+        started = time.monotonic()
+        assert not await monitor.is_usable()
+        assert time.monotonic() - started < 2
+        assert monitor.stats()["primary_fallbacks"] == 1
+    finally:
+        await engine.dispose()
+        server.close()
+        await server.wait_closed()
+
+
+@pytest.fixture(scope="module")
+async def primary(pg_connection):
+    """An engine on the test database, tracked like the app's primary."""
+    engine = create_async_engine(settings.DATABASE_URL_asyncpg, poolclass=NullPool)
+    track_primary_writes(engine)
+    yield engine
+    await engine.dispose()
+
+
+def app_on(engine) -> ReadYourWritesMiddleware:
+    async def write(request: Request):
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TEMP TABLE ryw_probe (x int) ON COMMIT DROP"))
+            await conn.execute(text("INSERT INTO ryw_probe VALUES (1)"))
+        return PlainTextResponse("written")
+
+    async def read(request: Request):
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT 1"))
+        return PlainTextResponse("read")
+
+    async def rolled_back(request: Request):
+        async with engine.connect() as conn:
+            await conn.execute(text("CREATE TEMP TABLE ryw_probe (x int)"))
+            await conn.rollback()
+        return PlainTextResponse("rolled back")
+
+    async def failed_write(request: Request):
+        await write(request)
+        return PlainTextResponse("failed", status_code=500)
+
+    routes = [
+        Route(f"/{endpoint.__name__}", endpoint, methods=["GET", "POST"])
+        for endpoint in (write, read, rolled_back, failed_write)
+    ]
+    return ReadYourWritesMiddleware(Starlette(routes=routes), window_seconds=5)
+
+
+@pytest.mark.parametrize("method, path, sticky", [
+    ("POST", "/write", True),
+    ("POST", "/read", False),
+    ("POST", "/rolled_back", False),
+    ("POST", "/failed_write", False),
+    ("GET", "/write", False),
+])
+async def test_cookie_only_after_a_committed_write(primary, method, path, sticky):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app_on(primary)), base_url="http://test") as client:
+        response = await client.request(method, path)
+
+    assert (STICKY_COOKIE in response.cookies) is sticky
+    if sticky:
+        assert float(response.cookies[STICKY_COOKIE]) == pytest.approx(time.time() + 5, abs=1)
+
+
+def request(headers: dict = None, cookies: dict = None) -> Request:
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    if cookies:
+        raw.append((b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+@pytest.mark.parametrize("headers, cookies, primary_wanted", [
+    ({}, {}, False),
+    ({FORCE_PRIMARY_HEADER: "1"}, {}, True),
+    ({}, {STICKY_COOKIE: str(time.time() + 60)}, True),
+    ({}, {STICKY_COOKIE: str(time.time() - 1)}, False),
+    ({}, {STICKY_COOKIE: "soon"}, False),
+])
+def test_wants_primary(headers, cookies, primary_wanted):
+    assert wants_primary(request(headers, cookies)) is primary_wanted
+
+
+class MonitorStandIn:
+    def __init__(self, usable: bool):
+        self.usable = usable
+
+    async def is_usable(self) -> bool:
+        return self.usable
+
+
+@pytest.mark.parametrize("usable, cookies, expected", [
+    (True, {}, "replica"),
+    (False, {}, "primary"),
+    (True, {STICKY_COOKIE: str(time.time() + 60)}, "primary"),
+])
+async def test_reads_are_routed(monkeypatch, usable, cookies, expected):
+    replica = object()
+    monkeypatch.setattr(database, "ReadSessionLocal", replica)
+    monkeypatch.setattr(database, "replica_monitor", MonitorStandIn(usable))
+
+    chosen = await database.get_read_sessionmaker(request(cookies=cookies))
+    assert chosen is {"replica": replica, "primary": database.AsyncSessionLocal}[expected]
+
+
+async def test_reads_use_the_primary_without_a_replica(monkeypatch):
+    monkeypatch.setattr(database, "ReadSessionLocal", None)
+    assert await database.get_read_sessionmaker(request()) is database.AsyncSessionLocal